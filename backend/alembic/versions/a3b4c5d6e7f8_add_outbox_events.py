@@ -0,0 +1,55 @@
+"""add outbox events
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "a3b4c5d6e7f8"
+down_revision: Union[str, None] = "f2a3b4c5d6e7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox_events",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("topic", sa.String(length=50), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_outbox_events_topic_id", "outbox_events", ["topic", "id"])
+
+    # INSERT のたびに中継ワーカーを起こす（文単位なので複数行 INSERT でも 1 回）
+    op.execute(
+        """
+        CREATE FUNCTION notify_outbox_events() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('outbox_events', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER outbox_events_notify AFTER INSERT ON outbox_events
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_outbox_events()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER outbox_events_notify ON outbox_events")
+    op.execute("DROP FUNCTION notify_outbox_events()")
+    op.drop_index("ix_outbox_events_topic_id", table_name="outbox_events")
+    op.drop_table("outbox_events")
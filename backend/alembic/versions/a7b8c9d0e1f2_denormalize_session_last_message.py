@@ -0,0 +1,79 @@
+"""denormalize session last message
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a7b8c9d0e1f2"
+down_revision: Union[str, None] = "f6a7b8c9d0e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+PREVIEW_LENGTH = 200
+
+
+def upgrade() -> None:
+    op.add_column("sessions", sa.Column("last_message_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("sessions", sa.Column("last_persona_message_id", sa.BigInteger(), nullable=True))
+    op.add_column("sessions", sa.Column("last_persona_message_preview", sa.String(length=200), nullable=True))
+    op.create_index("ix_sessions_updated_id", "sessions", ["updated_at", "id"])
+    op.create_index("ix_sessions_user_updated_id", "sessions", ["user_id", "updated_at", "id"])
+    op.create_index("ix_sessions_persona_updated_id", "sessions", ["persona_id", "updated_at", "id"])
+
+    # 既存セッションのバックフィル: セッション ID の範囲ごとに分けてコミットし、
+    # 長時間のロックと巨大なトランザクションを避ける
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text("SELECT coalesce(max(id), 0) FROM sessions")).scalar()
+    with op.get_context().autocommit_block():
+        for low in range(1, max_id + 1, BACKFILL_BATCH_SIZE):
+            high = low + BACKFILL_BATCH_SIZE - 1
+            conn.execute(
+                sa.text(
+                    """
+                    UPDATE sessions AS s
+                    SET last_message_at = agg.last_at
+                    FROM (
+                        SELECT session_id, max(created_at) AS last_at
+                        FROM messages
+                        WHERE session_id BETWEEN :low AND :high
+                        GROUP BY session_id
+                    ) AS agg
+                    WHERE s.id = agg.session_id
+                    """
+                ),
+                {"low": low, "high": high},
+            )
+            conn.execute(
+                sa.text(
+                    """
+                    UPDATE sessions AS s
+                    SET last_persona_message_id = m.id,
+                        last_persona_message_preview = left(m.content, :preview_length)
+                    FROM (
+                        SELECT DISTINCT ON (session_id) session_id, id, content
+                        FROM messages
+                        WHERE session_id BETWEEN :low AND :high AND sender_type = 'persona'
+                        ORDER BY session_id, id DESC
+                    ) AS m
+                    WHERE s.id = m.session_id
+                    """
+                ),
+                {"low": low, "high": high, "preview_length": PREVIEW_LENGTH},
+            )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sessions_persona_updated_id", table_name="sessions")
+    op.drop_index("ix_sessions_user_updated_id", table_name="sessions")
+    op.drop_index("ix_sessions_updated_id", table_name="sessions")
+    op.drop_column("sessions", "last_persona_message_preview")
+    op.drop_column("sessions", "last_persona_message_id")
+    op.drop_column("sessions", "last_message_at")
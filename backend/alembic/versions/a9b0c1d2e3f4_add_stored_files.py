@@ -0,0 +1,51 @@
+"""add stored files
+
+Revision ID: a9b0c1d2e3f4
+Revises: f8a9b0c1d2e3
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a9b0c1d2e3f4"
+down_revision: Union[str, None] = "f8a9b0c1d2e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stored_files",
+        sa.Column("path", sa.String(200), primary_key=True),
+        sa.Column("ref_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_stored_files_unreferenced",
+        "stored_files",
+        ["updated_at"],
+        postgresql_where=sa.text("ref_count = 0"),
+    )
+    # 既存のアバター（avatars/・personas/ 配下の旧形式）も参照数に載せ、差し替え後は GC で消せるようにする
+    op.execute(
+        """
+        INSERT INTO stored_files (path, ref_count)
+        SELECT substr(avatar_url, length('/uploads/') + 1), count(*)
+        FROM (
+            SELECT avatar_url FROM users WHERE avatar_url LIKE '/uploads/%'
+            UNION ALL
+            SELECT avatar_url FROM personas WHERE avatar_url LIKE '/uploads/%'
+        ) AS avatars
+        GROUP BY 1
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stored_files_unreferenced", table_name="stored_files")
+    op.drop_table("stored_files")
@@ -0,0 +1,58 @@
+"""add message attachments
+
+Revision ID: b0c1d2e3f4a5
+Revises: a9b0c1d2e3f4
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b0c1d2e3f4a5"
+down_revision: Union[str, None] = "a9b0c1d2e3f4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "message_attachments",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, primary_key=True),
+        sa.Column("uploader_type", sa.Enum("user", "persona", name="sendertype", create_type=False), nullable=False),
+        sa.Column("uploader_id", sa.Integer(), nullable=False),
+        sa.Column("original_url", sa.String(500), nullable=False),
+        sa.Column("content_type", sa.String(50), nullable=False),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("preview_url", sa.String(500), nullable=False),
+        sa.Column("preview_width", sa.Integer(), nullable=False),
+        sa.Column("preview_height", sa.Integer(), nullable=False),
+        sa.Column("used_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_message_attachments_unused",
+        "message_attachments",
+        ["created_at"],
+        postgresql_where=sa.text("used_at IS NULL"),
+    )
+    op.add_column("messages", sa.Column("attachment_id", sa.BigInteger(), nullable=True))
+    # messages は常に書き込まれるためロックを取らずに作る（トランザクション外で実行）
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_messages_attachment_id",
+            "messages",
+            ["attachment_id"],
+            postgresql_where=sa.text("attachment_id IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_messages_attachment_id", table_name="messages", postgresql_concurrently=True)
+    op.drop_column("messages", "attachment_id")
+    op.drop_index("ix_message_attachments_unused", table_name="message_attachments")
+    op.drop_table("message_attachments")
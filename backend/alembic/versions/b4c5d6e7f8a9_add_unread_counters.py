@@ -0,0 +1,46 @@
+"""add unread counters and session read cursors
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b4c5d6e7f8a9"
+down_revision: Union[str, None] = "a3b4c5d6e7f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_counters",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("unread_notifications", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("unread_messages", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO user_counters (user_id, unread_notifications)
+        SELECT user_id, count(*) FROM notifications WHERE is_read = false GROUP BY user_id
+        """
+    )
+
+    op.add_column("sessions", sa.Column("user_last_read_message_id", sa.BigInteger(), nullable=True))
+    op.add_column("sessions", sa.Column("user_unread_count", sa.Integer(), server_default="0", nullable=False))
+    # これまで既読の記録がないため、既存のメッセージはすべて既読として始める
+    op.execute("UPDATE sessions SET user_last_read_message_id = last_persona_message_id")
+
+
+def downgrade() -> None:
+    op.drop_column("sessions", "user_unread_count")
+    op.drop_column("sessions", "user_last_read_message_id")
+    op.drop_table("user_counters")
@@ -0,0 +1,53 @@
+"""add credit transactions ledger
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b8c9d0e1f2a3"
+down_revision: Union[str, None] = "a7b8c9d0e1f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "credit_transactions",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "type",
+            sa.Enum("opening", "charge", "grant", "message", name="credittransactiontype"),
+            nullable=False,
+        ),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("balance_after", sa.Integer(), nullable=False),
+        sa.Column("reference_id", sa.BigInteger(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_credit_transactions_user_id_id", "credit_transactions", ["user_id", "id"])
+
+    # 既存ユーザーの現在残高を開始残高として記録し、台帳合計と残高を一致させる
+    op.execute(
+        """
+        INSERT INTO credit_transactions (user_id, type, amount, balance_after)
+        SELECT id, 'opening', credit_balance, credit_balance
+        FROM users
+        WHERE credit_balance <> 0
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_credit_transactions_user_id_id", table_name="credit_transactions")
+    op.drop_table("credit_transactions")
+    sa.Enum(name="credittransactiontype").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,33 @@
+"""add outbox topic created_at index
+
+Revision ID: c1d2e3f4a5b6
+Revises: b0c1d2e3f4a5
+Create Date: 2026-10-19 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c1d2e3f4a5b6"
+down_revision: Union[str, None] = "b0c1d2e3f4a5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # お知らせワーカーは時間枠の終わった行を created_at 順に取り出す
+    # outbox_events は常に書き込まれるためロックを取らずに作る（トランザクション外で実行）
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_outbox_events_topic_created_id",
+            "outbox_events",
+            ["topic", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_outbox_events_topic_created_id", table_name="outbox_events", postgresql_concurrently=True)
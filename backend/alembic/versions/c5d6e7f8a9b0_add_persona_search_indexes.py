@@ -0,0 +1,55 @@
+"""add persona search indexes
+
+Revision ID: c5d6e7f8a9b0
+Revises: b4c5d6e7f8a9
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d6e7f8a9b0"
+down_revision: Union[str, None] = "b4c5d6e7f8a9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_personas_active_gender_age", "personas", ["gender", "age"], postgresql_where=sa.text("is_active")
+    )
+    op.create_index(
+        "ix_personas_name_trgm",
+        "personas",
+        ["name"],
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+        postgresql_where=sa.text("is_active"),
+    )
+    op.create_index(
+        "ix_personas_bio_trgm",
+        "personas",
+        ["bio"],
+        postgresql_using="gin",
+        postgresql_ops={"bio": "gin_trgm_ops"},
+        postgresql_where=sa.text("is_active"),
+    )
+    op.create_index(
+        "ix_personas_attributes",
+        "personas",
+        ["attributes"],
+        postgresql_using="gin",
+        postgresql_ops={"attributes": "jsonb_path_ops"},
+        postgresql_where=sa.text("is_active"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_personas_attributes", table_name="personas")
+    op.drop_index("ix_personas_bio_trgm", table_name="personas")
+    op.drop_index("ix_personas_name_trgm", table_name="personas")
+    op.drop_index("ix_personas_active_gender_age", table_name="personas")
@@ -0,0 +1,63 @@
+"""add credit reservations
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c9d0e1f2a3b4"
+down_revision: Union[str, None] = "b8c9d0e1f2a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE はトランザクション内で追加した値を使えないため先に確定させる
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE credittransactiontype ADD VALUE IF NOT EXISTS 'reservation_hold'")
+        op.execute("ALTER TYPE credittransactiontype ADD VALUE IF NOT EXISTS 'reservation_release'")
+
+    op.create_table(
+        "credit_reservations",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("consumed", sa.Integer(), nullable=True),
+        sa.Column("status", sa.Enum("open", "settled", name="creditreservationstatus"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("settled_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "uq_credit_reservations_open_user",
+        "credit_reservations",
+        ["user_id"],
+        unique=True,
+        postgresql_where=sa.text("status = 'open'"),
+    )
+    op.create_index("ix_credit_reservations_status_created", "credit_reservations", ["status", "created_at"])
+
+    op.add_column("messages", sa.Column("credit_reservation_id", sa.BigInteger(), nullable=True))
+    op.create_index(
+        "ix_messages_credit_reservation_id",
+        "messages",
+        ["credit_reservation_id"],
+        postgresql_where=sa.text("credit_reservation_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_credit_reservation_id", table_name="messages")
+    op.drop_column("messages", "credit_reservation_id")
+    op.drop_index("ix_credit_reservations_status_created", table_name="credit_reservations")
+    op.drop_index("uq_credit_reservations_open_user", table_name="credit_reservations")
+    op.drop_table("credit_reservations")
+    sa.Enum(name="creditreservationstatus").drop(op.get_bind(), checkfirst=True)
+    # PostgreSQL は enum の値を削除できないため credittransactiontype はそのまま残す
@@ -0,0 +1,49 @@
+"""add mail delivery runs
+
+Revision ID: d0e1f2a3b4c5
+Revises: c9d0e1f2a3b4
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d0e1f2a3b4c5"
+down_revision: Union[str, None] = "c9d0e1f2a3b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mail_delivery_runs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("campaign_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("pending", "running", "completed", "failed", name="deliveryrunstatus"),
+            nullable=False,
+        ),
+        sa.Column("last_user_id", sa.Integer(), nullable=False),
+        sa.Column("sent_count", sa.Integer(), nullable=False),
+        sa.Column("failed_count", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["campaign_id"], ["mail_campaigns.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_mail_delivery_runs_status_id", "mail_delivery_runs", ["status", "id"])
+    op.create_index("ix_mail_delivery_runs_campaign_id", "mail_delivery_runs", ["campaign_id", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_mail_delivery_runs_campaign_id", table_name="mail_delivery_runs")
+    op.drop_index("ix_mail_delivery_runs_status_id", table_name="mail_delivery_runs")
+    op.drop_table("mail_delivery_runs")
+    sa.Enum(name="deliveryrunstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,44 @@
+"""add user search trigram indexes
+
+Revision ID: d6e7f8a9b0c1
+Revises: c5d6e7f8a9b0
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d6e7f8a9b0c1"
+down_revision: Union[str, None] = "c5d6e7f8a9b0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # users は常に読み書きされるためロックを取らずに作る（トランザクション外で実行）
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_email_trgm",
+            "users",
+            ["email"],
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_users_display_name_trgm",
+            "users",
+            ["display_name"],
+            postgresql_using="gin",
+            postgresql_ops={"display_name": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_users_display_name_trgm", table_name="users", postgresql_concurrently=True)
+        op.drop_index("ix_users_email_trgm", table_name="users", postgresql_concurrently=True)
@@ -0,0 +1,45 @@
+"""add next_run_at to mail campaigns
+
+Revision ID: e1f2a3b4c5d6
+Revises: d0e1f2a3b4c5
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e1f2a3b4c5d6"
+down_revision: Union[str, None] = "d0e1f2a3b4c5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("mail_campaigns", sa.Column("next_run_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "ix_mail_campaigns_next_run_at",
+        "mail_campaigns",
+        ["next_run_at"],
+        postgresql_where=sa.text("next_run_at IS NOT NULL"),
+    )
+    # 既に有効な予約・定期送信を予定に載せる（定期送信の 2 回目以降はスケジューラーが計算する）
+    op.execute(
+        """
+        UPDATE mail_campaigns SET next_run_at = scheduled_at
+        WHERE type = 'scheduled' AND status = 'scheduled' AND scheduled_at IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        UPDATE mail_campaigns SET next_run_at = coalesce(scheduled_at, now())
+        WHERE type = 'periodic' AND status = 'active' AND interval IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_mail_campaigns_next_run_at", table_name="mail_campaigns")
+    op.drop_column("mail_campaigns", "next_run_at")
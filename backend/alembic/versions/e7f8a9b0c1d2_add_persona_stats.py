@@ -0,0 +1,78 @@
+"""add persona stats
+
+Revision ID: e7f8a9b0c1d2
+Revises: d6e7f8a9b0c1
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e7f8a9b0c1d2"
+down_revision: Union[str, None] = "d6e7f8a9b0c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "persona_stats",
+        sa.Column("persona_id", sa.Integer(), nullable=False),
+        sa.Column("like_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("visitor_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("active_session_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("messages_24h", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "popularity_score",
+            sa.Integer(),
+            sa.Computed("like_count * 3 + visitor_count + active_session_count * 2", persisted=True),
+        ),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["persona_id"], ["personas.id"]),
+        sa.PrimaryKeyConstraint("persona_id"),
+    )
+    op.create_table(
+        "persona_message_hours",
+        sa.Column("persona_id", sa.Integer(), nullable=False),
+        sa.Column("hour", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["persona_id"], ["personas.id"]),
+        sa.PrimaryKeyConstraint("persona_id", "hour"),
+    )
+    op.create_index("ix_persona_message_hours_hour", "persona_message_hours", ["hour"])
+
+    # 初回だけ全件から数える（以降はワーカーが差分で更新する）
+    op.execute(
+        """
+        INSERT INTO persona_message_hours (persona_id, hour, count)
+        SELECT s.persona_id, date_trunc('hour', m.created_at), count(*)
+        FROM messages m JOIN sessions s ON s.id = m.session_id
+        WHERE m.created_at > now() - interval '24 hours'
+        GROUP BY 1, 2
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO persona_stats (persona_id, like_count, visitor_count, active_session_count, messages_24h)
+        SELECT
+            p.id,
+            (SELECT count(*) FROM likes l WHERE l.persona_id = p.id),
+            (SELECT count(*) FROM footprints f WHERE f.persona_id = p.id),
+            (SELECT count(*) FROM sessions s WHERE s.persona_id = p.id AND s.status = 'active'),
+            coalesce((SELECT sum(h.count) FROM persona_message_hours h WHERE h.persona_id = p.id), 0)
+        FROM personas p
+        """
+    )
+    op.create_index("ix_persona_stats_popularity", "persona_stats", ["popularity_score", "persona_id"])
+    op.create_index("ix_persona_stats_trending", "persona_stats", ["messages_24h", "persona_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_persona_stats_trending", table_name="persona_stats")
+    op.drop_index("ix_persona_stats_popularity", table_name="persona_stats")
+    op.drop_index("ix_persona_message_hours_hour", table_name="persona_message_hours")
+    op.drop_table("persona_message_hours")
+    op.drop_table("persona_stats")
@@ -0,0 +1,47 @@
+"""add trigger mail jobs
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a3b4c5d6e7"
+down_revision: Union[str, None] = "e1f2a3b4c5d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "trigger_mail_jobs",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("trigger_id", sa.Integer(), nullable=False),
+        sa.Column("campaign_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("due_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["trigger_id"], ["trigger_mail_settings.id"]),
+        sa.ForeignKeyConstraint(["campaign_id"], ["mail_campaigns.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_trigger_mail_jobs_due_at", "trigger_mail_jobs", ["due_at"])
+    op.create_index(
+        "ix_messages_user_sender_id",
+        "messages",
+        ["sender_id"],
+        postgresql_where=sa.text("sender_type = 'user'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_user_sender_id", table_name="messages")
+    op.drop_index("ix_trigger_mail_jobs_due_at", table_name="trigger_mail_jobs")
+    op.drop_table("trigger_mail_jobs")
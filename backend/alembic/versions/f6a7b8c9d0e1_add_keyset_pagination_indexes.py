@@ -0,0 +1,34 @@
+"""add keyset pagination indexes
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f6a7b8c9d0e1"
+down_revision: Union[str, None] = "e5f6a7b8c9d0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_notifications_user_created_id", "notifications", ["user_id", "created_at", "id"])
+    op.create_index("ix_footprints_user_created_id", "footprints", ["user_id", "created_at", "id"])
+    op.create_index("ix_inquiries_created_id", "inquiries", ["created_at", "id"])
+    op.create_index("ix_age_verifications_submitted_id", "age_verifications", ["submitted_at", "id"])
+    op.create_index("ix_invitation_tokens_created_id", "invitation_tokens", ["created_at", "id"])
+    op.create_index("ix_mail_campaigns_created_id", "mail_campaigns", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_mail_campaigns_created_id", table_name="mail_campaigns")
+    op.drop_index("ix_invitation_tokens_created_id", table_name="invitation_tokens")
+    op.drop_index("ix_age_verifications_submitted_id", table_name="age_verifications")
+    op.drop_index("ix_inquiries_created_id", table_name="inquiries")
+    op.drop_index("ix_footprints_user_created_id", table_name="footprints")
+    op.drop_index("ix_notifications_user_created_id", table_name="notifications")
@@ -0,0 +1,40 @@
+"""add avatar variants
+
+Revision ID: f8a9b0c1d2e3
+Revises: e7f8a9b0c1d2
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "f8a9b0c1d2e3"
+down_revision: Union[str, None] = "e7f8a9b0c1d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("avatar_variants", postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column("personas", sa.Column("avatar_variants", postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    # 既存のアバターもサムネイルを作る（画像ワーカーが順に処理する）
+    op.execute(
+        """
+        INSERT INTO outbox_events (topic, payload)
+        SELECT 'image', jsonb_build_object('owner', 'user', 'owner_id', id, 'avatar_url', avatar_url)
+        FROM users WHERE avatar_url LIKE '/uploads/%'
+        UNION ALL
+        SELECT 'image', jsonb_build_object('owner', 'persona', 'owner_id', id, 'avatar_url', avatar_url)
+        FROM personas WHERE avatar_url LIKE '/uploads/%'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM outbox_events WHERE topic = 'image'")
+    op.drop_column("personas", "avatar_variants")
+    op.drop_column("users", "avatar_variants")
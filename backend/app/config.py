@@ -8,6 +8,85 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 60 * 24  # 24時間
     algorithm: str = "HS256"
 
+    # 本番サーバー（python -m app.server）のワーカープロセス数。
+    # 0 ならコンテナに割り当てられた CPU 数（DB 接続数の上限に収まる数まで減らす）
+    web_concurrency: int = 0
+    # DB 接続プール（プロセスごと）。ワーカー数 × (pool_size + max_overflow) が接続上限に収まること
+    db_pool_size: int = 5
+    db_max_overflow: int = 2
+    db_pool_timeout_seconds: int = 30
+    db_pool_pre_ping: bool = True
+    db_pool_recycle_seconds: int = 1800
+    db_statement_timeout_ms: int = 30000
+    # API 以外のために空けておく接続数
+    # （docker-compose のバックグラウンドワーカー 10 個 × 2 = 20 と、マイグレーション・psql の分）
+    db_reserved_connections: int = 30
+
+    # リアルタイム配信: "redis"（複数ワーカー対応）または "local"（単一プロセス内のみ）
+    realtime_backend: str = "redis"
+    poll_max_wait_seconds: int = 30
+
+    # 表示名・アバターのキャッシュ（ワーカー内 LRU + Redis）
+    profile_cache_size: int = 10000
+    profile_cache_local_ttl_seconds: int = 60
+    profile_cache_redis_ttl_seconds: int = 3600
+
+    # 認証済みアカウント（JWT の sub）のキャッシュ
+    principal_cache_size: int = 10000
+    principal_cache_ttl_seconds: int = 30
+    principal_cache_use_redis: bool = True
+
+    # 高頻度ユーザー向けのクレジット予約（残高からまとめて引き当て、Redis 上で 1 通ずつ消費）
+    credit_reservation_enabled: bool = False
+    credit_reservation_backend: str = "redis"  # "redis" または "local"（単一プロセス内のみ）
+    credit_reservation_block: int = 20
+    credit_reservation_max_age_seconds: int = 600
+
+    # メール配信: MAIL_TRANSPORT は "smtp" または "file"（MAIL_FILE_SINK_PATH に JSON Lines で書き出す）
+    mail_transport: str = "file"
+    mail_from: str = "no-reply@example.com"
+    mail_file_sink_path: str = "/app/mail_outbox/outbox.jsonl"
+    smtp_host: str = "localhost"
+    smtp_port: int = 25
+    smtp_username: str | None = None
+    smtp_password: str | None = None
+    smtp_use_tls: bool = False
+    mail_delivery_chunk_size: int = 500
+    mail_delivery_concurrency: int = 4
+    mail_delivery_stale_seconds: int = 300
+
+    # 予約・定期配信のスケジューラー（cron 形式の interval はこのタイムゾーンで解釈する）
+    scheduler_timezone: str = "Asia/Tokyo"
+    scheduler_batch_size: int = 100
+
+    # トリガーメール
+    credits_low_threshold: int = 10
+    trigger_mail_batch_size: int = 500
+    trigger_mail_max_attempts: int = 5
+    # お知らせのまとめ時間枠（秒、0 ならまとめない）と通知ワーカーの 1 バッチの件数
+    notification_window_message_seconds: int = 60
+    notification_window_like_seconds: int = 300
+    notification_window_credit_seconds: int = 0
+    notification_fanout_batch_size: int = 1000
+    # 条件なしのペルソナ一覧（さがす画面の初期表示）をキャッシュする秒数
+    persona_browse_cache_local_ttl_seconds: int = 10
+    persona_browse_cache_redis_ttl_seconds: int = 60
+    # ペルソナ集計ワーカーの 1 バッチの件数
+    persona_stats_batch_size: int = 1000
+    # アップロード画像の保存先と、サムネイル生成ワーカーのプロセス数
+    upload_dir: str = "/app/uploads"
+    image_worker_processes: int = 2
+    # 参照されなくなったアップロードファイルを消すまでの猶予と 1 回に消す件数
+    upload_gc_grace_seconds: int = 3600
+    upload_gc_batch_size: int = 500
+    # stored_files に行のないファイル（ロールバックしたアップロード）を探す間隔
+    upload_orphan_sweep_seconds: int = 3600
+    # true のとき /uploads はプロキシ（nginx）が共有ボリュームから直接返し、API ではマウントしない
+    uploads_served_by_proxy: bool = False
+    # チャット添付画像の上限と、送信に使われなかった添付を消すまでの時間
+    attachment_max_bytes: int = 8 * 1024 * 1024
+    attachment_expire_seconds: int = 86400
+
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
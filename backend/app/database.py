@@ -1,9 +1,27 @@
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import settings
 
-engine = create_async_engine(settings.database_url, echo=False)
+
+def _connect_args() -> dict:
+    # asyncpg は接続時のサーバー設定として渡す（0 のときは PostgreSQL の既定＝無制限）
+    if settings.db_statement_timeout_ms <= 0:
+        return {}
+    return {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+
+
+engine = create_async_engine(
+    settings.database_url,
+    echo=False,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_seconds,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_recycle=settings.db_pool_recycle_seconds,
+    connect_args=_connect_args(),
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -14,3 +32,32 @@ class Base(DeclarativeBase):
 async def get_db():
     async with async_session() as session:
         yield session
+
+
+def connections_per_process() -> int:
+    """1 プロセスのプールが最大で使う接続数"""
+    return settings.db_pool_size + settings.db_max_overflow
+
+
+async def available_connections() -> int:
+    """
+    API のプールに使える接続数を返す
+
+    max_connections から superuser_reserved_connections と DB_RESERVED_CONNECTIONS
+    （バックグラウンドワーカー・マイグレーション・psql の分）を引いた数。
+    """
+    async with engine.connect() as conn:
+        max_connections = int(await conn.scalar(text("SHOW max_connections")))
+        superuser_reserved = int(await conn.scalar(text("SHOW superuser_reserved_connections")))
+    return max_connections - superuser_reserved - settings.db_reserved_connections
+
+
+def check_connection_budget(processes: int, available: int) -> int:
+    """processes 個のプロセスのプールが available に収まるか確認し、必要な接続数を返す（収まらなければ RuntimeError）"""
+    required = processes * connections_per_process()
+    if required > available:
+        raise RuntimeError(
+            f"DB 接続数が上限を超えます: {processes} プロセス × {connections_per_process()} = {required} > {available}"
+            f"（max_connections − superuser_reserved_connections − DB_RESERVED_CONNECTIONS={settings.db_reserved_connections}）"
+        )
+    return required
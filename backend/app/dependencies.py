@@ -1,40 +1,40 @@
 from typing import Union
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models.user import User
 from app.models.staff_member import StaffMember, StaffRole
 from app.services.auth_service import decode_access_token
+from app.services.principal_service import load_principal
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
-async def get_current_account(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db),
-) -> Union[User, StaffMember]:
-    payload = decode_access_token(credentials.credentials)
+async def resolve_account(db: AsyncSession, token: str) -> Union[User, StaffMember]:
+    """JWT からアカウントを解決する（WebSocket 等ヘッダー認証を使えない経路と共用）"""
+    payload = decode_access_token(token)
     if payload is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="無効なトークンです")
     account_id = int(payload["sub"])
     account_type = payload.get("type", "user")
 
-    if account_type == "staff":
-        result = await db.execute(select(StaffMember).where(StaffMember.id == account_id))
-        account = result.scalar_one_or_none()
-    else:
-        result = await db.execute(select(User).where(User.id == account_id))
-        account = result.scalar_one_or_none()
-
+    account = await load_principal(db, "staff" if account_type == "staff" else "user", account_id)
     if account is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="アカウントが見つかりません")
     return account
 
 
+async def get_current_account(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db),
+) -> Union[User, StaffMember]:
+    return await resolve_account(db, credentials.credentials)
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db),
@@ -44,9 +44,7 @@ async def get_current_user(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="無効なトークンです")
     if payload.get("type") == "staff":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="ユーザーアカウントでログインしてください")
-    account_id = int(payload["sub"])
-    result = await db.execute(select(User).where(User.id == account_id))
-    user = result.scalar_one_or_none()
+    user = await load_principal(db, "user", int(payload["sub"]))
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="アカウントが見つかりません")
     return user
@@ -61,14 +59,27 @@ async def get_current_staff(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="無効なトークンです")
     if payload.get("type") != "staff":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="スタッフ権限が必要です")
-    account_id = int(payload["sub"])
-    result = await db.execute(select(StaffMember).where(StaffMember.id == account_id))
-    staff = result.scalar_one_or_none()
+    staff = await load_principal(db, "staff", int(payload["sub"]))
     if staff is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="アカウントが見つかりません")
     return staff
 
 
+async def get_current_staff_for_stream(
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_security),
+    token: str | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+) -> StaffMember:
+    """EventSource はヘッダーを付けられないため、クエリ文字列の token も受け付ける"""
+    raw_token = credentials.credentials if credentials else token
+    if not raw_token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="認証が必要です")
+    account = await resolve_account(db, raw_token)
+    if not isinstance(account, StaffMember):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="スタッフ権限が必要です")
+    return account
+
+
 async def get_current_admin(
     staff: StaffMember = Depends(get_current_staff),
 ) -> StaffMember:
@@ -1,9 +1,12 @@
 import os
-from pathlib import Path
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+
+from app.config import settings
+from app.pagination import NEXT_CURSOR_HEADER
+from app.redis_client import close_redis
 
 from app.routers import (
     auth,
@@ -15,6 +18,7 @@ from app.routers import (
     likes,
     footprints,
     notifications,
+    me,
     templates,
     inquiries,
     invitations,
@@ -23,9 +27,24 @@ from app.routers import (
     admin_mail,
     admin_line_bot,
     admin_age_verification,
+    admin_metrics,
 )
+from app.services.cache_service import start_invalidation_listener
+from app.services.realtime_service import close_broker
+from app.services.upload_service import UPLOAD_URL_PREFIX, UploadFiles, upload_root
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 他ワーカーで行われたキャッシュ無効化を受け取る
+    invalidation_listener = start_invalidation_listener()
+    yield
+    invalidation_listener.cancel()
+    await close_broker()
+    await close_redis()
+
 
-app = FastAPI(title="Friend API", version="0.1.0")
+app = FastAPI(title="Friend API", version="0.1.0", lifespan=lifespan)
 
 # CORS設定: ALLOWED_ORIGINS が設定されていれば本番モード、なければ開発モード
 allowed_origins = os.environ.get("ALLOWED_ORIGINS", "")
@@ -36,6 +55,7 @@ if allowed_origins:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
 else:
     app.add_middleware(
@@ -44,6 +64,7 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
 
 # コア機能
@@ -58,6 +79,7 @@ app.include_router(personas.router)
 app.include_router(likes.router)
 app.include_router(footprints.router)
 app.include_router(notifications.router)
+app.include_router(me.router)
 app.include_router(templates.router)
 app.include_router(inquiries.router)
 app.include_router(invitations.router)
@@ -68,12 +90,15 @@ app.include_router(admin_paid_contents.router)
 app.include_router(admin_mail.router)
 app.include_router(admin_line_bot.router)
 app.include_router(admin_age_verification.router)
+app.include_router(admin_metrics.router)
 
 
-# 静的ファイル配信（アバター画像等）
-uploads_dir = Path("/app/uploads")
+# 静的ファイル配信（アバター画像等。ファイル名が内容のハッシュなので長期キャッシュさせる）
+# UPLOADS_SERVED_BY_PROXY=true のときはプロキシが返すので API のワーカーを使わない
+uploads_dir = upload_root()
 uploads_dir.mkdir(parents=True, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
+if not settings.uploads_served_by_proxy:
+    app.mount(UPLOAD_URL_PREFIX, UploadFiles(directory=str(uploads_dir)), name="uploads")
 
 
 @app.get("/health")
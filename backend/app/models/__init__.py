@@ -13,6 +13,15 @@ from app.models.mail_campaign import MailCampaign, TriggerMailSetting
 from app.models.line_bot_account import LineBotAccount
 from app.models.age_verification import AgeVerification
 from app.models.invitation import InvitationToken
+from app.models.credit_transaction import CreditTransaction
+from app.models.credit_reservation import CreditReservation
+from app.models.mail_delivery_run import MailDeliveryRun
+from app.models.outbox import OutboxEvent
+from app.models.trigger_mail_job import TriggerMailJob
+from app.models.user_counter import UserCounter
+from app.models.persona_stats import PersonaStats, PersonaMessageHour
+from app.models.stored_file import StoredFile
+from app.models.message_attachment import MessageAttachment
 
 __all__ = [
     "User",
@@ -31,4 +40,14 @@ __all__ = [
     "LineBotAccount",
     "AgeVerification",
     "InvitationToken",
+    "CreditTransaction",
+    "CreditReservation",
+    "MailDeliveryRun",
+    "OutboxEvent",
+    "TriggerMailJob",
+    "UserCounter",
+    "PersonaStats",
+    "PersonaMessageHour",
+    "StoredFile",
+    "MessageAttachment",
 ]
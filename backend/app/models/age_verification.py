@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import Integer, Enum, DateTime, ForeignKey, func
+from sqlalchemy import Integer, Enum, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -22,3 +22,7 @@ class AgeVerification(Base):
     submitted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     reviewed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     reviewer_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("staff_members.id"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_age_verifications_submitted_id", "submitted_at", "id"),
+    )
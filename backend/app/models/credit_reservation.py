@@ -0,0 +1,38 @@
+import enum
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Integer, Enum, DateTime, ForeignKey, Index, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class CreditReservationStatus(str, enum.Enum):
+    open = "open"
+    settled = "settled"
+
+
+class CreditReservation(Base):
+    """users.credit_balance から引き当てたクレジットのブロック（ユーザーごとに open は 1 件まで）"""
+
+    __tablename__ = "credit_reservations"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    amount: Mapped[int] = mapped_column(Integer, nullable=False)
+    consumed: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    status: Mapped[CreditReservationStatus] = mapped_column(
+        Enum(CreditReservationStatus), default=CreditReservationStatus.open, nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    settled_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "uq_credit_reservations_open_user",
+            "user_id",
+            unique=True,
+            postgresql_where=text("status = 'open'"),
+        ),
+        Index("ix_credit_reservations_status_created", "status", "created_at"),
+    )
@@ -0,0 +1,34 @@
+import enum
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Integer, Enum, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class CreditTransactionType(str, enum.Enum):
+    opening = "opening"  # 台帳導入時点の残高
+    charge = "charge"
+    grant = "grant"
+    message = "message"
+    reservation_hold = "reservation_hold"
+    reservation_release = "reservation_release"
+
+
+class CreditTransaction(Base):
+    """クレジット増減の追記専用台帳（amount は増加が正、減少が負）"""
+
+    __tablename__ = "credit_transactions"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    type: Mapped[CreditTransactionType] = mapped_column(Enum(CreditTransactionType), nullable=False)
+    amount: Mapped[int] = mapped_column(Integer, nullable=False)
+    balance_after: Mapped[int] = mapped_column(Integer, nullable=False)
+    reference_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_credit_transactions_user_id_id", "user_id", "id"),
+    )
@@ -16,5 +16,6 @@ class Footprint(Base):
 
     __table_args__ = (
         Index("ix_footprints_persona_created", "persona_id", "created_at"),
+        Index("ix_footprints_user_created_id", "user_id", "created_at", "id"),
         UniqueConstraint("user_id", "persona_id", name="uq_footprints_user_persona"),
     )
@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import Integer, String, Text, Enum, DateTime, Boolean, ForeignKey, func
+from sqlalchemy import Integer, String, Text, Enum, DateTime, Boolean, ForeignKey, Index, func, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -33,8 +33,15 @@ class MailCampaign(Base):
     scheduled_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     interval: Mapped[str | None] = mapped_column(String(50), nullable=True)
     status: Mapped[CampaignStatus] = mapped_column(Enum(CampaignStatus), default=CampaignStatus.draft, nullable=False)
+    # 次回の配信予定（予約送信は scheduled、定期送信は active のときだけ値を持つ）
+    next_run_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_mail_campaigns_created_id", "created_at", "id"),
+        Index("ix_mail_campaigns_next_run_at", "next_run_at", postgresql_where=text("next_run_at IS NOT NULL")),
+    )
+
 
 class TriggerMailSetting(Base):
     __tablename__ = "trigger_mail_settings"
@@ -0,0 +1,41 @@
+import enum
+from datetime import datetime
+
+from sqlalchemy import Integer, Text, Enum, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class DeliveryRunStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class MailDeliveryRun(Base):
+    """キャンペーン 1 回分の配信。チャンクごとに進捗を保存し、中断しても続きから再開する"""
+
+    __tablename__ = "mail_delivery_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    campaign_id: Mapped[int] = mapped_column(Integer, ForeignKey("mail_campaigns.id"), nullable=False)
+    status: Mapped[DeliveryRunStatus] = mapped_column(
+        Enum(DeliveryRunStatus), default=DeliveryRunStatus.pending, nullable=False
+    )
+    # 送信済みチャンクの最後の users.id（再開時はこれより大きい ID から）
+    last_user_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    sent_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # 実行中のワーカーが定期的に更新する。古くなった running は停止したとみなして再取得する
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_mail_delivery_runs_status_id", "status", "id"),
+        Index("ix_mail_delivery_runs_campaign_id", "campaign_id", "id"),
+    )
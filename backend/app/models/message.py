@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Integer, String, Text, Enum, DateTime, ForeignKey, Index, func
+from sqlalchemy import BigInteger, Integer, String, Text, Enum, DateTime, ForeignKey, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -23,8 +23,27 @@ class Message(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     image_url: Mapped[str | None] = mapped_column(String(500), nullable=True)
     credit_cost: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # 予約済みクレジットから支払った場合の予約 ID（精算時の消費数はここから数える）
+    credit_reservation_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # アップロードした添付画像（image_url にはそのプレビューが入る）
+    attachment_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     __table_args__ = (
         Index("ix_messages_session_id_id", "session_id", "id"),
+        Index(
+            "ix_messages_user_sender_id",
+            "sender_id",
+            postgresql_where=text("sender_type = 'user'"),
+        ),
+        Index(
+            "ix_messages_credit_reservation_id",
+            "credit_reservation_id",
+            postgresql_where=text("credit_reservation_id IS NOT NULL"),
+        ),
+        Index(
+            "ix_messages_attachment_id",
+            "attachment_id",
+            postgresql_where=text("attachment_id IS NOT NULL"),
+        ),
     )
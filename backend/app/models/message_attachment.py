@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Integer, String, Enum, DateTime, Index, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+from app.models.message import SenderType
+
+
+class MessageAttachment(Base):
+    """チャットの添付画像（アップロード時に作り、送信時に messages.attachment_id から参照する）"""
+
+    __tablename__ = "message_attachments"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    # メッセージと同じく、ユーザーは users.id、ペルソナ側はスタッフの ID
+    uploader_type: Mapped[SenderType] = mapped_column(Enum(SenderType), nullable=False)
+    uploader_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # 元画像は private/ に置き、権限確認つきの API からだけ返す
+    original_url: Mapped[str] = mapped_column(String(500), nullable=False)
+    content_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    # 縮小したプレビュー（公開の /uploads。messages.image_url にも入れる）
+    preview_url: Mapped[str] = mapped_column(String(500), nullable=False)
+    preview_width: Mapped[int] = mapped_column(Integer, nullable=False)
+    preview_height: Mapped[int] = mapped_column(Integer, nullable=False)
+    # 初めて送信に使った日時（未使用のまま期限を過ぎたものは GC ワーカーが消す）
+    used_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_message_attachments_unused", "created_at", postgresql_where=text("used_at IS NULL")),
+    )
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, String, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class OutboxEvent(Base):
+    """
+    コミット後に行う副作用の待ち行列
+
+    業務データと同じトランザクションで書き込み、topic ごとのワーカーが ID 順に取り出して処理後に削除する。
+    """
+
+    __tablename__ = "outbox_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    topic: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_outbox_events_topic_id", "topic", "id"),
+        # notify:* は時間枠の終わった行を created_at 順に取り出す
+        Index("ix_outbox_events_topic_created_id", "topic", "created_at", "id"),
+    )
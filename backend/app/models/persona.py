@@ -1,7 +1,7 @@
 import enum
 from datetime import date, datetime
 
-from sqlalchemy import Date, String, Integer, Boolean, DateTime, Enum, ForeignKey, Text, func
+from sqlalchemy import Date, String, Integer, Boolean, DateTime, Enum, ForeignKey, Index, Text, func, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -22,9 +22,37 @@ class Persona(Base):
     gender: Mapped[Gender | None] = mapped_column(Enum(Gender), nullable=True)
     age: Mapped[int | None] = mapped_column(Integer, nullable=True)
     avatar_url: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    # 画像ワーカーが作ったサムネイル {"small": URL, "medium": URL, "large": URL}
+    avatar_variants: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     bio: Mapped[str | None] = mapped_column(Text, nullable=True)
     attributes: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     registered_at: Mapped[date | None] = mapped_column(Date, nullable=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # さがす画面の検索用（すべて is_active の部分インデックス）
+    __table_args__ = (
+        Index("ix_personas_active_gender_age", "gender", "age", postgresql_where=text("is_active")),
+        Index(
+            "ix_personas_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=text("is_active"),
+        ),
+        Index(
+            "ix_personas_bio_trgm",
+            "bio",
+            postgresql_using="gin",
+            postgresql_ops={"bio": "gin_trgm_ops"},
+            postgresql_where=text("is_active"),
+        ),
+        Index(
+            "ix_personas_attributes",
+            "attributes",
+            postgresql_using="gin",
+            postgresql_ops={"attributes": "jsonb_path_ops"},
+            postgresql_where=text("is_active"),
+        ),
+    )
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import Computed, Integer, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+# 人気順のスコア = いいね数 × 3 + 訪問ユーザー数 + 進行中セッション数 × 2
+POPULARITY_SCORE_SQL = "like_count * 3 + visitor_count + active_session_count * 2"
+
+
+class PersonaStats(Base):
+    """ペルソナごとの集計（persona_stats ワーカーが差分から更新する。ペルソナ作成時に 0 で作る）"""
+
+    __tablename__ = "persona_stats"
+
+    persona_id: Mapped[int] = mapped_column(Integer, ForeignKey("personas.id"), primary_key=True)
+    like_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    visitor_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    active_session_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    messages_24h: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    popularity_score: Mapped[int] = mapped_column(Integer, Computed(POPULARITY_SCORE_SQL, persisted=True))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_persona_stats_popularity", "popularity_score", "persona_id"),
+        Index("ix_persona_stats_trending", "messages_24h", "persona_id"),
+    )
+
+
+class PersonaMessageHour(Base):
+    """ペルソナごと・1 時間ごとのメッセージ数（直近 24 時間分だけ残す）"""
+
+    __tablename__ = "persona_message_hours"
+
+    persona_id: Mapped[int] = mapped_column(Integer, ForeignKey("personas.id"), primary_key=True)
+    hour: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    __table_args__ = (Index("ix_persona_message_hours_hour", "hour"),)
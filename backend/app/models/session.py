@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import Integer, Enum, DateTime, ForeignKey, func
+from sqlalchemy import BigInteger, Integer, String, Enum, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -21,3 +21,16 @@ class Session(Base):
     status: Mapped[SessionStatus] = mapped_column(Enum(SessionStatus), default=SessionStatus.active, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # 一覧表示用の非正規化カラム（メッセージ送信時に更新）
+    last_message_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_persona_message_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    last_persona_message_preview: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    # ユーザー側の既読位置と、それより後のペルソナのメッセージ数
+    user_last_read_message_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    user_unread_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
+    __table_args__ = (
+        Index("ix_sessions_updated_id", "updated_at", "id"),
+        Index("ix_sessions_user_updated_id", "user_id", "updated_at", "id"),
+        Index("ix_sessions_persona_updated_id", "persona_id", "updated_at", "id"),
+    )
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, String, DateTime, Index, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class StoredFile(Base):
+    """アップロード済みファイルの参照数（アバターとして使っている行の数。0 になったものは GC ワーカーが消す）"""
+
+    __tablename__ = "stored_files"
+
+    # アップロード先からの相対パス（ab/cd/<sha256>.jpg）
+    path: Mapped[str] = mapped_column(String(200), primary_key=True)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_stored_files_unreferenced", "updated_at", postgresql_where=text("ref_count = 0")),
+    )
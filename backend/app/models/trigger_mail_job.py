@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Integer, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class TriggerMailJob(Base):
+    """送信予定のトリガーメール（送信済みの行は削除する）"""
+
+    __tablename__ = "trigger_mail_jobs"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    trigger_id: Mapped[int] = mapped_column(Integer, ForeignKey("trigger_mail_settings.id"), nullable=False)
+    campaign_id: Mapped[int] = mapped_column(Integer, ForeignKey("mail_campaigns.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    due_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_trigger_mail_jobs_due_at", "due_at"),
+    )
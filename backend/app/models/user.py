@@ -1,7 +1,8 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import String, Integer, Enum, DateTime, func
+from sqlalchemy import String, Integer, Enum, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -22,5 +23,18 @@ class User(Base):
     credit_balance: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     status: Mapped[UserStatus] = mapped_column(Enum(UserStatus), default=UserStatus.active, nullable=False)
     avatar_url: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    # 画像ワーカーが作ったサムネイル {"small": URL, "medium": URL, "large": URL}
+    avatar_variants: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # 管理画面の部分一致・あいまい検索用（pg_trgm）
+    __table_args__ = (
+        Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index(
+            "ix_users_display_name_trgm",
+            "display_name",
+            postgresql_using="gin",
+            postgresql_ops={"display_name": "gin_trgm_ops"},
+        ),
+    )
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, DateTime, ForeignKey, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class UserCounter(Base):
+    """ユーザーごとの未読数（お知らせ作成・既読化・メッセージ送信/既読のたびに同じトランザクションで増減する）"""
+
+    __tablename__ = "user_counters"
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread_notifications: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    unread_messages: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,86 @@
+"""
+一覧 API 共通のカーソル（キーセット）ページネーション
+
+カーソルは「ソートキー + id」を JSON にして base64url で包んだ不透明な文字列。
+レスポンスの X-Next-Cursor ヘッダーで次ページのカーソルを返し、
+クライアントが cursor クエリに指定すると offset の代わりにキーセットで続きを取得する。
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        key = ["dt", sort_value.isoformat()]
+    elif isinstance(sort_value, date):
+        key = ["d", sort_value.isoformat()]
+    else:
+        key = ["v", sort_value]
+    raw = json.dumps([*key, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        kind, value, row_id = json.loads(raw)
+        if kind == "dt":
+            value = datetime.fromisoformat(value)
+        elif kind == "d":
+            value = date.fromisoformat(value)
+        return value, int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="カーソルが不正です")
+
+
+def paginate(
+    stmt: Select,
+    sort_column: InstrumentedAttribute,
+    id_column: InstrumentedAttribute,
+    cursor: str | None,
+    offset: int,
+    limit: int,
+    descending: bool = True,
+) -> Select:
+    """(sort_column, id) 順に並べ、cursor があればキーセット、なければ offset で絞り込む"""
+    if sort_column is id_column:
+        order_by = [id_column.desc() if descending else id_column.asc()]
+    else:
+        order_by = [
+            sort_column.desc() if descending else sort_column.asc(),
+            id_column.desc() if descending else id_column.asc(),
+        ]
+    stmt = stmt.order_by(*order_by).limit(limit)
+
+    if not cursor:
+        return stmt.offset(offset)
+
+    sort_value, row_id = decode_cursor(cursor)
+    if sort_column is id_column:
+        return stmt.where(id_column < row_id if descending else id_column > row_id)
+    key = tuple_(sort_column, id_column)
+    return stmt.where(key < (sort_value, row_id) if descending else key > (sort_value, row_id))
+
+
+def set_next_cursor(
+    response: Response,
+    items: Sequence[Any],
+    limit: int,
+    sort_key: Callable[[Any], Any] | None = None,
+) -> None:
+    """ページが埋まっていれば最後の行から次ページのカーソルを作ってヘッダーに載せる"""
+    if len(items) < limit:
+        return
+    last = items[-1]
+    sort_value = sort_key(last) if sort_key else last.id
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_value, last.id)
@@ -0,0 +1,20 @@
+from redis.asyncio import Redis
+
+from app.config import settings
+
+_redis: Redis | None = None
+
+
+def get_redis() -> Redis:
+    """プロセス内で共有する Redis クライアントを返す（初回呼び出し時に生成）"""
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(settings.redis_url, decode_responses=True)
+    return _redis
+
+
+async def close_redis() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -9,8 +9,10 @@ from app.dependencies import get_current_user, get_current_admin
 from app.models.user import User
 from app.models.staff_member import StaffMember
 from app.models.age_verification import AgeVerification, VerificationStatus
+from app.pagination import paginate, set_next_cursor
 from app.schemas.admin import AgeVerificationResponse, AgeVerificationReviewRequest
 from app.services.account_service import get_display_name_map
+from app.services.outbox_service import enqueue_notification
 
 router = APIRouter(prefix="/api/v1/age-verification", tags=["年齢認証"])
 
@@ -40,18 +42,21 @@ async def submit_verification(
 # --- 管理者側 ---
 @router.get("", response_model=list[AgeVerificationResponse])
 async def list_verifications(
+    response: Response,
     verification_status: str | None = Query(None, alias="status"),
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     admin: StaffMember = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     stmt = select(AgeVerification)
     if verification_status:
         stmt = stmt.where(AgeVerification.status == verification_status)
-    stmt = stmt.order_by(AgeVerification.submitted_at.desc()).offset(offset).limit(limit)
+    stmt = paginate(stmt, AgeVerification.submitted_at, AgeVerification.id, cursor, offset, limit)
     result = await db.execute(stmt)
     items = list(result.scalars().all())
+    set_next_cursor(response, items, limit, lambda v: v.submitted_at)
     name_map = await get_display_name_map(db, [v.user_id for v in items])
     return [
         AgeVerificationResponse.model_validate(v, from_attributes=True).model_copy(
@@ -77,6 +82,12 @@ async def review_verification(
     verification.reviewed_at = datetime.now(timezone.utc)
     verification.reviewer_id = admin.id
     db.add(verification)
+    if verification.status == VerificationStatus.approved:
+        enqueue_notification(db, verification.user_id, "system", "年齢認証が承認されました")
+    elif verification.status == VerificationStatus.rejected:
+        enqueue_notification(
+            db, verification.user_id, "system", "年齢認証が承認されませんでした", "書類を確認のうえ再申請してください"
+        )
     await db.commit()
     await db.refresh(verification)
     name_map = await get_display_name_map(db, [verification.user_id])
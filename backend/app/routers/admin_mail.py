@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -6,9 +8,16 @@ from app.database import get_db
 from app.dependencies import get_current_admin
 from app.models.staff_member import StaffMember
 from app.models.mail_campaign import MailCampaign, CampaignType, CampaignStatus, TriggerMailSetting
+from app.models.mail_delivery_run import MailDeliveryRun
+from app.pagination import paginate, set_next_cursor
+from app.services.mail_delivery_service import compile_target_filter, create_run
+from app.services.event_service import TRIGGER_EVENTS
+from app.services.schedule_service import arm_schedule, validate_campaign_schedule
+from app.services.trigger_mail_service import notify_settings_changed
 from app.schemas.admin import (
     MailCampaignCreateRequest,
     MailCampaignResponse,
+    MailDeliveryRunResponse,
     TriggerMailSettingCreateRequest,
     TriggerMailSettingResponse,
 )
@@ -18,18 +27,22 @@ router = APIRouter(prefix="/api/v1/admin/mail", tags=["管理: メール配信"]
 
 @router.get("/campaigns", response_model=list[MailCampaignResponse])
 async def list_campaigns(
+    response: Response,
     campaign_type: str | None = Query(None, alias="type"),
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     admin: StaffMember = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     stmt = select(MailCampaign)
     if campaign_type:
         stmt = stmt.where(MailCampaign.type == campaign_type)
-    stmt = stmt.order_by(MailCampaign.created_at.desc()).offset(offset).limit(limit)
+    stmt = paginate(stmt, MailCampaign.created_at, MailCampaign.id, cursor, offset, limit)
     result = await db.execute(stmt)
-    return list(result.scalars().all())
+    campaigns = list(result.scalars().all())
+    set_next_cursor(response, campaigns, limit, lambda c: c.created_at)
+    return campaigns
 
 
 @router.post("/campaigns", response_model=MailCampaignResponse, status_code=status.HTTP_201_CREATED)
@@ -38,6 +51,11 @@ async def create_campaign(
     admin: StaffMember = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
+    try:
+        compile_target_filter(body.target_filter)
+        validate_campaign_schedule(CampaignType(body.type), body.scheduled_at, body.interval)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     campaign = MailCampaign(
         type=CampaignType(body.type),
         subject=body.subject,
@@ -64,12 +82,50 @@ async def update_campaign_status(
     if campaign is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="キャンペーンが見つかりません")
     campaign.status = CampaignStatus(new_status)
+    try:
+        arm_schedule(campaign, datetime.now(timezone.utc))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     db.add(campaign)
     await db.commit()
     await db.refresh(campaign)
     return MailCampaignResponse.model_validate(campaign)
 
 
+@router.post(
+    "/campaigns/{campaign_id}/deliveries",
+    response_model=MailDeliveryRunResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def deliver_campaign(
+    campaign_id: int,
+    admin: StaffMember = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """一斉配信を開始する（送信は配信ワーカーが行う）"""
+    campaign = await db.get(MailCampaign, campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="キャンペーンが見つかりません")
+    if campaign.type != CampaignType.blast:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="一斉送信のキャンペーンではありません")
+    return await create_run(db, campaign)
+
+
+@router.get("/campaigns/{campaign_id}/deliveries", response_model=list[MailDeliveryRunResponse])
+async def list_deliveries(
+    campaign_id: int,
+    admin: StaffMember = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """配信履歴と進捗"""
+    result = await db.execute(
+        select(MailDeliveryRun)
+        .where(MailDeliveryRun.campaign_id == campaign_id)
+        .order_by(MailDeliveryRun.id.desc())
+    )
+    return list(result.scalars().all())
+
+
 # --- トリガーメール ---
 @router.get("/triggers", response_model=list[TriggerMailSettingResponse])
 async def list_triggers(
@@ -87,6 +143,13 @@ async def create_trigger(
     admin: StaffMember = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
+    if body.trigger_event not in TRIGGER_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"trigger_event は {', '.join(TRIGGER_EVENTS)} のいずれかを指定してください",
+        )
+    if await db.get(MailCampaign, body.mail_campaign_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="キャンペーンが見つかりません")
     trigger = TriggerMailSetting(
         trigger_event=body.trigger_event,
         mail_campaign_id=body.mail_campaign_id,
@@ -96,6 +159,7 @@ async def create_trigger(
     db.add(trigger)
     await db.commit()
     await db.refresh(trigger)
+    await notify_settings_changed()
     return trigger
 
 
@@ -113,4 +177,5 @@ async def toggle_trigger(
     db.add(trigger)
     await db.commit()
     await db.refresh(trigger)
+    await notify_settings_changed()
     return trigger
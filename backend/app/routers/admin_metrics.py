@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+
+from app.dependencies import get_current_admin
+from app.models.staff_member import StaffMember
+from app.schemas.admin import CacheStatsResponse
+from app.services.cache_service import get_all_stats
+
+router = APIRouter(prefix="/api/v1/admin/metrics", tags=["管理: メトリクス"])
+
+
+@router.get("/cache", response_model=list[CacheStatsResponse])
+async def get_cache_stats(
+    admin: StaffMember = Depends(get_current_admin),
+):
+    """このワーカーのキャッシュ命中数（ワーカーごとの値。合計は監視側で集計する）"""
+    return [CacheStatsResponse(namespace=namespace, **stats) for namespace, stats in get_all_stats().items()]
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -6,6 +6,7 @@ from app.database import get_db
 from app.dependencies import get_current_admin, get_current_staff
 from app.models.user import User, UserStatus
 from app.models.staff_member import StaffMember
+from app.pagination import paginate, set_next_cursor
 from app.schemas.admin import (
     AdminUserCreateRequest,
     AdminUserResponse,
@@ -13,30 +14,41 @@ from app.schemas.admin import (
     UserCountByStatus,
 )
 from app.services.auth_service import hash_password
+from app.services.principal_service import enqueue_principal_invalidation
+from app.services.user_search_service import UserSearchQuery, build_statement, similarity_score
 
 router = APIRouter(prefix="/api/v1/admin/users", tags=["管理: ユーザ管理"])
 
 
 @router.get("", response_model=list[AdminUserResponse])
 async def search_users(
-    email: str | None = Query(None),
-    display_name: str | None = Query(None),
+    response: Response,
+    email: str | None = Query(None, description="メールアドレスの部分一致"),
+    display_name: str | None = Query(None, description="表示名の部分一致"),
+    email_prefix: str | None = Query(None, description="メールアドレスの前方一致（最速）"),
+    q: str | None = Query(None, description="メールアドレス・表示名のあいまい検索（似ている順、cursor は使えない）"),
     user_status: str | None = Query(None, alias="status"),
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     staff: StaffMember = Depends(get_current_staff),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = select(User)
-    if email:
-        stmt = stmt.where(User.email.ilike(f"%{email}%"))
-    if display_name:
-        stmt = stmt.where(User.display_name.ilike(f"%{display_name}%"))
-    if user_status:
-        stmt = stmt.where(User.status == user_status)
-    stmt = stmt.order_by(User.id.desc()).offset(offset).limit(limit)
+    query = UserSearchQuery(
+        email=email, display_name=display_name, email_prefix=email_prefix, q=q, status=user_status
+    )
+    stmt = build_statement(query)
+    if query.ranked:
+        if cursor:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="q を指定した検索では offset を使ってください")
+        stmt = stmt.order_by(similarity_score(q).desc(), User.id.desc()).offset(offset).limit(limit)
+    else:
+        stmt = paginate(stmt, User.id, User.id, cursor, offset, limit)
     result = await db.execute(stmt)
-    return list(result.scalars().all())
+    users = list(result.scalars().all())
+    if not query.ranked:
+        set_next_cursor(response, users, limit)
+    return users
 
 
 @router.post("", response_model=AdminUserResponse, status_code=status.HTTP_201_CREATED)
@@ -73,6 +85,7 @@ async def update_user_status(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません")
     user.status = UserStatus(body.status)
     db.add(user)
+    enqueue_principal_invalidation(db, "user", user.id)
     await db.commit()
     await db.refresh(user)
     return user
@@ -1,7 +1,4 @@
-import time
-from pathlib import Path
-
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -9,9 +6,13 @@ from app.database import get_db
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.schemas.auth import LoginRequest, RegisterRequest, TokenResponse, UserResponse
+from app.services.account_service import enqueue_user_profile_invalidation
 from app.services.auth_service import authenticate_user, create_access_token, hash_password
+from app.services.event_service import USER_REGISTERED, emit_event
+from app.services.image_service import enqueue_variants
+from app.services.principal_service import refresh_principal
+from app.services.upload_service import receive_form_file, release, store_upload
 
-UPLOAD_DIR = Path("/app/uploads/avatars")
 ALLOWED_TYPES = {"image/jpeg", "image/png", "image/webp"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
@@ -30,6 +31,8 @@ async def register(body: RegisterRequest, db: AsyncSession = Depends(get_db)):
         hashed_password=hash_password(body.password),
     )
     db.add(user)
+    await db.flush()
+    emit_event(db, USER_REGISTERED, user.id)
     await db.commit()
     await db.refresh(user)
 
@@ -54,33 +57,22 @@ async def get_me(user: User = Depends(get_current_user)):
 
 @router.post("/avatar", response_model=UserResponse)
 async def upload_avatar(
-    file: UploadFile,
+    request: Request,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    """アバター画像をアップロードする（multipart/form-data の file。本文は認証後に上限つきで読む）"""
+    file = await receive_form_file(request, "file", MAX_FILE_SIZE)
     if file.content_type not in ALLOWED_TYPES:
         raise HTTPException(status_code=400, detail="JPEG, PNG, WebP のみアップロード可能です")
 
-    data = await file.read()
-    if len(data) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="ファイルサイズは5MB以下にしてください")
-
-    ext = file.filename.rsplit(".", 1)[-1].lower() if file.filename and "." in file.filename else "jpg"
-    filename = f"avatar_{user.id}_{int(time.time())}.{ext}"
-
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-    # 旧アバターファイルを削除
-    if user.avatar_url:
-        old_path = Path("/app") / user.avatar_url.lstrip("/")
-        if old_path.exists():
-            old_path.unlink()
-
-    filepath = UPLOAD_DIR / filename
-    with open(filepath, "wb") as f:
-        f.write(data)
-
-    user.avatar_url = f"/uploads/avatars/{filename}"
+    old_url = user.avatar_url
+    user.avatar_url = await store_upload(db, file, MAX_FILE_SIZE)
+    user.avatar_variants = None
+    await release(db, old_url)
+    enqueue_variants(db, "user", user.id, user.avatar_url)
+    enqueue_user_profile_invalidation(db, user.id)
     await db.commit()
     await db.refresh(user)
+    await refresh_principal(user)
     return user
@@ -1,20 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.database import get_db
 from app.dependencies import get_current_user, get_current_admin
 from app.models.user import User
 from app.models.staff_member import StaffMember
+from app.models.credit_transaction import CreditTransactionType
 from app.schemas.credit import CreditBalanceResponse, CreditChargeRequest
+from app.services import credit_reservation_service
 from app.services.credit_service import add_credits
+from app.services.notification_service import notify_credit
+from app.services.principal_service import enqueue_principal_invalidation, refresh_principal
 
 router = APIRouter(prefix="/api/v1/credits", tags=["クレジット"])
 
 
 @router.get("/balance", response_model=CreditBalanceResponse)
 async def get_balance(user: User = Depends(get_current_user)):
-    return CreditBalanceResponse(credit_balance=user.credit_balance)
+    # 予約中で未使用の分も利用可能な残高として見せる
+    reserved = await credit_reservation_service.get_remaining(user.id)
+    return CreditBalanceResponse(credit_balance=user.credit_balance + reserved)
 
 
 @router.post("/charge", response_model=CreditBalanceResponse)
@@ -25,9 +31,10 @@ async def charge_credits(
 ):
     if body.amount <= 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="チャージ金額は1以上にしてください")
-    await add_credits(db, user, body.amount)
+    new_balance = await add_credits(db, user.id, body.amount, CreditTransactionType.charge)
     await db.commit()
-    await db.refresh(user)
+    set_committed_value(user, "credit_balance", new_balance)
+    await refresh_principal(user)
     return CreditBalanceResponse(credit_balance=user.credit_balance)
 
 
@@ -38,11 +45,10 @@ async def grant_credits(
     admin: StaffMember = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(User).where(User.id == user_id))
-    target = result.scalar_one_or_none()
-    if target is None:
+    new_balance = await add_credits(db, user_id, body.amount, CreditTransactionType.grant)
+    if new_balance is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません")
-    await add_credits(db, target, body.amount)
+    enqueue_principal_invalidation(db, "user", user_id)
+    notify_credit(db, user_id, body.amount)
     await db.commit()
-    await db.refresh(target)
-    return CreditBalanceResponse(credit_balance=target.credit_balance)
+    return CreditBalanceResponse(credit_balance=new_balance)
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -9,7 +9,9 @@ from app.dependencies import get_current_user, get_current_staff
 from app.models.user import User
 from app.models.staff_member import StaffMember
 from app.models.footprint import Footprint
+from app.pagination import paginate, set_next_cursor
 from app.schemas.footprint import FootprintCreateRequest, FootprintResponse
+from app.services.persona_stats_service import enqueue_stats
 
 router = APIRouter(prefix="/api/v1/footprints", tags=["足跡"])
 
@@ -37,6 +39,8 @@ async def record_footprint(
 
     footprint = Footprint(user_id=user.id, persona_id=body.persona_id)
     db.add(footprint)
+    # 足跡はユーザー×ペルソナで 1 行なので、新しい行の分だけ訪問ユーザー数が増える
+    enqueue_stats(db, body.persona_id, visitors=1)
     await db.commit()
     await db.refresh(footprint)
     return footprint
@@ -44,36 +48,34 @@ async def record_footprint(
 
 @router.get("/mine", response_model=list[FootprintResponse])
 async def list_my_footprints(
+    response: Response,
     offset: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = (
-        select(Footprint)
-        .where(Footprint.user_id == user.id)
-        .order_by(Footprint.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-    )
+    stmt = select(Footprint).where(Footprint.user_id == user.id)
+    stmt = paginate(stmt, Footprint.created_at, Footprint.id, cursor, offset, limit)
     result = await db.execute(stmt)
-    return list(result.scalars().all())
+    footprints = list(result.scalars().all())
+    set_next_cursor(response, footprints, limit, lambda f: f.created_at)
+    return footprints
 
 
 @router.get("/persona/{persona_id}", response_model=list[FootprintResponse])
 async def list_persona_footprints(
     persona_id: int,
+    response: Response,
     offset: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     staff: StaffMember = Depends(get_current_staff),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = (
-        select(Footprint)
-        .where(Footprint.persona_id == persona_id)
-        .order_by(Footprint.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-    )
+    stmt = select(Footprint).where(Footprint.persona_id == persona_id)
+    stmt = paginate(stmt, Footprint.created_at, Footprint.id, cursor, offset, limit)
     result = await db.execute(stmt)
-    return list(result.scalars().all())
+    footprints = list(result.scalars().all())
+    set_next_cursor(response, footprints, limit, lambda f: f.created_at)
+    return footprints
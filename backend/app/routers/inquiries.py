@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -9,6 +9,7 @@ from app.dependencies import get_current_user, get_current_admin
 from app.models.user import User
 from app.models.staff_member import StaffMember
 from app.models.inquiry import Inquiry, InquiryStatus
+from app.pagination import paginate, set_next_cursor
 from app.schemas.admin import InquiryCreateRequest, InquiryReplyRequest, InquiryResponse
 from app.services.account_service import get_display_name_map
 
@@ -42,18 +43,21 @@ async def list_my_inquiries(
 # --- 管理者側 ---
 @router.get("", response_model=list[InquiryResponse])
 async def list_all_inquiries(
+    response: Response,
     inquiry_status: str | None = Query(None, alias="status"),
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     admin: StaffMember = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     stmt = select(Inquiry)
     if inquiry_status:
         stmt = stmt.where(Inquiry.status == inquiry_status)
-    stmt = stmt.order_by(Inquiry.created_at.desc()).offset(offset).limit(limit)
+    stmt = paginate(stmt, Inquiry.created_at, Inquiry.id, cursor, offset, limit)
     result = await db.execute(stmt)
     inquiries = list(result.scalars().all())
+    set_next_cursor(response, inquiries, limit, lambda inq: inq.created_at)
     name_map = await get_display_name_map(db, [inq.user_id for inq in inquiries])
     return [
         InquiryResponse.model_validate(inq, from_attributes=True).model_copy(
@@ -1,7 +1,7 @@
 import secrets
 from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -10,6 +10,7 @@ from app.dependencies import get_current_admin
 from app.models.user import User
 from app.models.staff_member import StaffMember
 from app.models.invitation import InvitationToken
+from app.pagination import paginate, set_next_cursor
 from app.schemas.auth import TokenResponse
 from app.schemas.invitation import (
     InvitationCreateRequest,
@@ -18,6 +19,7 @@ from app.schemas.invitation import (
     InvitationVerifyResponse,
 )
 from app.services.auth_service import create_access_token, hash_password
+from app.services.event_service import USER_REGISTERED, emit_event
 
 router = APIRouter(prefix="/api/v1/invitations", tags=["招待"])
 
@@ -58,19 +60,17 @@ async def create_invitation(
 
 @router.get("", response_model=list[InvitationResponse])
 async def list_invitations(
+    response: Response,
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     admin: StaffMember = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = (
-        select(InvitationToken)
-        .order_by(InvitationToken.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-    )
+    stmt = paginate(select(InvitationToken), InvitationToken.created_at, InvitationToken.id, cursor, offset, limit)
     result = await db.execute(stmt)
     invitations = list(result.scalars().all())
+    set_next_cursor(response, invitations, limit, lambda inv: inv.created_at)
     return [
         {
             **{c.name: getattr(inv, c.name) for c in inv.__table__.columns},
@@ -114,6 +114,7 @@ async def register_by_invitation(
     )
     db.add(user)
     await db.flush()
+    emit_event(db, USER_REGISTERED, user.id, {"invitation_id": invitation.id})
 
     # トークンを使用済みに更新
     invitation.used_at = datetime.now(timezone.utc)
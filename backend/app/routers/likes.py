@@ -7,6 +7,9 @@ from app.dependencies import get_current_user
 from app.models.user import User
 from app.models.like import Like
 from app.schemas.like import LikeRequest, LikeResponse
+from app.services.event_service import LIKE_SENT, emit_event
+from app.services.notification_service import notify_like
+from app.services.persona_stats_service import enqueue_stats
 
 router = APIRouter(prefix="/api/v1/likes", tags=["いいね"])
 
@@ -25,6 +28,9 @@ async def send_like(
 
     like = Like(user_id=user.id, persona_id=body.persona_id)
     db.add(like)
+    emit_event(db, LIKE_SENT, user.id, {"persona_id": body.persona_id})
+    notify_like(db, user.id, body.persona_id)
+    enqueue_stats(db, body.persona_id, likes=1)
     await db.commit()
     await db.refresh(like)
     return like
@@ -41,6 +47,7 @@ async def remove_like(
     )
     if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="いいねが見つかりません")
+    enqueue_stats(db, persona_id, likes=-1)
     await db.commit()
 
 
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.models.user import User
+from app.schemas.me import CountersResponse
+from app.services.counter_service import get_counters
+
+router = APIRouter(prefix="/api/v1/me", tags=["マイページ"])
+
+
+@router.get("/counters", response_model=CountersResponse)
+async def get_my_counters(
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    counters = await get_counters(db, user.id)
+    return CountersResponse(unread_notifications=counters.notifications, unread_messages=counters.messages)
@@ -1,24 +1,40 @@
+import asyncio
 from typing import Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.dependencies import get_current_account
+from app.config import settings
+from app.database import async_session, get_db
+from app.dependencies import get_current_account, get_current_staff, resolve_account
 from app.models.user import User
 from app.models.staff_member import StaffMember
-from app.models.message import Message, SenderType
-from app.models.session import Session, SessionStatus
-from app.schemas.message import MessagePollResponse, MessageResponse, MessageSendRequest
-from app.services.account_service import get_display_name_map
-from app.services.credit_service import deduct_credits
-from app.services.message_service import get_messages_after
+from app.schemas.message import (
+    AttachmentResponse,
+    MessageBatchItemResult,
+    MessageBatchSendRequest,
+    MessageBatchSendResponse,
+    MessagePollResponse,
+    MessageResponse,
+    MessageSendRequest,
+    MessageSocketSendRequest,
+)
+from app.models.message import SenderType
+from app.services.account_service import get_profiles
+from app.services.attachment_service import create_attachment, get_attachment_for_account
+from app.services.message_service import (
+    BatchSendItem,
+    create_message,
+    create_persona_messages_batch,
+    get_messages_after,
+    get_session_for_account,
+)
+from app.services.realtime_service import session_channel, subscribe
+from app.services.upload_service import private_file_response
 
 router = APIRouter(prefix="/api/v1/messages", tags=["メッセージ"])
 
-CREDIT_COST_PER_MESSAGE = 1
-
 
 @router.post("/send", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def send_message(
@@ -26,62 +42,195 @@ async def send_message(
     account: Union[User, StaffMember] = Depends(get_current_account),
     db: AsyncSession = Depends(get_db),
 ):
-    # セッション存在確認 + 権限チェック
-    result = await db.execute(select(Session).where(Session.id == body.session_id))
-    session = result.scalar_one_or_none()
-    if session is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="セッションが見つかりません")
-    if isinstance(account, User) and session.user_id != account.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="権限がありません")
-    if session.status != SessionStatus.active:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="このセッションは終了しています")
-
-    # ユーザーの場合はクレジット減算
-    if isinstance(account, User):
-        await deduct_credits(db, account, CREDIT_COST_PER_MESSAGE)
-        sender_type = SenderType.user
-    else:
-        sender_type = SenderType.persona
-
-    message = Message(
-        session_id=body.session_id,
-        sender_type=sender_type,
-        sender_id=account.id,
-        title=body.title,
+    session = await get_session_for_account(db, body.session_id, account)
+    return await create_message(
+        db,
+        session,
+        account,
         content=body.content,
+        title=body.title,
         image_url=body.image_url,
-        credit_cost=CREDIT_COST_PER_MESSAGE if sender_type == SenderType.user else 0,
+        attachment_id=body.attachment_id,
+    )
+
+
+@router.post("/attachments", response_model=AttachmentResponse, status_code=status.HTTP_201_CREATED)
+async def upload_attachment(
+    request: Request,
+    account: Union[User, StaffMember] = Depends(get_current_account),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    チャットの添付画像をアップロードする（multipart/form-data の file）
+
+    本文は認証を確認してから読み、ATTACHMENT_MAX_BYTES を超えた時点で 413 を返す。
+    返した id を送信時の attachment_id に指定する。
+    """
+    return await create_attachment(db, request, account)
+
+
+@router.get("/attachments/{attachment_id}")
+async def get_attachment_original(
+    attachment_id: int,
+    account: Union[User, StaffMember] = Depends(get_current_account),
+    db: AsyncSession = Depends(get_db),
+):
+    """添付画像の元画像（アップロードした本人・そのメッセージを受け取ったユーザー・スタッフのみ）"""
+    attachment = await get_attachment_for_account(db, attachment_id, account)
+    return private_file_response(attachment.original_url)
+
+
+@router.post("/send-batch", response_model=MessageBatchSendResponse)
+async def send_message_batch(
+    body: MessageBatchSendRequest,
+    staff: StaffMember = Depends(get_current_staff),
+    db: AsyncSession = Depends(get_db),
+):
+    """複数セッションへの一括送信（項目ごとの成否を返す）"""
+    items = [
+        BatchSendItem(
+            session_id=item.session_id,
+            content=item.content,
+            template_id=item.template_id,
+            title=item.title,
+            image_url=item.image_url,
+            attachment_id=item.attachment_id,
+        )
+        for item in body.items
+    ]
+    results = await create_persona_messages_batch(db, staff, items)
+    response_items = [
+        MessageBatchItemResult(
+            session_id=item.session_id,
+            success=result.message is not None,
+            message=MessageResponse.model_validate(result.message) if result.message is not None else None,
+            error=result.error,
+        )
+        for item, result in zip(items, results)
+    ]
+    sent_count = sum(1 for r in response_items if r.success)
+    return MessageBatchSendResponse(
+        results=response_items, sent_count=sent_count, failed_count=len(response_items) - sent_count
     )
-    db.add(message)
-    await db.commit()
-    await db.refresh(message)
-    return message
 
 
 @router.get("/poll", response_model=MessagePollResponse)
 async def poll_messages(
     session_id: int = Query(...),
     last_message_id: int = Query(0),
+    wait: int = Query(0, ge=0, le=settings.poll_max_wait_seconds, description="新着がない場合に待機する最大秒数"),
     account: Union[User, StaffMember] = Depends(get_current_account),
     db: AsyncSession = Depends(get_db),
 ):
     # セッション権限チェック
-    result = await db.execute(select(Session).where(Session.id == session_id))
-    session = result.scalar_one_or_none()
-    if session is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="セッションが見つかりません")
-    if isinstance(account, User) and session.user_id != account.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="権限がありません")
-
-    messages = await get_messages_after(db, session_id, last_message_id)
+    session = await get_session_for_account(db, session_id, account)
+
+    if wait:
+        # 取りこぼしを防ぐため、差分取得より先に購読を開始する
+        async with subscribe(session_channel(session_id)) as subscription:
+            messages = await get_messages_after(db, session_id, last_message_id)
+            if not messages:
+                # 待機中は DB 接続をプールに返す
+                await db.close()
+                if await subscription.wait(timeout=wait) is not None:
+                    messages = await get_messages_after(db, session_id, last_message_id)
+    else:
+        messages = await get_messages_after(db, session_id, last_message_id)
     new_last_id = messages[-1].id if messages else last_message_id or None
-    name_map = await get_display_name_map(db, [m.sender_id for m in messages])
+    # ペルソナ側の sender_id はスタッフの ID なので、表示名はセッションのペルソナ名を使う
+    user_profiles, persona_profiles = await get_profiles(
+        db,
+        user_ids=[m.sender_id for m in messages if m.sender_type == SenderType.user],
+        persona_ids=[session.persona_id] if messages else [],
+    )
+    persona = persona_profiles.get(session.persona_id)
+
+    def sender_display_name(m) -> str | None:
+        if m.sender_type == SenderType.persona:
+            return persona.name if persona else None
+        user = user_profiles.get(m.sender_id)
+        return user.display_name if user else None
+
     return MessagePollResponse(
         messages=[
             MessageResponse.model_validate(m).model_copy(
-                update={"sender_display_name": name_map.get(m.sender_id)}
+                update={"sender_display_name": sender_display_name(m)}
             )
             for m in messages
         ],
         last_message_id=new_last_id,
     )
+
+
+@router.websocket("/ws/{session_id}")
+async def message_socket(
+    websocket: WebSocket,
+    session_id: int,
+    token: str = Query(...),
+):
+    """
+    セッション単位のチャット WebSocket
+
+    ブラウザの WebSocket はヘッダーを付けられないため JWT はクエリ文字列で受け取る。
+    サーバー → クライアント: {"type": "message", "message": MessageResponse}
+    クライアント → サーバー: {"type": "send", "content": ..., "title": ..., "image_url": ..., "attachment_id": ...}
+    """
+    # 認証と権限チェックは接続時の 1 回だけ行い、以降は接続に紐づけて使い回す
+    async with async_session() as db:
+        try:
+            account = await resolve_account(db, token)
+            await get_session_for_account(db, session_id, account)
+        except HTTPException as e:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+            return
+
+    await websocket.accept()
+    async with subscribe(session_channel(session_id)) as subscription:
+        receiver = asyncio.create_task(_receive_sends(websocket, session_id, account))
+        try:
+            while not receiver.done():
+                event = await subscription.wait(timeout=1.0)
+                if event is None or "message" not in event:
+                    continue
+                await websocket.send_json({"type": "message", "message": event["message"]})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
+
+
+async def _receive_sends(
+    websocket: WebSocket, session_id: int, account: Union[User, StaffMember]
+) -> None:
+    while True:
+        try:
+            data = await websocket.receive_json()
+        except (WebSocketDisconnect, ValueError):
+            return
+        try:
+            body = MessageSocketSendRequest.model_validate(data)
+        except ValidationError:
+            await websocket.send_json({"type": "error", "detail": "不正なリクエストです"})
+            continue
+
+        async with async_session() as db:
+            try:
+                session = await get_session_for_account(db, session_id, account)
+                # クレジット残高は接続時点の値を使わず、送信ごとに最新の行を読む
+                sender = await db.get(User, account.id) if isinstance(account, User) else account
+                if sender is None:
+                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="アカウントが見つかりません")
+                message = await create_message(
+                    db,
+                    session,
+                    sender,
+                    content=body.content,
+                    title=body.title,
+                    image_url=body.image_url,
+                    attachment_id=body.attachment_id,
+                )
+            except HTTPException as e:
+                await db.rollback()
+                await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+                continue
+        await websocket.send_json({"type": "ack", "message_id": message.id})
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -6,25 +6,31 @@ from app.database import get_db
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.models.notification import Notification
+from app.pagination import paginate, set_next_cursor
 from app.schemas.notification import NotificationResponse
+from app.services.counter_service import remove_unread_notifications
 
 router = APIRouter(prefix="/api/v1/notifications", tags=["お知らせ"])
 
 
 @router.get("", response_model=list[NotificationResponse])
 async def list_notifications(
+    response: Response,
     unread_only: bool = Query(False),
     offset: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     stmt = select(Notification).where(Notification.user_id == user.id)
     if unread_only:
         stmt = stmt.where(Notification.is_read == False)
-    stmt = stmt.order_by(Notification.created_at.desc()).offset(offset).limit(limit)
+    stmt = paginate(stmt, Notification.created_at, Notification.id, cursor, offset, limit)
     result = await db.execute(stmt)
-    return list(result.scalars().all())
+    notifications = list(result.scalars().all())
+    set_next_cursor(response, notifications, limit, lambda n: n.created_at)
+    return notifications
 
 
 @router.patch("/{notification_id}/read", response_model=NotificationResponse)
@@ -34,15 +40,23 @@ async def mark_as_read(
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(
-        select(Notification).where(Notification.id == notification_id, Notification.user_id == user.id)
+        update(Notification)
+        .where(Notification.id == notification_id, Notification.user_id == user.id, Notification.is_read == False)
+        .values(is_read=True)
+        .returning(Notification)
     )
     notification = result.scalar_one_or_none()
     if notification is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="お知らせが見つかりません")
-    notification.is_read = True
-    db.add(notification)
+        # 既読済みなら未読数は変えずにそのまま返す
+        result = await db.execute(
+            select(Notification).where(Notification.id == notification_id, Notification.user_id == user.id)
+        )
+        notification = result.scalar_one_or_none()
+        if notification is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="お知らせが見つかりません")
+        return notification
+    await remove_unread_notifications(db, user.id, 1)
     await db.commit()
-    await db.refresh(notification)
     return notification
 
 
@@ -51,9 +65,10 @@ async def mark_all_as_read(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    await db.execute(
+    result = await db.execute(
         update(Notification)
         .where(Notification.user_id == user.id, Notification.is_read == False)
         .values(is_read=True)
     )
+    await remove_unread_notifications(db, user.id, result.rowcount)
     await db.commit()
@@ -1,35 +1,88 @@
-import time
-from pathlib import Path
-from typing import Union
+from typing import Literal, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 
-UPLOAD_DIR = Path("/app/uploads/personas")
 ALLOWED_TYPES = {"image/jpeg", "image/png", "image/webp"}
 MAX_FILE_SIZE = 5 * 1024 * 1024
 from app.dependencies import get_current_account, get_current_admin, get_current_staff
 from app.models.user import User
 from app.models.staff_member import StaffMember, StaffRole
-from app.models.persona import Persona
+from app.models.persona import Gender, Persona
+from app.models.persona_stats import PersonaStats
+from app.pagination import paginate, set_next_cursor
 from app.schemas.persona import PersonaCreateRequest, PersonaResponse, PersonaUpdateRequest
+from app.services.account_service import enqueue_persona_profile_invalidation
+from app.services.image_service import enqueue_variants
+from app.services.persona_search_service import PersonaSearchQuery, parse_attribute_filters, search, to_grid_response
+from app.services.upload_service import receive_form_file, release, retain, store_upload
 
 router = APIRouter(prefix="/api/v1/personas", tags=["ペルソナ"])
 
 
 @router.get("", response_model=list[PersonaResponse])
 async def list_personas(
+    response: Response,
+    sort: Literal["popular", "trending"] | None = Query(
+        None, description="popular: 人気順 / trending: 直近 24 時間のメッセージ数順（省略時は登録順）"
+    ),
     offset: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor（指定時は offset を無視）"),
     account: Union[User, StaffMember] = Depends(get_current_account),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = select(Persona).where(Persona.is_active == True).offset(offset).limit(limit)
+    if sort is None:
+        stmt = select(Persona).where(Persona.is_active == True)
+        stmt = paginate(stmt, Persona.id, Persona.id, cursor, offset, limit, descending=False)
+        result = await db.execute(stmt)
+        personas = list(result.scalars().all())
+        set_next_cursor(response, personas, limit)
+        return [to_grid_response(p) for p in personas]
+
+    # persona_stats の (スコア, persona_id) インデックスを降順にたどる
+    score = PersonaStats.popularity_score if sort == "popular" else PersonaStats.messages_24h
+    stmt = (
+        select(Persona, score)
+        .join(PersonaStats, PersonaStats.persona_id == Persona.id)
+        .where(Persona.is_active == True)
+    )
+    stmt = paginate(stmt, score, PersonaStats.persona_id, cursor, offset, limit)
     result = await db.execute(stmt)
-    return list(result.scalars().all())
+    rows = result.all()
+    personas = [row[0] for row in rows]
+    scores = {row[0].id: row[1] for row in rows}
+    set_next_cursor(response, personas, limit, lambda p: scores[p.id])
+    return [to_grid_response(p) for p in personas]
+
+
+@router.get("/search", response_model=list[PersonaResponse])
+async def search_personas(
+    response: Response,
+    q: str | None = Query(None, max_length=100, description="名前・自己紹介に含まれる語（空白区切りで AND）"),
+    name: str | None = Query(None, max_length=100),
+    gender: Gender | None = Query(None),
+    min_age: int | None = Query(None, ge=0),
+    max_age: int | None = Query(None, ge=0),
+    attr: list[str] = Query([], description="attributes の条件（key:value、複数指定で AND）"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor"),
+    account: Union[User, StaffMember] = Depends(get_current_account),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        attributes = parse_attribute_filters(attr)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    query = PersonaSearchQuery(
+        q=q, name=name, gender=gender, min_age=min_age, max_age=max_age, attributes=attributes
+    )
+    personas = await search(db, query, cursor, limit)
+    set_next_cursor(response, personas, limit)
+    return personas
 
 
 @router.get("/{persona_id}", response_model=PersonaResponse)
@@ -62,6 +115,12 @@ async def create_persona(
         registered_at=body.registered_at,
     )
     db.add(persona)
+    await db.flush()
+    if persona.avatar_url:
+        await retain(db, persona.avatar_url)
+        enqueue_variants(db, "persona", persona.id, persona.avatar_url)
+    # 人気順の一覧は persona_stats と内部結合するので、作成時に 0 件の行を作っておく
+    db.add(PersonaStats(persona_id=persona.id))
     await db.commit()
     await db.refresh(persona)
     return persona
@@ -82,10 +141,19 @@ async def update_persona(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="権限がありません")
 
     update_data = body.model_dump(exclude_unset=True)
+    old_avatar_url = persona.avatar_url
     for key, value in update_data.items():
         setattr(persona, key, value)
+    if persona.avatar_url != old_avatar_url:
+        # 他のペルソナのアップロード済み画像を指定した場合も参照数を合わせる
+        await retain(db, persona.avatar_url)
+        await release(db, old_avatar_url)
+        persona.avatar_variants = None
+        if persona.avatar_url:
+            enqueue_variants(db, "persona", persona.id, persona.avatar_url)
 
     db.add(persona)
+    enqueue_persona_profile_invalidation(db, persona.id)
     await db.commit()
     await db.refresh(persona)
     return persona
@@ -94,17 +162,11 @@ async def update_persona(
 @router.post("/{persona_id}/avatar", response_model=PersonaResponse)
 async def upload_persona_avatar(
     persona_id: int,
-    file: UploadFile,
+    request: Request,
     staff: StaffMember = Depends(get_current_staff),
     db: AsyncSession = Depends(get_db),
 ):
-    if file.content_type not in ALLOWED_TYPES:
-        raise HTTPException(status_code=400, detail="JPEG, PNG, WebP のみアップロード可能です")
-
-    data = await file.read()
-    if len(data) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="ファイルサイズは5MB以下にしてください")
-
+    """ペルソナのアバター画像をアップロードする（multipart/form-data の file。本文は権限確認後に上限つきで読む）"""
     result = await db.execute(select(Persona).where(Persona.id == persona_id))
     persona = result.scalar_one_or_none()
     if persona is None:
@@ -112,21 +174,16 @@ async def upload_persona_avatar(
     if persona.staff_id != staff.id and staff.role != StaffRole.admin:
         raise HTTPException(status_code=403, detail="権限がありません")
 
-    ext = file.filename.rsplit(".", 1)[-1].lower() if file.filename and "." in file.filename else "jpg"
-    filename = f"persona_{persona_id}_{int(time.time())}.{ext}"
-
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-    if persona.avatar_url:
-        old_path = Path("/app") / persona.avatar_url.lstrip("/")
-        if old_path.exists():
-            old_path.unlink()
-
-    filepath = UPLOAD_DIR / filename
-    with open(filepath, "wb") as f:
-        f.write(data)
+    file = await receive_form_file(request, "file", MAX_FILE_SIZE)
+    if file.content_type not in ALLOWED_TYPES:
+        raise HTTPException(status_code=400, detail="JPEG, PNG, WebP のみアップロード可能です")
 
-    persona.avatar_url = f"/uploads/personas/{filename}"
+    old_url = persona.avatar_url
+    persona.avatar_url = await store_upload(db, file, MAX_FILE_SIZE)
+    persona.avatar_variants = None
+    await release(db, old_url)
+    enqueue_variants(db, "persona", persona.id, persona.avatar_url)
+    enqueue_persona_profile_invalidation(db, persona.id)
     await db.commit()
     await db.refresh(persona)
     return persona
@@ -139,4 +196,4 @@ async def list_my_personas(
 ):
     stmt = select(Persona).where(Persona.staff_id == staff.id).order_by(Persona.created_at.desc())
     result = await db.execute(stmt)
-    return list(result.scalars().all())
+    return [to_grid_response(p) for p in result.scalars().all()]
@@ -1,26 +1,31 @@
-from typing import Union
+import asyncio
+import json
+from typing import AsyncIterator, Literal, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.dependencies import get_current_account, get_current_user
+from app.dependencies import get_current_account, get_current_staff_for_stream, get_current_user
 from app.models.user import User
 from app.models.staff_member import StaffMember, StaffRole
 from app.models.persona import Persona
 from app.models.session import Session, SessionStatus
-from app.models.message import Message, SenderType
-from app.schemas.session import SessionCreateRequest, SessionResponse
-from app.services.account_service import (
-    get_display_name_map,
-    get_persona_name_map,
-    get_user_avatar_map,
-    get_persona_avatar_map,
-)
+from app.pagination import paginate, set_next_cursor
+from app.schemas.session import SessionCreateRequest, SessionReadRequest, SessionReadResponse, SessionResponse
+from app.services import credit_reservation_service
+from app.services.account_service import PersonaProfile, UserProfile, get_profiles
+from app.services.counter_service import mark_session_read
+from app.services.message_service import enqueue_session_status
+from app.services.persona_stats_service import enqueue_stats
+from app.services.realtime_service import INBOX_ALL_CHANNEL, Subscription, inbox_persona_channel, subscribe
 
 router = APIRouter(prefix="/api/v1/sessions", tags=["セッション"])
 
+INBOX_HEARTBEAT_SECONDS = 15
+
 
 @router.post("", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
 async def create_session(
@@ -45,8 +50,11 @@ async def create_session(
     if existing_session:
         return existing_session
 
-    session = Session(user_id=user.id, persona_id=body.persona_id)
+    session = Session(user_id=user.id, persona_id=body.persona_id, status=SessionStatus.active)
     db.add(session)
+    await db.flush()
+    enqueue_session_status(db, session)
+    enqueue_stats(db, session.persona_id, active_sessions=1)
     await db.commit()
     await db.refresh(session)
     return session
@@ -54,76 +62,74 @@ async def create_session(
 
 @router.get("", response_model=list[SessionResponse])
 async def list_sessions(
+    response: Response,
     session_status: str | None = Query(None, alias="status"),
+    order: Literal["activity", "created"] = Query(
+        "activity", description="activity: 最終更新の新しい順 / created: 作成の新しい順（ページ送り中も順序が変わらない）"
+    ),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="前ページの X-Next-Cursor"),
     account: Union[User, StaffMember] = Depends(get_current_account),
     db: AsyncSession = Depends(get_db),
 ):
+    """
+    セッション一覧
+
+    activity 順の updated_at はメッセージのたびに進むため、ページ送り中に更新されたセッションは
+    一覧の先頭へ移る。キーセットより前に移るので続きのページで重複はしないが、まだ返していない
+    セッションが移った場合は続きのページに出ない（受信箱のイベントか 1 ページ目の再取得で拾う）。
+    全件をもれなくたどる場合は order=created（id 順）を使う。
+    """
     if isinstance(account, StaffMember):
-        # スタッフ/管理者: 自分が担当するペルソナのセッションを返す
-        my_persona_ids = await db.execute(
-            select(Persona.id).where(Persona.staff_id == account.id)
-        )
-        persona_ids = [row[0] for row in my_persona_ids.all()]
         if account.role == StaffRole.admin:
             # 管理者は全セッション
             stmt = select(Session)
-        elif persona_ids:
-            stmt = select(Session).where(Session.persona_id.in_(persona_ids))
         else:
-            return []
+            # スタッフ: 自分が担当するペルソナのセッションを返す
+            stmt = select(Session).join(Persona, Persona.id == Session.persona_id).where(
+                Persona.staff_id == account.id
+            )
     else:
         # 一般ユーザー: 自分のセッションのみ
         stmt = select(Session).where(Session.user_id == account.id)
 
     if session_status:
         stmt = stmt.where(Session.status == session_status)
-    stmt = stmt.order_by(Session.updated_at.desc())
-    result = await db.execute(stmt)
-    sessions = list(result.scalars().all())
-    user_ids = [s.user_id for s in sessions]
-    persona_ids = [s.persona_id for s in sessions]
-    name_map = await get_display_name_map(db, user_ids)
-    user_avatar_map = await get_user_avatar_map(db, user_ids)
-    persona_map = await get_persona_name_map(db, persona_ids)
-    persona_avatar_map = await get_persona_avatar_map(db, persona_ids)
-
-    # 各セッションの最新ペルソナメッセージを取得
-    session_ids = [s.id for s in sessions]
-    last_msg_map: dict[int, str] = {}
-    if session_ids:
-        # セッションごとの最新ペルソナメッセージIDを取得
-        sub = (
-            select(
-                Message.session_id,
-                func.max(Message.id).label("max_id"),
-            )
-            .where(
-                Message.session_id.in_(session_ids),
-                Message.sender_type == SenderType.persona,
-            )
-            .group_by(Message.session_id)
-            .subquery()
-        )
-        stmt_msg = select(Message).join(
-            sub,
-            (Message.session_id == sub.c.session_id) & (Message.id == sub.c.max_id),
-        )
-        msg_result = await db.execute(stmt_msg)
-        for msg in msg_result.scalars().all():
-            last_msg_map[msg.session_id] = msg.content
-
-    return [
-        SessionResponse.model_validate(s, from_attributes=True).model_copy(
-            update={
-                "user_display_name": name_map.get(s.user_id),
-                "user_avatar_url": user_avatar_map.get(s.user_id),
-                "persona_name": persona_map.get(s.persona_id),
-                "persona_avatar_url": persona_avatar_map.get(s.persona_id),
-                "last_persona_message": last_msg_map.get(s.id),
-            }
-        )
-        for s in sessions
-    ]
+    if order == "created":
+        stmt = paginate(stmt, Session.id, Session.id, cursor, 0, limit)
+        result = await db.execute(stmt)
+        sessions = list(result.scalars().all())
+        set_next_cursor(response, sessions, limit)
+    else:
+        stmt = paginate(stmt, Session.updated_at, Session.id, cursor, 0, limit)
+        result = await db.execute(stmt)
+        sessions = list(result.scalars().all())
+        set_next_cursor(response, sessions, limit, lambda s: s.updated_at)
+
+    user_profiles, persona_profiles = await get_profiles(
+        db,
+        user_ids=[s.user_id for s in sessions],
+        persona_ids=[s.persona_id for s in sessions],
+    )
+    return [_to_session_response(s, user_profiles, persona_profiles) for s in sessions]
+
+
+def _to_session_response(
+    session: Session,
+    user_profiles: dict[int, UserProfile],
+    persona_profiles: dict[int, PersonaProfile],
+) -> SessionResponse:
+    user = user_profiles.get(session.user_id)
+    persona = persona_profiles.get(session.persona_id)
+    return SessionResponse.model_validate(session, from_attributes=True).model_copy(
+        update={
+            "user_display_name": user.display_name if user else None,
+            "user_avatar_url": user.avatar_url if user else None,
+            "persona_name": persona.name if persona else None,
+            "persona_avatar_url": persona.avatar_url if persona else None,
+            "last_persona_message": session.last_persona_message_preview,
+        }
+    )
 
 
 @router.patch("/{session_id}/close", response_model=SessionResponse)
@@ -139,8 +145,77 @@ async def close_session(
     if isinstance(account, User) and session.user_id != account.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="権限がありません")
 
+    if session.status == SessionStatus.active:
+        enqueue_stats(db, session.persona_id, active_sessions=-1)
     session.status = SessionStatus.closed
     db.add(session)
+    enqueue_session_status(db, session)
     await db.commit()
     await db.refresh(session)
+    # 予約クレジットの未使用分を残高に戻す
+    await credit_reservation_service.settle_user(session.user_id)
     return session
+
+
+@router.patch("/{session_id}/read", response_model=SessionReadResponse)
+async def read_session(
+    session_id: int,
+    body: SessionReadRequest | None = None,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(select(Session).where(Session.id == session_id, Session.user_id == user.id))
+    session = result.scalar_one_or_none()
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="セッションが見つかりません")
+    last_read_message_id, unread_count = await mark_session_read(db, session, body.message_id if body else None)
+    await db.commit()
+    return SessionReadResponse(
+        session_id=session.id, last_read_message_id=last_read_message_id, unread_count=unread_count
+    )
+
+
+@router.get("/stream")
+async def stream_inbox(
+    staff: StaffMember = Depends(get_current_staff_for_stream),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    スタッフ受信箱の差分を Server-Sent Events で配信する
+
+    staff は担当ペルソナのセッション、admin は全セッションのイベントを受け取る。
+    event: message（新着メッセージ） / session（セッション作成・終了）
+    """
+    if staff.role == StaffRole.admin:
+        channels = [INBOX_ALL_CHANNEL]
+    else:
+        result = await db.execute(select(Persona.id).where(Persona.staff_id == staff.id))
+        channels = [inbox_persona_channel(row[0]) for row in result.all()]
+    # ストリーム中は DB 接続を保持しない
+    await db.close()
+
+    async def event_stream() -> AsyncIterator[str]:
+        yield "retry: 3000\n\n"
+        if not channels:
+            # 担当ペルソナがない場合もハートビートだけ返して接続を維持する
+            while True:
+                yield ": heartbeat\n\n"
+                await asyncio.sleep(INBOX_HEARTBEAT_SECONDS)
+        async with subscribe(*channels) as subscription:
+            async for chunk in _format_inbox_events(subscription):
+                yield chunk
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _format_inbox_events(subscription: Subscription) -> AsyncIterator[str]:
+    while True:
+        event = await subscription.wait(timeout=INBOX_HEARTBEAT_SECONDS)
+        if event is None:
+            yield ": heartbeat\n\n"
+            continue
+        yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
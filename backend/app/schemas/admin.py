@@ -99,11 +99,27 @@ class MailCampaignResponse(BaseModel):
     scheduled_at: datetime | None
     interval: str | None
     status: str
+    next_run_at: datetime | None = None
     created_at: datetime
 
     model_config = {"from_attributes": True}
 
 
+class MailDeliveryRunResponse(BaseModel):
+    id: int
+    campaign_id: int
+    status: str
+    last_user_id: int
+    sent_count: int
+    failed_count: int
+    error: str | None
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+    model_config = {"from_attributes": True}
+
+
 class TriggerMailSettingCreateRequest(BaseModel):
     trigger_event: str
     mail_campaign_id: int
@@ -165,3 +181,13 @@ class AgeVerificationResponse(BaseModel):
 
 class AgeVerificationReviewRequest(BaseModel):
     status: str  # approved or rejected
+
+
+# --- メトリクス ---
+class CacheStatsResponse(BaseModel):
+    namespace: str
+    local_hits: int
+    redis_hits: int
+    misses: int
+    invalidations: int
+    errors: int
@@ -24,6 +24,7 @@ class UserResponse(BaseModel):
     credit_balance: int
     status: str
     avatar_url: str | None
+    avatar_variants: dict[str, str] | None = None
 
     model_config = {"from_attributes": True}
 
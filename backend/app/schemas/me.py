@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class CountersResponse(BaseModel):
+    unread_notifications: int
+    unread_messages: int
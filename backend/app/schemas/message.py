@@ -1,6 +1,9 @@
 from datetime import datetime
+from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+MESSAGE_BATCH_MAX_ITEMS = 100
 
 
 class MessageSendRequest(BaseModel):
@@ -8,6 +11,29 @@ class MessageSendRequest(BaseModel):
     title: str | None = None
     content: str
     image_url: str | None = None
+    # POST /api/v1/messages/attachments で受け取った ID（指定時は image_url より優先）
+    attachment_id: int | None = None
+
+
+class MessageSocketSendRequest(BaseModel):
+    type: Literal["send"]
+    title: str | None = None
+    content: str
+    image_url: str | None = None
+    attachment_id: int | None = None
+
+
+class MessageBatchItem(BaseModel):
+    session_id: int
+    title: str | None = None
+    content: str | None = None
+    template_id: int | None = None  # 指定時は content の代わりにテンプレート本文を送る
+    image_url: str | None = None
+    attachment_id: int | None = None
+
+
+class MessageBatchSendRequest(BaseModel):
+    items: list[MessageBatchItem] = Field(..., min_length=1, max_length=MESSAGE_BATCH_MAX_ITEMS)
 
 
 class MessageResponse(BaseModel):
@@ -19,12 +45,38 @@ class MessageResponse(BaseModel):
     title: str | None
     content: str
     image_url: str | None
+    attachment_id: int | None = None
     credit_cost: int
     created_at: datetime
 
     model_config = {"from_attributes": True}
 
 
+class AttachmentResponse(BaseModel):
+    id: int
+    content_type: str
+    size_bytes: int
+    preview_url: str
+    preview_width: int
+    preview_height: int
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
 class MessagePollResponse(BaseModel):
     messages: list[MessageResponse]
     last_message_id: int | None
+
+
+class MessageBatchItemResult(BaseModel):
+    session_id: int
+    success: bool
+    message: MessageResponse | None = None
+    error: str | None = None
+
+
+class MessageBatchSendResponse(BaseModel):
+    results: list[MessageBatchItemResult]
+    sent_count: int
+    failed_count: int
@@ -31,6 +31,7 @@ class PersonaResponse(BaseModel):
     gender: str | None
     age: int | None
     avatar_url: str | None
+    avatar_variants: dict[str, str] | None = None
     bio: str | None
     attributes: dict | None
     registered_at: date | None
@@ -7,6 +7,17 @@ class SessionCreateRequest(BaseModel):
     persona_id: int
 
 
+class SessionReadRequest(BaseModel):
+    # 省略時は最新のメッセージまで既読にする
+    message_id: int | None = None
+
+
+class SessionReadResponse(BaseModel):
+    session_id: int
+    last_read_message_id: int | None
+    unread_count: int
+
+
 class SessionResponse(BaseModel):
     id: int
     user_id: int
@@ -17,6 +28,10 @@ class SessionResponse(BaseModel):
     persona_avatar_url: str | None = None
     status: str
     last_persona_message: str | None = None
+    last_message_at: datetime | None = None
+    # ユーザー側の既読位置と未読数
+    user_last_read_message_id: int | None = None
+    user_unread_count: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -0,0 +1,124 @@
+"""
+本番用のサーバー起動
+
+uvicorn を WEB_CONCURRENCY 個のワーカープロセスで起動する（--reload なし）。
+WEB_CONCURRENCY=0 のときはコンテナに割り当てられた CPU 数（cgroup の上限）を使い、
+全ワーカーの DB 接続プールが PostgreSQL の接続上限に収まる数まで減らす。
+ワーカー数を指定したときは、収まらなければ起動しない。ワーカー間でメモリを共有しないので、
+複数ワーカーではリアルタイム配信とクレジット予約を Redis バックエンドにしておく必要がある。
+
+使い方:
+  docker compose exec api python -m app.server [--workers 4] [--port 8000]
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+import sys
+from pathlib import Path
+
+import uvicorn
+
+from app.config import settings
+from app.database import available_connections, check_connection_budget, connections_per_process, engine
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _cgroup_cpu_quota(root: Path = CGROUP_ROOT) -> float | None:
+    """cgroup の CPU 上限（コア数換算）を返す。制限なし・読めないときは None"""
+    # cgroup v2: cpu.max は "<quota> <period>"（制限なしは "max <period>"）
+    try:
+        quota, period = (root / "cpu.max").read_text().split()
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError, ZeroDivisionError):
+        pass
+    # cgroup v1: cpu.cfs_quota_us は制限なしなら -1
+    for controller in ("cpu", "cpu,cpuacct"):
+        try:
+            quota = int((root / controller / "cpu.cfs_quota_us").read_text())
+            period = int((root / controller / "cpu.cfs_period_us").read_text())
+        except (OSError, ValueError):
+            continue
+        return quota / period if quota > 0 and period > 0 else None
+    return None
+
+
+def available_cpus(cgroup_root: Path = CGROUP_ROOT) -> int:
+    """このプロセスが使える CPU 数（os.cpu_count() はホストの CPU 数を返すので cgroup の上限で絞る）"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota(cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def default_workers(available: int) -> int:
+    """WEB_CONCURRENCY、0 なら CPU 数を available 個の接続に収まる数まで減らしたもの"""
+    if settings.web_concurrency:
+        return settings.web_concurrency
+    cpus = available_cpus()
+    workers = max(1, min(cpus, available // connections_per_process()))
+    if workers < cpus:
+        logger.warning(
+            "DB 接続数の上限に合わせてワーカー数を %d にします（CPU %d、利用可能な接続 %d、1 プロセス %d）",
+            workers,
+            cpus,
+            available,
+            connections_per_process(),
+        )
+    return workers
+
+
+def _check_backends(workers: int) -> None:
+    if workers <= 1:
+        return
+    if settings.realtime_backend == "local":
+        raise RuntimeError("複数ワーカーでは REALTIME_BACKEND=redis にしてください")
+    if settings.credit_reservation_enabled and settings.credit_reservation_backend == "local":
+        raise RuntimeError("複数ワーカーでは CREDIT_RESERVATION_BACKEND=redis にしてください")
+
+
+async def _available_connections() -> int:
+    try:
+        return await available_connections()
+    finally:
+        # ワーカーはそれぞれ自分のプールを作るので、確認に使った接続は閉じておく
+        await engine.dispose()
+
+
+def plan_workers(requested: int | None, available: int) -> int:
+    """起動するワーカー数を決め、DB 接続数とバックエンドの設定を確認する（問題があれば RuntimeError）"""
+    workers = requested or default_workers(available)
+    _check_backends(workers)
+    required = check_connection_budget(workers, available)
+    logger.info("DB 接続数: 最大 %d / 利用可能 %d（%d ワーカー）", required, available, workers)
+    return workers
+
+
+def main(host: str, port: int, workers: int | None) -> None:
+    try:
+        workers = plan_workers(workers, asyncio.run(_available_connections()))
+    except RuntimeError as e:
+        logger.error("%s", e)
+        sys.exit(1)
+    uvicorn.run("app.main:app", host=host, port=port, workers=workers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="省略時は WEB_CONCURRENCY（0 なら CPU 数）")
+    args = parser.parse_args()
+    main(args.host, args.port, args.workers)
@@ -1,49 +1,108 @@
-from sqlalchemy import select
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.models.user import User
 from app.models.persona import Persona
+from app.services.cache_service import get_cache
+from app.services.outbox_service import enqueue_cache_invalidation
 
 
-async def get_display_name_map(db: AsyncSession, user_ids: list[int]) -> dict[int, str]:
-    """user_id のリストから {id: display_name} の辞書を返す"""
-    if not user_ids:
-        return {}
-    unique_ids = list(set(user_ids))
-    result = await db.execute(
-        select(User.id, User.display_name).where(User.id.in_(unique_ids))
-    )
-    return {row[0]: row[1] for row in result.all()}
+class UserProfile(NamedTuple):
+    display_name: str
+    avatar_url: str | None
 
 
-async def get_user_avatar_map(db: AsyncSession, user_ids: list[int]) -> dict[int, str | None]:
-    """user_id のリストから {id: avatar_url} の辞書を返す"""
-    if not user_ids:
-        return {}
-    unique_ids = list(set(user_ids))
-    result = await db.execute(
-        select(User.id, User.avatar_url).where(User.id.in_(unique_ids))
-    )
-    return {row[0]: row[1] for row in result.all()}
+class PersonaProfile(NamedTuple):
+    name: str
+    avatar_url: str | None
+
+
+def _icon_url(model):
+    """アイコン表示用の小さいサムネイル（まだなければ元画像）"""
+    return func.coalesce(model.avatar_variants["small"].astext, model.avatar_url)
 
 
-async def get_persona_name_map(db: AsyncSession, persona_ids: list[int]) -> dict[int, str]:
-    """persona_id のリストから {id: name} の辞書を返す"""
-    if not persona_ids:
+user_profile_cache = get_cache(
+    "user_profile",
+    maxsize=settings.profile_cache_size,
+    local_ttl=settings.profile_cache_local_ttl_seconds,
+    redis_ttl=settings.profile_cache_redis_ttl_seconds,
+)
+persona_profile_cache = get_cache(
+    "persona_profile",
+    maxsize=settings.profile_cache_size,
+    local_ttl=settings.profile_cache_local_ttl_seconds,
+    redis_ttl=settings.profile_cache_redis_ttl_seconds,
+)
+
+
+async def get_user_profiles(db: AsyncSession, user_ids: Iterable[int]) -> dict[int, UserProfile]:
+    """user_id のリストから {id: UserProfile} の辞書を返す（キャッシュにない分だけ 1 クエリ）"""
+    unique_ids = set(user_ids)
+    if not unique_ids:
         return {}
-    unique_ids = list(set(persona_ids))
-    result = await db.execute(
-        select(Persona.id, Persona.name).where(Persona.id.in_(unique_ids))
-    )
-    return {row[0]: row[1] for row in result.all()}
+    cached, missing = await user_profile_cache.get_many(unique_ids)
+    profiles = {int(k): UserProfile(*v) for k, v in cached.items()}
+    if missing:
+        result = await db.execute(
+            select(User.id, User.display_name, _icon_url(User)).where(User.id.in_([int(k) for k in missing]))
+        )
+        loaded = {row[0]: UserProfile(row[1], row[2]) for row in result.all()}
+        await user_profile_cache.set_many({k: list(v) for k, v in loaded.items()}, missing)
+        profiles.update(loaded)
+    return profiles
 
 
-async def get_persona_avatar_map(db: AsyncSession, persona_ids: list[int]) -> dict[int, str | None]:
-    """persona_id のリストから {id: avatar_url} の辞書を返す"""
-    if not persona_ids:
+async def get_persona_profiles(db: AsyncSession, persona_ids: Iterable[int]) -> dict[int, PersonaProfile]:
+    """persona_id のリストから {id: PersonaProfile} の辞書を返す（キャッシュにない分だけ 1 クエリ）"""
+    unique_ids = set(persona_ids)
+    if not unique_ids:
         return {}
-    unique_ids = list(set(persona_ids))
-    result = await db.execute(
-        select(Persona.id, Persona.avatar_url).where(Persona.id.in_(unique_ids))
-    )
-    return {row[0]: row[1] for row in result.all()}
+    cached, missing = await persona_profile_cache.get_many(unique_ids)
+    profiles = {int(k): PersonaProfile(*v) for k, v in cached.items()}
+    if missing:
+        result = await db.execute(
+            select(Persona.id, Persona.name, _icon_url(Persona)).where(Persona.id.in_([int(k) for k in missing]))
+        )
+        loaded = {row[0]: PersonaProfile(row[1], row[2]) for row in result.all()}
+        await persona_profile_cache.set_many({k: list(v) for k, v in loaded.items()}, missing)
+        profiles.update(loaded)
+    return profiles
+
+
+async def get_profiles(
+    db: AsyncSession,
+    user_ids: Iterable[int] = (),
+    persona_ids: Iterable[int] = (),
+) -> tuple[dict[int, UserProfile], dict[int, PersonaProfile]]:
+    """ユーザーとペルソナの表示用情報をまとめて取得する（テーブルごとに最大 1 クエリ）"""
+    return await get_user_profiles(db, user_ids), await get_persona_profiles(db, persona_ids)
+
+
+async def get_display_name_map(db: AsyncSession, user_ids: Iterable[int]) -> dict[int, str]:
+    """user_id のリストから {id: display_name} の辞書を返す"""
+    profiles = await get_user_profiles(db, user_ids)
+    return {user_id: profile.display_name for user_id, profile in profiles.items()}
+
+
+async def invalidate_user_profile(user_id: int) -> None:
+    """表示名・アバター変更後に呼ぶ（コミット後）"""
+    await user_profile_cache.invalidate([user_id])
+
+
+async def invalidate_persona_profile(persona_id: int) -> None:
+    """ペルソナ名・アバター変更後に呼ぶ（コミット後）"""
+    await persona_profile_cache.invalidate([persona_id])
+
+
+def enqueue_user_profile_invalidation(db: AsyncSession, user_id: int) -> None:
+    """表示名・アバター変更と同じトランザクションで呼ぶ（コミット後に中継ワーカーが無効化する）"""
+    enqueue_cache_invalidation(db, user_profile_cache.namespace, [user_id])
+
+
+def enqueue_persona_profile_invalidation(db: AsyncSession, persona_id: int) -> None:
+    """ペルソナ名・アバター変更と同じトランザクションで呼ぶ（コミット後に中継ワーカーが無効化する）"""
+    enqueue_cache_invalidation(db, persona_profile_cache.namespace, [persona_id])
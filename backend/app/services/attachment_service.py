@@ -0,0 +1,144 @@
+"""
+チャットの添付画像
+
+アップロードでは本文を上限つきで読みながら元画像を private/attachments に保存し、
+長辺 PREVIEW_SIZE の WebP プレビューを公開の /uploads に作って添付 ID を返す。
+送信時は添付 ID をアップロードした本人のものか確認し、messages.image_url にプレビューを入れる
+（チャット履歴はプレビューだけで描画でき、元画像は権限確認つきの API から返す）。
+
+送信に使われないまま ATTACHMENT_EXPIRE_SECONDS を過ぎた添付は GC ワーカーが消す。
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Union
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.message import Message, SenderType
+from app.models.message_attachment import MessageAttachment
+from app.models.session import Session
+from app.models.staff_member import StaffMember
+from app.models.user import User
+from app.services import upload_service
+from app.services.image_service import ImageTooLarge, make_preview
+
+ORIGINAL_DIR = f"{upload_service.PRIVATE_DIR}/attachments"
+
+
+def _uploader(account: Union[User, StaffMember]) -> tuple[SenderType, int]:
+    return (SenderType.user if isinstance(account, User) else SenderType.persona), account.id
+
+
+async def create_attachment(
+    db: AsyncSession, request: Request, account: Union[User, StaffMember]
+) -> MessageAttachment:
+    """multipart の file を保存してプレビューを作り、添付をコミットして返す"""
+    max_size = settings.attachment_max_bytes
+    upload = await upload_service.receive_form_file(request, "file", max_size)
+    if upload.content_type not in upload_service.IMAGE_EXTENSIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="JPEG, PNG, WebP のみアップロード可能です")
+
+    original, sha = await upload_service.save_temp(upload, max_size)
+    preview = upload_service.temp_path(".webp")
+    try:
+        # Pillow は縮小中に GIL を手放すのでスレッドで十分（イベントループは止めない）
+        width, height = await asyncio.to_thread(make_preview, str(original), str(preview))
+    except Exception as e:
+        await asyncio.to_thread(original.unlink, missing_ok=True)
+        await asyncio.to_thread(preview.unlink, missing_ok=True)
+        if isinstance(e, ImageTooLarge):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="画像の縦横のサイズが大きすぎます")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="画像を読み込めませんでした")
+    ext = upload_service.IMAGE_EXTENSIONS[upload.content_type]
+    original_url = await upload_service.store_file(db, original, ext, directory=ORIGINAL_DIR, sha=sha)
+    preview_url = await upload_service.store_file(db, preview, "webp")
+
+    uploader_type, uploader_id = _uploader(account)
+    attachment = MessageAttachment(
+        uploader_type=uploader_type,
+        uploader_id=uploader_id,
+        original_url=original_url,
+        content_type=upload.content_type,
+        size_bytes=upload.size or 0,
+        preview_url=preview_url,
+        preview_width=width,
+        preview_height=height,
+    )
+    db.add(attachment)
+    await db.commit()
+    await db.refresh(attachment)
+    return attachment
+
+
+async def use_attachments(
+    db: AsyncSession, account: Union[User, StaffMember], attachment_ids: Iterable[int]
+) -> dict[int, MessageAttachment]:
+    """
+    送信に使う添付を確認して {id: 添付} を返す（本人がアップロードしたものだけ。メッセージと同じトランザクションで呼ぶ）
+
+    見つからない ID は結果に含めないので、呼び出し側でエラーにする。
+    スタッフの一括送信では同じ添付を複数のセッションに使える。
+    """
+    ids = set(attachment_ids)
+    if not ids:
+        return {}
+    uploader_type, uploader_id = _uploader(account)
+    result = await db.execute(
+        update(MessageAttachment)
+        .where(
+            MessageAttachment.id.in_(sorted(ids)),
+            MessageAttachment.uploader_type == uploader_type,
+            MessageAttachment.uploader_id == uploader_id,
+        )
+        .values(used_at=func.coalesce(MessageAttachment.used_at, func.now()))
+        .returning(MessageAttachment)
+        .execution_options(synchronize_session=False)
+    )
+    return {attachment.id: attachment for attachment in result.scalars().all()}
+
+
+async def get_attachment_for_account(
+    db: AsyncSession, attachment_id: int, account: Union[User, StaffMember]
+) -> MessageAttachment:
+    """アップロードした本人か、添付を含むメッセージのセッションのユーザーだけが見られる（スタッフは全件）"""
+    attachment = await db.get(MessageAttachment, attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="添付画像が見つかりません")
+    if isinstance(account, User) and (attachment.uploader_type, attachment.uploader_id) != _uploader(account):
+        shared = await db.scalar(
+            select(Message.id)
+            .join(Session, Session.id == Message.session_id)
+            .where(Message.attachment_id == attachment_id, Session.user_id == account.id)
+            .limit(1)
+        )
+        if shared is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="添付画像が見つかりません")
+    return attachment
+
+
+async def expire_unused(batch_size: int) -> int:
+    """送信に使われないまま期限を過ぎた添付を 1 バッチ消し、消した件数を返す（ファイルは GC に任せる）"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.attachment_expire_seconds)
+    async with async_session() as db:
+        candidates = (
+            select(MessageAttachment.id)
+            .where(MessageAttachment.used_at.is_(None), MessageAttachment.created_at < cutoff)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            delete(MessageAttachment)
+            .where(MessageAttachment.id.in_(candidates.scalar_subquery()), MessageAttachment.used_at.is_(None))
+            .returning(MessageAttachment.original_url, MessageAttachment.preview_url)
+        )
+        rows = result.all()
+        for original_url, preview_url in rows:
+            await upload_service.release(db, original_url)
+            await upload_service.release(db, preview_url)
+        await db.commit()
+        return len(rows)
@@ -0,0 +1,253 @@
+"""
+ワーカー内 LRU + Redis の 2 段キャッシュ
+
+1 段目は各ワーカーのメモリ上の LRU（件数上限 + TTL）、2 段目は全ワーカー共有の Redis。
+無効化は自ワーカーの LRU と Redis を消したうえで Pub/Sub で他ワーカーに通知する。
+Redis が使えない場合は 1 段目だけで動作し、呼び出し側は DB にフォールバックする。
+
+無効化の前に DB を読んだリーダーが無効化の後で書き戻すと、古い値が Redis の TTL の間残る。
+これを防ぐため、無効化のたびにキーごとの世代を Redis で 1 つ進める。get_many は見つからなかった
+キーの世代を返し、set_many にそれを渡すと、世代が変わっていないキーだけを書き込む。
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from app.redis_client import get_redis
+from app.services import realtime_service
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# KEYS: 値のキーと世代のキーの組、ARGV: TTL に続けて (読んだときの世代, 値) の組。
+# 世代が変わっていないものだけ書き込み、書き込んだ組の番号（1 始まり）を返す
+_SET_IF_GENERATION = """
+local written = {}
+for i = 1, #KEYS, 2 do
+    local generation = tonumber(redis.call('GET', KEYS[i + 1]) or '0')
+    if generation == tonumber(ARGV[i + 1]) then
+        redis.call('SET', KEYS[i], ARGV[i + 2], 'EX', ARGV[1])
+        table.insert(written, (i + 1) / 2)
+    end
+end
+return written
+"""
+# 自ワーカーが発行した無効化通知を受け取ったときに、書き込んだばかりの値を捨てないための識別子
+WORKER_ID = uuid.uuid4().hex
+
+
+class CacheStats:
+    def __init__(self):
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+class TwoTierCache:
+    def __init__(self, namespace: str, maxsize: int, local_ttl: float, redis_ttl: int, use_redis: bool = True):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.use_redis = use_redis
+        self.stats = CacheStats()
+        self._local: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def _generation_key(self, key: str) -> str:
+        return f"cache-generation:{self.namespace}:{key}"
+
+    def _get_local(self, key: str) -> tuple[bool, Any]:
+        entry = self._local.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return False, None
+        self._local.move_to_end(key)
+        return True, value
+
+    def _set_local(self, key: str, value: Any) -> None:
+        self._local[key] = (time.monotonic() + self.local_ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    def evict_local(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._local.pop(key, None)
+
+    async def get_many(self, keys: Iterable[Any]) -> tuple[dict[str, Any], dict[str, int]]:
+        """
+        キャッシュにある値と、見つからなかったキーの {キー: 世代} を返す
+
+        DB から読み直した値は、この世代を付けて set_many で書き込む。
+        """
+        found: dict[str, Any] = {}
+        pending: list[str] = []
+        for key in dict.fromkeys(str(k) for k in keys):
+            hit, value = self._get_local(key)
+            if hit:
+                found[key] = value
+                self.stats.local_hits += 1
+            else:
+                pending.append(key)
+        if not pending:
+            return found, {}
+        if not self.use_redis:
+            self.stats.misses += len(pending)
+            return found, dict.fromkeys(pending, 0)
+
+        try:
+            raw = await get_redis().mget(
+                [self._redis_key(k) for k in pending] + [self._generation_key(k) for k in pending]
+            )
+        except Exception:
+            logger.warning("Redis キャッシュの読み込みに失敗しました: %s", self.namespace, exc_info=True)
+            self.stats.errors += 1
+            raw = [None] * (len(pending) * 2)
+
+        missing: dict[str, int] = {}
+        for key, raw_value, raw_generation in zip(pending, raw[: len(pending)], raw[len(pending) :]):
+            if raw_value is None:
+                missing[key] = int(raw_generation or 0)
+                continue
+            value = json.loads(raw_value)
+            found[key] = value
+            self._set_local(key, value)
+            self.stats.redis_hits += 1
+        self.stats.misses += len(missing)
+        return found, missing
+
+    async def set_many(self, values: dict[Any, Any], generations: dict[str, int] | None = None) -> None:
+        """
+        値を書き込む
+
+        generations（get_many が返した世代）を渡すと、その後に無効化されたキーは書き込まない。
+        """
+        if not values:
+            return
+        values = {str(k): v for k, v in values.items()}
+        if not self.use_redis:
+            for key, value in values.items():
+                self._set_local(key, value)
+            return
+        try:
+            if generations is None:
+                async with get_redis().pipeline(transaction=False) as pipe:
+                    for key, value in values.items():
+                        pipe.set(self._redis_key(key), json.dumps(value, ensure_ascii=False), ex=self.redis_ttl)
+                    await pipe.execute()
+                written = list(values)
+            else:
+                items = list(values.items())
+                keys: list[str] = []
+                args: list[Any] = [self.redis_ttl]
+                for key, value in items:
+                    keys += [self._redis_key(key), self._generation_key(key)]
+                    args += [generations.get(key, 0), json.dumps(value, ensure_ascii=False)]
+                indexes = await get_redis().eval(_SET_IF_GENERATION, len(keys), *keys, *args)
+                written = [items[int(i) - 1][0] for i in indexes]
+        except Exception:
+            logger.warning("Redis キャッシュの書き込みに失敗しました: %s", self.namespace, exc_info=True)
+            self.stats.errors += 1
+            written = list(values)
+        for key in written:
+            self._set_local(key, values[key])
+
+    async def invalidate(self, keys: Iterable[Any]) -> None:
+        """全ワーカーの LRU と Redis から該当キーを消す"""
+        keys = [str(k) for k in keys]
+        if not keys:
+            return
+        self.evict_local(keys)
+        self.stats.invalidations += len(keys)
+        if self.use_redis:
+            try:
+                async with get_redis().pipeline(transaction=False) as pipe:
+                    pipe.delete(*[self._redis_key(k) for k in keys])
+                    for key in keys:
+                        # 無効化より前に読んだリーダーの set_many を断る
+                        pipe.incr(self._generation_key(key))
+                        pipe.expire(self._generation_key(key), self.redis_ttl)
+                    await pipe.execute()
+            except Exception:
+                logger.warning("Redis キャッシュの削除に失敗しました: %s", self.namespace, exc_info=True)
+                self.stats.errors += 1
+        await self._broadcast_eviction(keys)
+
+    async def replace(self, values: dict[Any, Any]) -> None:
+        """値を書き込み、他ワーカーの LRU にある古い値を捨てさせる"""
+        await self.set_many(values)
+        await self._broadcast_eviction([str(k) for k in values])
+
+    async def _broadcast_eviction(self, keys: list[str]) -> None:
+        await realtime_service.publish(
+            INVALIDATION_CHANNEL,
+            {"namespace": self.namespace, "keys": keys, "origin": WORKER_ID},
+        )
+
+
+_registry: dict[str, TwoTierCache] = {}
+
+
+def get_cache(
+    namespace: str, maxsize: int, local_ttl: float, redis_ttl: int, use_redis: bool = True
+) -> TwoTierCache:
+    """namespace ごとのキャッシュを返す（プロセス内で 1 つだけ生成）"""
+    cache = _registry.get(namespace)
+    if cache is None:
+        cache = TwoTierCache(namespace, maxsize, local_ttl, redis_ttl, use_redis)
+        _registry[namespace] = cache
+    return cache
+
+
+def get_registered_cache(namespace: str) -> TwoTierCache | None:
+    return _registry.get(namespace)
+
+
+def get_all_stats() -> dict[str, dict[str, int]]:
+    return {namespace: cache.stats.as_dict() for namespace, cache in _registry.items()}
+
+
+async def listen_for_invalidations() -> None:
+    """他ワーカーからの無効化通知を受けて LRU から削除し続ける"""
+    while True:
+        try:
+            async with realtime_service.subscribe(INVALIDATION_CHANNEL) as subscription:
+                while True:
+                    event = await subscription.wait(timeout=60)
+                    if event is None or event.get("origin") == WORKER_ID:
+                        continue
+                    cache = _registry.get(event.get("namespace"))
+                    if cache is not None:
+                        cache.evict_local(event.get("keys", []))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("キャッシュ無効化通知の購読に失敗しました")
+            await asyncio.sleep(5)
+
+
+def start_invalidation_listener() -> asyncio.Task:
+    return asyncio.create_task(listen_for_invalidations())
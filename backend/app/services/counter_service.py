@@ -0,0 +1,125 @@
+"""
+未読数の管理
+
+user_counters にユーザーごとの未読お知らせ数・未読メッセージ数を持ち、お知らせの作成・既読化、
+ペルソナからのメッセージ送信・セッションの既読化と同じトランザクションで増減させる。
+バッジ表示は主キー 1 行の読み出しで済む（COUNT しない）。
+
+セッションごとの未読数は sessions.user_unread_count、既読位置は sessions.user_last_read_message_id。
+既読化ではセッション行をロックしてから数え直すので、同時に届いたメッセージと数がずれない。
+"""
+
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.message import Message, SenderType
+from app.models.session import Session
+from app.models.user_counter import UserCounter
+
+
+class UnreadCounters(NamedTuple):
+    notifications: int
+    messages: int
+
+
+async def get_counters(db: AsyncSession, user_id: int) -> UnreadCounters:
+    result = await db.execute(
+        select(UserCounter.unread_notifications, UserCounter.unread_messages).where(UserCounter.user_id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return UnreadCounters(0, 0)
+    return UnreadCounters(row.unread_notifications, row.unread_messages)
+
+
+async def _add(db: AsyncSession, column: str, deltas: dict[int, int]) -> None:
+    """ユーザーごとの増減を反映する（ユーザー ID 順にしてデッドロックを避ける。0 未満にはしない）"""
+    current = getattr(UserCounter, column)
+    increments = [{"user_id": user_id, column: delta} for user_id, delta in sorted(deltas.items()) if delta > 0]
+    if increments:
+        stmt = insert(UserCounter).values(increments)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[UserCounter.user_id],
+                set_={column: current + getattr(stmt.excluded, column), "updated_at": func.now()},
+            )
+        )
+    for user_id, delta in sorted(deltas.items()):
+        if delta < 0:
+            await db.execute(
+                update(UserCounter)
+                .where(UserCounter.user_id == user_id)
+                .values({column: func.greatest(current + delta, 0)})
+            )
+
+
+async def add_unread_notifications(db: AsyncSession, user_ids: Iterable[int]) -> None:
+    """作成したお知らせの宛先（1 件につき 1 回）を渡す"""
+    await _add(db, "unread_notifications", Counter(user_ids))
+
+
+async def remove_unread_notifications(db: AsyncSession, user_id: int, count: int) -> None:
+    await _add(db, "unread_notifications", {user_id: -count})
+
+
+async def add_unread_messages(db: AsyncSession, session_counts: dict[int, int], session_users: dict[int, int]) -> None:
+    """
+    ペルソナから送ったメッセージの数をセッションとユーザーの未読数に加える
+
+    session_counts はセッション ID → 件数、session_users はセッション ID → ユーザー ID。
+    """
+    by_count: dict[int, list[int]] = {}
+    for session_id, count in session_counts.items():
+        by_count.setdefault(count, []).append(session_id)
+    for count, session_ids in by_count.items():
+        await db.execute(
+            update(Session)
+            .where(Session.id.in_(session_ids))
+            .values(user_unread_count=Session.user_unread_count + count)
+            .execution_options(synchronize_session=False)
+        )
+    user_counts: Counter[int] = Counter()
+    for session_id, count in session_counts.items():
+        user_counts[session_users[session_id]] += count
+    await _add(db, "unread_messages", user_counts)
+
+
+async def mark_session_read(db: AsyncSession, session: Session, message_id: int | None = None) -> tuple[int | None, int]:
+    """
+    セッションを message_id（省略時は最新のペルソナのメッセージ）まで既読にする
+
+    既読位置は戻さない。(既読位置, 残りの未読数) を返す。
+    """
+    result = await db.execute(
+        select(Session.user_last_read_message_id, Session.user_unread_count, Session.last_persona_message_id)
+        .where(Session.id == session.id)
+        .with_for_update()
+    )
+    last_read, unread, latest = result.one()
+    if latest is None:
+        return last_read, unread
+    target = latest if message_id is None else min(message_id, latest)
+    if last_read is not None and target <= last_read:
+        return last_read, unread
+
+    if target == latest:
+        remaining = 0
+    else:
+        remaining = await db.scalar(
+            select(func.count())
+            .select_from(Message)
+            .where(Message.session_id == session.id, Message.sender_type == SenderType.persona, Message.id > target)
+        )
+    # 既読にしただけでセッション一覧の並びが変わらないよう updated_at は据え置く
+    await db.execute(
+        update(Session)
+        .where(Session.id == session.id)
+        .values(user_last_read_message_id=target, user_unread_count=remaining, updated_at=Session.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    await _add(db, "unread_messages", {session.user_id: remaining - unread})
+    return target, remaining
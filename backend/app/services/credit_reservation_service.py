@@ -0,0 +1,299 @@
+"""
+クレジット予約（高頻度ユーザー向け）
+
+残高が予約ブロック以上あるユーザーは、送信のたびに users 行を更新する代わりに
+ブロック単位で残高から引き当て（reservation_hold）、Redis 上の残数を Lua で 1 通ずつ減らす。
+使い切り・一定時間経過・セッション終了のタイミングで精算し、未使用分を残高に戻す（reservation_release）。
+
+消費数の正は PostgreSQL 側（messages.credit_reservation_id の credit_cost 合計）で、
+Redis の残数は送信可否の判定にだけ使う。Redis が消えたりワーカーが落ちたりしても、
+精算時に messages から数え直すため残高はずれない。
+送信トランザクションは予約行を FOR SHARE で読み、精算側の UPDATE は送信中のトランザクションの
+コミットを待つので、精算後に数え漏れるメッセージは出ない。
+CREDIT_RESERVATION_BACKEND=local の場合は Redis の代わりにプロセス内の辞書を使う（開発・テスト用）。
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import settings
+from app.database import async_session
+from app.models.user import User
+from app.models.message import Message
+from app.models.credit_transaction import CreditTransactionType
+from app.models.credit_reservation import CreditReservation, CreditReservationStatus
+from app.redis_client import get_redis
+from app.services.credit_service import add_credits, try_deduct_credits
+from app.services.principal_service import invalidate_principal
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]=予約キー ARGV[1]=消費数。残数が足りれば減らして予約 ID を返す
+_SPEND_SCRIPT = """
+local id = redis.call('HGET', KEYS[1], 'id')
+if not id then return false end
+local remaining = tonumber(redis.call('HGET', KEYS[1], 'remaining'))
+if remaining < tonumber(ARGV[1]) then return false end
+redis.call('HINCRBY', KEYS[1], 'remaining', -tonumber(ARGV[1]))
+return tonumber(id)
+"""
+
+# KEYS[1]=予約キー ARGV[1]=予約 ID ARGV[2]=戻す数。予約が入れ替わっていなければ残数を戻す
+_REFUND_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'id') == ARGV[1] then
+  return redis.call('HINCRBY', KEYS[1], 'remaining', tonumber(ARGV[2]))
+end
+return false
+"""
+
+# KEYS[1]=予約キー ARGV[1]=予約 ID。予約が入れ替わっていなければ削除する
+_DISCARD_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'id') == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _key(user_id: int) -> str:
+    return f"credit:resv:{user_id}"
+
+
+class RedisReservationStore:
+    def __init__(self):
+        redis = get_redis()
+        self._spend = redis.register_script(_SPEND_SCRIPT)
+        self._refund = redis.register_script(_REFUND_SCRIPT)
+        self._discard = redis.register_script(_DISCARD_SCRIPT)
+
+    async def open(self, user_id: int, reservation_id: int, amount: int) -> None:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hset(_key(user_id), mapping={"id": reservation_id, "remaining": amount})
+            # 精算されずに残ったキーは定期精算の後に消える
+            pipe.expire(_key(user_id), settings.credit_reservation_max_age_seconds * 2)
+            await pipe.execute()
+
+    async def spend(self, user_id: int, cost: int) -> int | None:
+        result = await self._spend(keys=[_key(user_id)], args=[cost])
+        return int(result) if result is not None else None
+
+    async def refund(self, user_id: int, reservation_id: int, cost: int) -> None:
+        await self._refund(keys=[_key(user_id)], args=[reservation_id, cost])
+
+    async def discard(self, user_id: int, reservation_id: int) -> None:
+        await self._discard(keys=[_key(user_id)], args=[reservation_id])
+
+    async def remaining(self, user_id: int) -> int:
+        value = await get_redis().hget(_key(user_id), "remaining")
+        return int(value) if value is not None else 0
+
+
+class LocalReservationStore:
+    """プロセス内だけで完結する代替実装（開発・テスト用）"""
+
+    def __init__(self):
+        self._entries: dict[int, list[int]] = {}
+
+    async def open(self, user_id: int, reservation_id: int, amount: int) -> None:
+        self._entries[user_id] = [reservation_id, amount]
+
+    async def spend(self, user_id: int, cost: int) -> int | None:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] < cost:
+            return None
+        entry[1] -= cost
+        return entry[0]
+
+    async def refund(self, user_id: int, reservation_id: int, cost: int) -> None:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] == reservation_id:
+            entry[1] += cost
+
+    async def discard(self, user_id: int, reservation_id: int) -> None:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] == reservation_id:
+            del self._entries[user_id]
+
+    async def remaining(self, user_id: int) -> int:
+        entry = self._entries.get(user_id)
+        return entry[1] if entry is not None else 0
+
+
+_store: RedisReservationStore | LocalReservationStore | None = None
+
+
+def get_store() -> RedisReservationStore | LocalReservationStore:
+    global _store
+    if _store is None:
+        if settings.credit_reservation_backend == "local":
+            _store = LocalReservationStore()
+        else:
+            _store = RedisReservationStore()
+    return _store
+
+
+async def spend(db: AsyncSession, user: User, cost: int) -> int | None:
+    """
+    予約済みクレジットから cost を消費し、予約 ID を返す
+
+    予約が使えない（無効・残高不足・Redis 障害など）場合は None を返すので、
+    呼び出し側は通常の deduct_credits で減算する。
+    成功時は db のトランザクションが予約行の共有ロックを持つため、コミットまで精算されない。
+    """
+    if not settings.credit_reservation_enabled:
+        return None
+    store = get_store()
+    try:
+        for _ in range(2):
+            reservation_id = await store.spend(user.id, cost)
+            if reservation_id is None:
+                if user.credit_balance < settings.credit_reservation_block:
+                    return None
+                new_balance = await _replenish(user.id)
+                if new_balance is None:
+                    return None
+                set_committed_value(user, "credit_balance", new_balance)
+                continue
+            result = await db.execute(
+                select(CreditReservation.id)
+                .where(
+                    CreditReservation.id == reservation_id,
+                    CreditReservation.status == CreditReservationStatus.open,
+                )
+                .with_for_update(read=True)
+            )
+            if result.scalar_one_or_none() is not None:
+                return reservation_id
+            # 他のワーカーが精算済み
+            await store.discard(user.id, reservation_id)
+    except Exception:
+        logger.warning("クレジット予約を利用できません: user_id=%s", user.id, exc_info=True)
+    return None
+
+
+async def refund(user_id: int, reservation_id: int, cost: int) -> None:
+    """送信がロールバックされた場合に Redis の残数を戻す（ずれても精算時に正される）"""
+    try:
+        await get_store().refund(user_id, reservation_id, cost)
+    except Exception:
+        logger.warning("クレジット予約の残数を戻せませんでした: user_id=%s", user_id, exc_info=True)
+
+
+async def get_remaining(user_id: int) -> int:
+    """予約中で未使用のクレジット数（残高表示用）"""
+    if not settings.credit_reservation_enabled:
+        return 0
+    try:
+        return await get_store().remaining(user_id)
+    except Exception:
+        logger.warning("クレジット予約の残数を取得できません: user_id=%s", user_id, exc_info=True)
+        return 0
+
+
+async def _replenish(user_id: int) -> int | None:
+    """既存の予約を精算してから新しいブロックを引き当てる。引き当て後の残高を返す"""
+    await settle_user(user_id)
+    block = settings.credit_reservation_block
+    async with async_session() as db:
+        reservation = CreditReservation(user_id=user_id, amount=block)
+        db.add(reservation)
+        try:
+            await db.flush()
+        except IntegrityError:
+            # 同じユーザーの別リクエストが先に引き当てた
+            await db.rollback()
+            return None
+        new_balance = await try_deduct_credits(
+            db, user_id, block, CreditTransactionType.reservation_hold, reference_id=reservation.id
+        )
+        if new_balance is None:
+            await db.rollback()
+            return None
+        await db.commit()
+    await get_store().open(user_id, reservation.id, block)
+    await invalidate_principal("user", user_id)
+    return new_balance
+
+
+async def settle(reservation_id: int) -> int | None:
+    """予約を精算して未使用分を残高に戻す。戻した数を返す（精算済みなら None）"""
+    async with async_session() as db:
+        # 送信中のトランザクションが持つ共有ロックが外れるまでここで待つ
+        result = await db.execute(
+            update(CreditReservation)
+            .where(
+                CreditReservation.id == reservation_id,
+                CreditReservation.status == CreditReservationStatus.open,
+            )
+            .values(status=CreditReservationStatus.settled, settled_at=func.now())
+            .returning(CreditReservation.user_id, CreditReservation.amount)
+        )
+        row = result.first()
+        if row is None:
+            return None
+        user_id, amount = row
+        consumed = await db.scalar(
+            select(func.coalesce(func.sum(Message.credit_cost), 0)).where(
+                Message.credit_reservation_id == reservation_id
+            )
+        )
+        await db.execute(
+            update(CreditReservation).where(CreditReservation.id == reservation_id).values(consumed=consumed)
+        )
+        unused = amount - consumed
+        if unused > 0:
+            await add_credits(
+                db, user_id, unused, CreditTransactionType.reservation_release, reference_id=reservation_id
+            )
+        await db.commit()
+
+    try:
+        await get_store().discard(user_id, reservation_id)
+    except Exception:
+        logger.warning("クレジット予約キーを削除できませんでした: user_id=%s", user_id, exc_info=True)
+    await invalidate_principal("user", user_id)
+    return unused
+
+
+async def settle_user(user_id: int) -> None:
+    """ユーザーの open な予約を精算する（セッション終了時など）"""
+    if not settings.credit_reservation_enabled:
+        return
+    async with async_session() as db:
+        result = await db.execute(
+            select(CreditReservation.id).where(
+                CreditReservation.user_id == user_id,
+                CreditReservation.status == CreditReservationStatus.open,
+            )
+        )
+        reservation_ids = list(result.scalars().all())
+    for reservation_id in reservation_ids:
+        await settle(reservation_id)
+
+
+async def settle_expired(max_age_seconds: int, batch_size: int = 100) -> int:
+    """一定時間以上経過した予約を精算する（Redis やワーカーの障害で残った予約の回収も兼ねる）"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+    settled = 0
+    while True:
+        async with async_session() as db:
+            result = await db.execute(
+                select(CreditReservation.id)
+                .where(
+                    CreditReservation.status == CreditReservationStatus.open,
+                    CreditReservation.created_at < cutoff,
+                )
+                .order_by(CreditReservation.id)
+                .limit(batch_size)
+            )
+            reservation_ids = list(result.scalars().all())
+        if not reservation_ids:
+            return settled
+        for reservation_id in reservation_ids:
+            if await settle(reservation_id) is not None:
+                settled += 1
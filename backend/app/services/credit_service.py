@@ -1,19 +1,98 @@
 from fastapi import HTTPException, status
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.config import settings
 from app.models.user import User
+from app.models.credit_transaction import CreditTransaction, CreditTransactionType
+from app.services.event_service import CREDITS_LOW, emit_event
 
 
-async def deduct_credits(db: AsyncSession, user: User, amount: int) -> None:
-    if user.credit_balance < amount:
+async def deduct_credits(
+    db: AsyncSession,
+    user: User,
+    amount: int,
+    type: CreditTransactionType = CreditTransactionType.message,
+    reference_id: int | None = None,
+) -> int:
+    """
+    残高が足りる場合だけ 1 回の条件付き UPDATE で減算し、台帳に記録する
+
+    行ロックはこの UPDATE からコミットまでしか保持されないため、
+    呼び出し側はできるだけコミット直前に呼ぶこと。
+    """
+    new_balance = await try_deduct_credits(db, user.id, amount, type, reference_id)
+    if new_balance is None:
+        current = await db.scalar(select(User.credit_balance).where(User.id == user.id))
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail=f"クレジットが不足しています（残高: {user.credit_balance}, 必要: {amount}）",
+            detail=f"クレジットが不足しています（残高: {current}, 必要: {amount}）",
         )
-    user.credit_balance -= amount
-    db.add(user)
+    set_committed_value(user, "credit_balance", new_balance)
+    return new_balance
+
+
+async def try_deduct_credits(
+    db: AsyncSession,
+    user_id: int,
+    amount: int,
+    type: CreditTransactionType,
+    reference_id: int | None = None,
+) -> int | None:
+    """残高が足りれば減算して台帳に記録する。足りなければ何もせず None"""
+    new_balance = await _apply_delta(db, user_id, -amount, require_balance=amount)
+    if new_balance is not None:
+        _record(db, user_id, type, -amount, new_balance, reference_id)
+        # しきい値を下回った減算のときだけ通知する
+        if new_balance < settings.credits_low_threshold <= new_balance + amount:
+            emit_event(db, CREDITS_LOW, user_id, {"balance": new_balance})
+    return new_balance
+
 
+async def add_credits(
+    db: AsyncSession,
+    user_id: int,
+    amount: int,
+    type: CreditTransactionType,
+    reference_id: int | None = None,
+) -> int | None:
+    """残高を加算して台帳に記録する。ユーザーが存在しなければ None"""
+    new_balance = await _apply_delta(db, user_id, amount)
+    if new_balance is not None:
+        _record(db, user_id, type, amount, new_balance, reference_id)
+    return new_balance
 
-async def add_credits(db: AsyncSession, user: User, amount: int) -> None:
-    user.credit_balance += amount
-    db.add(user)
+
+async def _apply_delta(
+    db: AsyncSession, user_id: int, delta: int, require_balance: int | None = None
+) -> int | None:
+    stmt = update(User).where(User.id == user_id)
+    if require_balance is not None:
+        stmt = stmt.where(User.credit_balance >= require_balance)
+    stmt = (
+        stmt.values(credit_balance=User.credit_balance + delta)
+        .returning(User.credit_balance)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+def _record(
+    db: AsyncSession,
+    user_id: int,
+    type: CreditTransactionType,
+    amount: int,
+    balance_after: int,
+    reference_id: int | None,
+) -> None:
+    db.add(
+        CreditTransaction(
+            user_id=user_id,
+            type=type,
+            amount=amount,
+            balance_after=balance_after,
+            reference_id=reference_id,
+        )
+    )
@@ -0,0 +1,21 @@
+"""
+トリガーメール用のドメインイベント
+
+emit_event は呼び出し元のトランザクションにアウトボックスの行（trigger トピック）を追加するだけなので、
+業務データがコミットされたときだけイベントが残り、ワーカーが落ちても失われない。
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.outbox_service import TOPIC_TRIGGER, enqueue
+
+USER_REGISTERED = "user_registered"
+FIRST_MESSAGE_SENT = "first_message_sent"
+CREDITS_LOW = "credits_low"
+LIKE_SENT = "like_sent"
+
+TRIGGER_EVENTS = (USER_REGISTERED, FIRST_MESSAGE_SENT, CREDITS_LOW, LIKE_SENT)
+
+
+def emit_event(db: AsyncSession, event_type: str, user_id: int, payload: dict | None = None) -> None:
+    enqueue(db, TOPIC_TRIGGER, {**(payload or {}), "event_type": event_type, "user_id": user_id})
@@ -0,0 +1,162 @@
+"""
+アバター画像のサムネイル生成
+
+アップロード時はファイルを保存してアウトボックスの image トピックに積むだけにし、
+画像ワーカー（app.workers.image_variants）がプロセスプールで各サイズの WebP を作って
+avatar_variants（{"small": URL, "medium": URL, "large": URL}）に記録する。
+WebP は EXIF などのメタデータを含めずに保存する（向きだけは回転して反映する）。
+
+一覧系の API は avatar_url の代わりに小さいサイズを返す（変換前・失敗時は元画像のまま）。
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session
+from app.models.outbox import OutboxEvent
+from app.models.persona import Persona
+from app.models.user import User
+from app.services import outbox_service, upload_service
+from app.services.account_service import enqueue_persona_profile_invalidation, enqueue_user_profile_invalidation
+from app.services.principal_service import enqueue_principal_invalidation
+
+logger = logging.getLogger(__name__)
+
+# 名前 → 長辺のピクセル数
+VARIANTS = {"small": 128, "medium": 384, "large": 768}
+# 一覧の表示に使うサイズ（さがす画面のグリッドは medium、アイコンは small）
+GRID_VARIANT = "medium"
+ICON_VARIANT = "small"
+WEBP_QUALITY = 80
+# チャット添付画像のプレビューの長辺
+PREVIEW_SIZE = 640
+# デコードを認める最大ピクセル数（小さいファイルに巨大な寸法を書いた画像でメモリを使い切らないよう、
+# ヘッダーの寸法だけ読んだ段階で断る）
+MAX_IMAGE_PIXELS = 40_000_000
+
+
+class ImageTooLarge(ValueError):
+    """画像の寸法が MAX_IMAGE_PIXELS を超える"""
+
+_OWNERS = {"user": User, "persona": Persona}
+
+
+def pick_variant(avatar_url: str | None, variants: dict | None, name: str) -> str | None:
+    if variants and variants.get(name):
+        return variants[name]
+    return avatar_url
+
+
+def enqueue_variants(db: AsyncSession, owner: str, owner_id: int, avatar_url: str) -> None:
+    """アバターを変更したのと同じトランザクションで呼ぶ（アップロード済みの画像以外は何もしない）"""
+    if not avatar_url.startswith(f"{upload_service.UPLOAD_URL_PREFIX}/"):
+        return
+    outbox_service.enqueue(
+        db, outbox_service.TOPIC_IMAGE, {"owner": owner, "owner_id": owner_id, "avatar_url": avatar_url}
+    )
+
+
+def _open(source: str, size: int):
+    """
+    寸法を確かめてから画像を開く（長辺 size 以下に縮小して使う前提）
+
+    Image.open はヘッダーだけを読むので、ここで断ればピクセルはデコードされない。
+    JPEG は draft で縮小しながらデコードさせ、必要なメモリを減らす。
+    """
+    from PIL import Image
+
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+    try:
+        width, height = image.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ImageTooLarge(f"{width}x{height}")
+        image.draft("RGB", (size, size))
+    except BaseException:
+        image.close()
+        raise
+    return image
+
+
+def generate_variants(source: str) -> dict[str, str]:
+    """source の画像から各サイズの WebP を隣に作り、{名前: パス} を返す（プロセスプールで実行する）"""
+    from PIL import Image, ImageOps
+
+    src = Path(source)
+    outputs = {name: str(src.with_name(f"{src.stem}_{name}.webp")) for name in VARIANTS}
+    # 同じ画像（同じハッシュ）のサムネイルが既にあれば作り直さない
+    if all(Path(path).exists() for path in outputs.values()):
+        return outputs
+    with _open(str(src), max(VARIANTS.values())) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        for name, size in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+            # 配信中のファイルを書きかけにしないよう一時ファイルから置き換える
+            tmp = f"{outputs[name]}.{os.getpid()}.tmp"
+            # exif / icc_profile を渡さないのでメタデータは書き出されない
+            resized.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(tmp, outputs[name])
+    return outputs
+
+
+def make_preview(source: str, dest: str) -> tuple[int, int]:
+    """source を PREVIEW_SIZE に縮小した WebP を dest に書き、(幅, 高さ) を返す（メタデータは含めない）"""
+    from PIL import Image, ImageOps
+
+    with _open(source, PREVIEW_SIZE) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.Resampling.LANCZOS)
+        image.save(dest, "WEBP", quality=WEBP_QUALITY, method=4)
+        return image.size
+
+
+async def process_batch(pool: ProcessPoolExecutor, batch_size: int) -> int:
+    """image トピックを 1 バッチ処理し、処理したイベント数を返す"""
+    loop = asyncio.get_running_loop()
+    async with async_session() as db:
+        events = await outbox_service.claim(db, (outbox_service.TOPIC_IMAGE,), batch_size)
+        if not events:
+            return 0
+        sources = [str(upload_service.url_to_path(e.payload["avatar_url"])) for e in events]
+        results = await asyncio.gather(
+            *(loop.run_in_executor(pool, generate_variants, source) for source in sources),
+            return_exceptions=True,
+        )
+
+        for event, result in zip(events, results):
+            payload = event.payload
+            if isinstance(result, Exception):
+                # 壊れた画像などは元画像のまま使う
+                logger.warning("サムネイルを作れませんでした: %s", payload["avatar_url"], exc_info=result)
+                continue
+            variants = {name: upload_service.path_to_url(Path(path)) for name, path in result.items()}
+            model = _OWNERS[payload["owner"]]
+            # 変換中に別の画像に差し替えられていたら記録しない
+            updated = await db.execute(
+                update(model)
+                .where(model.id == payload["owner_id"], model.avatar_url == payload["avatar_url"])
+                .values(avatar_variants=variants)
+            )
+            if updated.rowcount == 0:
+                # 不要になったサムネイルは元画像と一緒に GC ワーカーが消す
+                continue
+            if payload["owner"] == "user":
+                enqueue_user_profile_invalidation(db, payload["owner_id"])
+                enqueue_principal_invalidation(db, "user", payload["owner_id"])
+            else:
+                enqueue_persona_profile_invalidation(db, payload["owner_id"])
+
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([e.id for e in events])))
+        await db.commit()
+        return len(events)
@@ -0,0 +1,294 @@
+"""
+メールキャンペーンの一斉配信
+
+target_filter（JSONB）を users に対する SQL 条件に変換し、users.id のキーセットで
+MAIL_DELIVERY_CHUNK_SIZE 件ずつ宛先を読み出して送信する（全件をメモリに載せず、
+チャンクごとに短いトランザクションで読むので長時間のトランザクションを持たない）。
+チャンクを送り終えるごとに mail_delivery_runs へ最後の users.id と件数を保存するため、
+ワーカーが落ちても別のワーカーが続きのチャンクから再開する（最大 1 チャンク分は重複送信されうる）。
+
+送信中も別タスクが heartbeat_at を更新し続けるので、遅いチャンクで他のワーカーに引き継がれることはない。
+heartbeat_at は自分が最後に書いた値と一致するときだけ更新し、一致しなければ（停止とみなされて
+別のワーカーが取得していれば）以降のチャンクを送らずに中断する。
+
+target_filter の書式（すべて省略可、指定した条件の AND）:
+  {
+    "status": "active" または ["active", "suspended"],   # 省略時は active のみ
+    "min_credit_balance": 100,
+    "max_credit_balance": 1000,
+    "registered_after": "2026-01-01T00:00:00+09:00",
+    "registered_before": "2026-02-01T00:00:00+09:00",
+    "user_ids": [1, 2, 3],
+    "persona_ids": [10, 11]   # いずれかのペルソナとセッションがあるユーザー
+  }
+件名・本文の {display_name} {email} は宛先ごとに置き換える。
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, and_, exists, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.user import User, UserStatus
+from app.models.session import Session
+from app.models.mail_campaign import MailCampaign, CampaignType, CampaignStatus
+from app.models.mail_delivery_run import MailDeliveryRun, DeliveryRunStatus
+from app.services.mail_transport import MailMessage, get_transport
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\{(display_name|email)\}")
+_LINE_BREAKS = re.compile(r"[\r\n]+")
+
+
+def _parse_datetime(key: str, value) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} は ISO 8601 形式の日時で指定してください")
+
+
+def _int_list(key: str, value) -> list[int]:
+    if not isinstance(value, list) or not all(isinstance(v, int) for v in value):
+        raise ValueError(f"{key} は整数の配列で指定してください")
+    return value
+
+
+def compile_target_filter(target_filter: dict | None) -> list[ColumnElement[bool]]:
+    """target_filter を users に対する WHERE 条件のリストに変換する（不正な指定は ValueError）"""
+    target_filter = dict(target_filter or {})
+    conditions: list[ColumnElement[bool]] = []
+
+    statuses = target_filter.pop("status", UserStatus.active.value)
+    if isinstance(statuses, str):
+        statuses = [statuses]
+    try:
+        conditions.append(User.status.in_([UserStatus(s) for s in statuses]))
+    except (TypeError, ValueError):
+        raise ValueError("status が不正です")
+
+    for key, value in target_filter.items():
+        if key in ("min_credit_balance", "max_credit_balance"):
+            if not isinstance(value, int):
+                raise ValueError(f"{key} は整数で指定してください")
+            if key == "min_credit_balance":
+                conditions.append(User.credit_balance >= value)
+            else:
+                conditions.append(User.credit_balance <= value)
+        elif key == "registered_after":
+            conditions.append(User.created_at >= _parse_datetime(key, value))
+        elif key == "registered_before":
+            conditions.append(User.created_at < _parse_datetime(key, value))
+        elif key == "user_ids":
+            conditions.append(User.id.in_(_int_list(key, value)))
+        elif key == "persona_ids":
+            conditions.append(
+                exists().where(Session.user_id == User.id, Session.persona_id.in_(_int_list(key, value)))
+            )
+        else:
+            raise ValueError(f"未対応の条件です: {key}")
+    return conditions
+
+
+def render(template: str, recipient) -> str:
+    values = {"display_name": recipient.display_name, "email": recipient.email}
+    return _PLACEHOLDER.sub(lambda m: values[m.group(1)], template)
+
+
+def render_subject(template: str, recipient) -> str:
+    """件名用（表示名などに含まれる改行でヘッダーを差し込まれないよう、改行は空白にする）"""
+    return _LINE_BREAKS.sub(" ", render(template, recipient))
+
+
+async def create_run(db: AsyncSession, campaign: MailCampaign) -> MailDeliveryRun:
+    """配信を予約する（実際の送信はワーカーが行う）"""
+    try:
+        compile_target_filter(campaign.target_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    in_progress = await db.scalar(
+        select(MailDeliveryRun.id).where(
+            MailDeliveryRun.campaign_id == campaign.id,
+            MailDeliveryRun.status.in_([DeliveryRunStatus.pending, DeliveryRunStatus.running]),
+        )
+    )
+    if in_progress is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="このキャンペーンは配信中です")
+    run = MailDeliveryRun(campaign_id=campaign.id)
+    db.add(run)
+    await db.commit()
+    await db.refresh(run)
+    return run
+
+
+async def claim_run() -> MailDeliveryRun | None:
+    """未着手の配信か、ハートビートが途絶えた配信を 1 件取得して running にする"""
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=settings.mail_delivery_stale_seconds)
+    async with async_session() as db:
+        result = await db.execute(
+            select(MailDeliveryRun)
+            .where(
+                or_(
+                    MailDeliveryRun.status == DeliveryRunStatus.pending,
+                    and_(
+                        MailDeliveryRun.status == DeliveryRunStatus.running,
+                        MailDeliveryRun.heartbeat_at < stale_before,
+                    ),
+                )
+            )
+            .order_by(MailDeliveryRun.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        run = result.scalar_one_or_none()
+        if run is None:
+            return None
+        if run.status == DeliveryRunStatus.running:
+            logger.warning("停止した配信を再開します: run_id=%s last_user_id=%s", run.id, run.last_user_id)
+        run.status = DeliveryRunStatus.running
+        run.started_at = run.started_at or now
+        run.heartbeat_at = now
+        await db.commit()
+        return run
+
+
+async def _send_chunk(messages: list[MailMessage]) -> tuple[int, int]:
+    """同時接続数を MAIL_DELIVERY_CONCURRENCY に抑えて送信し、(成功数, 失敗数) を返す"""
+    transport = get_transport()
+    concurrency = max(1, settings.mail_delivery_concurrency)
+    size = -(-len(messages) // concurrency)
+    slices = [messages[i:i + size] for i in range(0, len(messages), size)]
+    outcomes = await asyncio.gather(*(transport.send_batch(s) for s in slices), return_exceptions=True)
+
+    sent = failed = 0
+    for batch, outcome in zip(slices, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning("メール送信に失敗しました: %d 件", len(batch), exc_info=outcome)
+            failed += len(batch)
+            continue
+        for error in outcome:
+            if error is None:
+                sent += 1
+            else:
+                failed += 1
+    return sent, failed
+
+
+class _Lease:
+    """
+    配信の実行権
+
+    heartbeat_at が自分の書いた値のままのときだけ更新する（別のワーカーに取得されていれば lost になる）。
+    ハートビートと進捗の保存が同時に走らないようロックで順番に行う。
+    """
+
+    def __init__(self, run_id: int, heartbeat_at: datetime):
+        self.run_id = run_id
+        self.heartbeat_at = heartbeat_at
+        self.lost = False
+        self._lock = asyncio.Lock()
+
+    async def renew(self, **values) -> bool:
+        async with self._lock:
+            if self.lost:
+                return False
+            now = datetime.now(timezone.utc)
+            async with async_session() as db:
+                result = await db.execute(
+                    update(MailDeliveryRun)
+                    .where(
+                        MailDeliveryRun.id == self.run_id,
+                        MailDeliveryRun.status == DeliveryRunStatus.running,
+                        MailDeliveryRun.heartbeat_at == self.heartbeat_at,
+                    )
+                    .values(heartbeat_at=now, **values)
+                )
+                await db.commit()
+            if result.rowcount != 1:
+                self.lost = True
+                return False
+            self.heartbeat_at = now
+            return True
+
+    async def keep_alive(self, interval: float) -> None:
+        """interval 秒ごとにハートビートを送る（実行権を失うか、キャンセルされるまで）"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.renew():
+                    return
+            except Exception:
+                logger.warning("ハートビートを更新できませんでした: run_id=%s", self.run_id, exc_info=True)
+
+    async def checkpoint(self, last_user_id: int, sent: int, failed: int) -> bool:
+        """チャンクの進捗を保存する。別のワーカーに引き継がれていた場合は False"""
+        return await self.renew(
+            last_user_id=last_user_id,
+            sent_count=MailDeliveryRun.sent_count + sent,
+            failed_count=MailDeliveryRun.failed_count + failed,
+        )
+
+
+async def _next_recipients(conditions: list[ColumnElement[bool]], after_user_id: int, limit: int) -> list:
+    async with async_session() as db:
+        result = await db.execute(
+            select(User.id, User.email, User.display_name)
+            .where(*conditions, User.id > after_user_id)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return list(result.all())
+
+
+async def _finish(run_id: int, run_status: DeliveryRunStatus, error: str | None = None) -> None:
+    async with async_session() as db:
+        run = await db.get(MailDeliveryRun, run_id)
+        run.status = run_status
+        run.error = error
+        run.finished_at = datetime.now(timezone.utc)
+        campaign = await db.get(MailCampaign, run.campaign_id)
+        # 定期配信は次回に備えて active のまま
+        if run_status == DeliveryRunStatus.completed and campaign.type != CampaignType.periodic:
+            campaign.status = CampaignStatus.sent
+        await db.commit()
+
+
+async def execute_run(run: MailDeliveryRun) -> None:
+    """配信を last_user_id の続きから最後まで実行する"""
+    chunk_size = settings.mail_delivery_chunk_size
+    lease = _Lease(run.id, run.heartbeat_at)
+    heartbeat = asyncio.create_task(lease.keep_alive(max(1.0, settings.mail_delivery_stale_seconds / 3)))
+    try:
+        async with async_session() as db:
+            campaign = await db.get(MailCampaign, run.campaign_id)
+        conditions = compile_target_filter(campaign.target_filter)
+        last_user_id = run.last_user_id
+        while recipients := await _next_recipients(conditions, last_user_id, chunk_size):
+            if lease.lost:
+                break
+            messages = [
+                MailMessage(r.email, render_subject(campaign.subject, r), render(campaign.body, r))
+                for r in recipients
+            ]
+            sent, failed = await _send_chunk(messages)
+            last_user_id = recipients[-1].id
+            if not await lease.checkpoint(last_user_id, sent, failed):
+                break
+        if lease.lost:
+            logger.warning("配信が別のワーカーに引き継がれたため中断します: run_id=%s", run.id)
+            return
+    except Exception as e:
+        logger.exception("メール配信に失敗しました: run_id=%s", run.id)
+        await _finish(run.id, DeliveryRunStatus.failed, str(e))
+        return
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+    await _finish(run.id, DeliveryRunStatus.completed)
@@ -0,0 +1,94 @@
+"""
+メール送信の差し替え可能な送信手段
+
+MAIL_TRANSPORT=smtp は標準ライブラリの smtplib をスレッドで動かし、1 バッチにつき接続を 1 本だけ使う。
+MAIL_TRANSPORT=file は JSON Lines でファイルに書き出すだけの代替実装（開発・テスト用）。
+"""
+
+import asyncio
+import json
+import smtplib
+from email.message import EmailMessage
+from pathlib import Path
+from typing import NamedTuple
+
+from app.config import settings
+
+
+class MailMessage(NamedTuple):
+    to: str
+    subject: str
+    body: str
+
+
+class SmtpTransport:
+    def __init__(self, host: str, port: int, username: str | None, password: str | None, use_tls: bool, sender: str):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender
+
+    async def send_batch(self, messages: list[MailMessage]) -> list[str | None]:
+        """各メッセージの送信結果（成功は None、失敗はエラー内容）を返す"""
+        return await asyncio.to_thread(self._send_batch, messages)
+
+    def _send_batch(self, messages: list[MailMessage]) -> list[str | None]:
+        results: list[str | None] = []
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            for message in messages:
+                mail = EmailMessage()
+                mail["From"] = self.sender
+                mail["To"] = message.to
+                mail["Subject"] = message.subject
+                mail.set_content(message.body)
+                try:
+                    smtp.send_message(mail)
+                    results.append(None)
+                except smtplib.SMTPException as e:
+                    results.append(str(e))
+        return results
+
+
+class FileTransport:
+    """送信内容をファイルに追記する"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = asyncio.Lock()
+
+    async def send_batch(self, messages: list[MailMessage]) -> list[str | None]:
+        async with self._lock:
+            await asyncio.to_thread(self._append, messages)
+        return [None] * len(messages)
+
+    def _append(self, messages: list[MailMessage]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            for message in messages:
+                f.write(json.dumps(message._asdict(), ensure_ascii=False) + "\n")
+
+
+_transport: SmtpTransport | FileTransport | None = None
+
+
+def get_transport() -> SmtpTransport | FileTransport:
+    global _transport
+    if _transport is None:
+        if settings.mail_transport == "smtp":
+            _transport = SmtpTransport(
+                settings.smtp_host,
+                settings.smtp_port,
+                settings.smtp_username,
+                settings.smtp_password,
+                settings.smtp_use_tls,
+                settings.mail_from,
+            )
+        else:
+            _transport = FileTransport(settings.mail_file_sink_path)
+    return _transport
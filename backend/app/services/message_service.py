@@ -1,7 +1,33 @@
-from sqlalchemy import select
+from collections import Counter
+from datetime import datetime, timezone
+from typing import NamedTuple, Union
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.message import Message
+from app.models.user import User
+from app.models.staff_member import StaffMember, StaffRole
+from app.models.persona import Persona
+from app.models.template import Template
+from app.models.message import Message, SenderType
+from app.models.session import Session, SessionStatus
+from app.schemas.message import MessageResponse
+from app.services import credit_reservation_service
+from app.services.account_service import get_persona_profiles
+from app.services.attachment_service import use_attachments
+from app.services.counter_service import add_unread_messages, mark_session_read
+from app.services.credit_service import deduct_credits
+from app.services.event_service import FIRST_MESSAGE_SENT, emit_event
+from app.services.notification_service import notify_message
+from app.services.persona_stats_service import enqueue_stats
+from app.services.principal_service import refresh_principal
+from app.services.outbox_service import enqueue_realtime
+from app.services.realtime_service import inbox_events, new_message_events
+
+CREDIT_COST_PER_MESSAGE = 1
+PREVIEW_LENGTH = 200
+ATTACHMENT_NOT_FOUND = "添付画像が見つかりません"
 
 
 async def get_messages_after(db: AsyncSession, session_id: int, last_message_id: int = 0) -> list[Message]:
@@ -12,3 +38,280 @@ async def get_messages_after(db: AsyncSession, session_id: int, last_message_id:
     )
     result = await db.execute(stmt)
     return list(result.scalars().all())
+
+
+async def get_session_for_account(
+    db: AsyncSession, session_id: int, account: Union[User, StaffMember]
+) -> Session:
+    """セッション存在確認 + 権限チェック"""
+    result = await db.execute(select(Session).where(Session.id == session_id))
+    session = result.scalar_one_or_none()
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="セッションが見つかりません")
+    if isinstance(account, User) and session.user_id != account.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="権限がありません")
+    return session
+
+
+async def create_message(
+    db: AsyncSession,
+    session: Session,
+    account: Union[User, StaffMember],
+    content: str,
+    title: str | None = None,
+    image_url: str | None = None,
+    attachment_id: int | None = None,
+) -> Message:
+    """メッセージを保存してコミットし、購読者へ配信する（attachment_id 指定時は image_url をそのプレビューにする）"""
+    if session.status != SessionStatus.active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="このセッションは終了しています")
+    if attachment_id is not None:
+        attachments = await use_attachments(db, account, [attachment_id])
+        if attachment_id not in attachments:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ATTACHMENT_NOT_FOUND)
+        image_url = attachments[attachment_id].preview_url
+
+    if isinstance(account, User):
+        sender_type = SenderType.user
+    else:
+        sender_type = SenderType.persona
+
+    # 予約済みクレジットがあればそこから消費し、users 行は更新しない
+    reservation_id = None
+    if isinstance(account, User):
+        reservation_id = await credit_reservation_service.spend(db, account, CREDIT_COST_PER_MESSAGE)
+
+    # 配信イベントをコミット前に組み立てるため created_at はアプリ側で決める
+    now = datetime.now(timezone.utc)
+    message = Message(
+        session_id=session.id,
+        sender_type=sender_type,
+        sender_id=account.id,
+        title=title,
+        content=content,
+        image_url=image_url,
+        attachment_id=attachment_id,
+        credit_cost=CREDIT_COST_PER_MESSAGE if sender_type == SenderType.user else 0,
+        credit_reservation_id=reservation_id,
+        created_at=now,
+    )
+    try:
+        db.add(message)
+        await db.flush()
+
+        # ユーザーの場合はクレジット減算（行ロックをコミットまでの短い間に抑えるため INSERT の後に行う）
+        if isinstance(account, User) and reservation_id is None:
+            await deduct_credits(db, account, CREDIT_COST_PER_MESSAGE, reference_id=message.id)
+        if isinstance(account, User) and not await _has_sent_before(db, account.id, message.id):
+            emit_event(db, FIRST_MESSAGE_SENT, account.id, {"session_id": session.id, "message_id": message.id})
+
+        # セッション一覧用の非正規化カラムを同じトランザクションで更新する
+        session.last_message_at = now
+        if sender_type == SenderType.persona:
+            session.last_persona_message_id = message.id
+            session.last_persona_message_preview = content[:PREVIEW_LENGTH]
+            notify_message(db, session.user_id, session.persona_id, content[:PREVIEW_LENGTH])
+            await add_unread_messages(db, {session.id: 1}, {session.id: session.user_id})
+        elif session.user_unread_count:
+            # 返信したユーザーはそこまでのメッセージを読んでいる
+            await mark_session_read(db, session)
+        db.add(session)
+        enqueue_stats(db, session.persona_id, messages=1)
+
+        # 配信はアウトボックス経由（ペルソナ側の送信者はスタッフ本人ではなくペルソナ名。ポーリングと同じ）
+        if sender_type == SenderType.user:
+            sender_display_name = account.display_name
+        else:
+            sender_display_name = await _persona_name(db, session.persona_id)
+        enqueue_realtime(db, _message_events(session.persona_id, session.user_id, message, sender_display_name))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        if reservation_id is not None:
+            await credit_reservation_service.refund(account.id, reservation_id, CREDIT_COST_PER_MESSAGE)
+        raise
+    if isinstance(account, User):
+        await refresh_principal(account)
+    return message
+
+
+async def _persona_name(db: AsyncSession, persona_id: int) -> str | None:
+    profile = (await get_persona_profiles(db, [persona_id])).get(persona_id)
+    return profile.name if profile else None
+
+
+async def _has_sent_before(db: AsyncSession, user_id: int, message_id: int) -> bool:
+    result = await db.execute(
+        select(Message.id)
+        .where(Message.sender_type == SenderType.user, Message.sender_id == user_id, Message.id != message_id)
+        .limit(1)
+    )
+    return result.first() is not None
+
+
+class BatchSendItem(NamedTuple):
+    session_id: int
+    content: str | None = None
+    template_id: int | None = None
+    title: str | None = None
+    image_url: str | None = None
+    attachment_id: int | None = None
+
+
+class BatchSendResult(NamedTuple):
+    message: Message | None = None
+    error: str | None = None
+
+
+async def create_persona_messages_batch(
+    db: AsyncSession, staff: StaffMember, items: list[BatchSendItem]
+) -> list[BatchSendResult]:
+    """
+    スタッフが複数セッションへまとめて送信する
+
+    セッション権限とテンプレートをそれぞれ 1 クエリで確認し、送信可能な分を 1 回の複数行 INSERT で保存する。
+    結果は items と同じ順序で、失敗した項目には error を入れて返す。
+    """
+    is_admin = staff.role == StaffRole.admin
+    session_ids = {item.session_id for item in items}
+    result = await db.execute(
+        select(Session.id, Session.status, Session.persona_id, Session.user_id, Persona.staff_id)
+        .join(Persona, Persona.id == Session.persona_id)
+        .where(Session.id.in_(session_ids))
+    )
+    sessions = {row.id: row for row in result.all()}
+
+    template_ids = {item.template_id for item in items if item.template_id is not None}
+    templates: dict[int, str] = {}
+    if template_ids:
+        stmt = select(Template.id, Template.content).where(Template.id.in_(template_ids))
+        if not is_admin:
+            stmt = stmt.where(Template.staff_id == staff.id)
+        result = await db.execute(stmt)
+        templates = {row.id: row.content for row in result.all()}
+
+    attachments = await use_attachments(db, staff, (i.attachment_id for i in items if i.attachment_id is not None))
+
+    results: list[BatchSendResult | None] = [None] * len(items)
+    rows: list[dict] = []
+    row_indexes: list[int] = []
+    for index, item in enumerate(items):
+        session = sessions.get(item.session_id)
+        if session is None:
+            results[index] = BatchSendResult(error="セッションが見つかりません")
+            continue
+        if not is_admin and session.staff_id != staff.id:
+            results[index] = BatchSendResult(error="権限がありません")
+            continue
+        if session.status != SessionStatus.active:
+            results[index] = BatchSendResult(error="このセッションは終了しています")
+            continue
+        if item.template_id is not None:
+            content = templates.get(item.template_id)
+            if content is None:
+                results[index] = BatchSendResult(error="テンプレートが見つかりません")
+                continue
+        else:
+            content = item.content
+        if not content:
+            results[index] = BatchSendResult(error="本文またはテンプレートを指定してください")
+            continue
+        image_url = item.image_url
+        if item.attachment_id is not None:
+            attachment = attachments.get(item.attachment_id)
+            if attachment is None:
+                results[index] = BatchSendResult(error=ATTACHMENT_NOT_FOUND)
+                continue
+            image_url = attachment.preview_url
+        rows.append(
+            {
+                "session_id": item.session_id,
+                "sender_type": SenderType.persona,
+                "sender_id": staff.id,
+                "title": item.title,
+                "content": content,
+                "image_url": image_url,
+                "attachment_id": item.attachment_id,
+                "credit_cost": 0,
+            }
+        )
+        row_indexes.append(index)
+
+    if not rows:
+        return results
+
+    inserted = await db.scalars(insert(Message).returning(Message, sort_by_parameter_order=True), rows)
+    messages = list(inserted.all())
+
+    # 同じセッションに複数送った場合は最後のメッセージで非正規化カラムを更新する
+    now = datetime.now(timezone.utc)
+    latest: dict[int, Message] = {message.session_id: message for message in messages}
+    await db.execute(
+        update(Session),
+        [
+            {
+                "id": session_id,
+                "last_message_at": now,
+                "updated_at": now,
+                "last_persona_message_id": message.id,
+                "last_persona_message_preview": message.content[:PREVIEW_LENGTH],
+            }
+            for session_id, message in latest.items()
+        ],
+    )
+    persona_profiles = await get_persona_profiles(db, (sessions[m.session_id].persona_id for m in messages))
+    events: list[tuple[str, dict]] = []
+    for index, message in zip(row_indexes, messages):
+        results[index] = BatchSendResult(message=message)
+        session = sessions[message.session_id]
+        persona = persona_profiles.get(session.persona_id)
+        events.extend(_message_events(session.persona_id, session.user_id, message, persona.name if persona else None))
+        notify_message(db, session.user_id, session.persona_id, message.content[:PREVIEW_LENGTH])
+    await add_unread_messages(
+        db,
+        Counter(message.session_id for message in messages),
+        {session_id: sessions[session_id].user_id for session_id in latest},
+    )
+    for persona_id, count in Counter(sessions[m.session_id].persona_id for m in messages).items():
+        enqueue_stats(db, persona_id, messages=count)
+    enqueue_realtime(db, events)
+    await db.commit()
+    return results
+
+
+def _message_events(
+    persona_id: int, user_id: int, message: Message, sender_display_name: str | None
+) -> list[tuple[str, dict]]:
+    """セッション購読者向けと受信箱向けの新着イベント"""
+    payload = MessageResponse.model_validate(message).model_copy(
+        update={"sender_display_name": sender_display_name}
+    )
+    return new_message_events(message.session_id, message.id, payload.model_dump(mode="json")) + inbox_events(
+        persona_id,
+        {
+            "type": "message",
+            "session_id": message.session_id,
+            "persona_id": persona_id,
+            "user_id": user_id,
+            "message_id": message.id,
+            "sender_type": message.sender_type.value,
+            "created_at": message.created_at.isoformat(),
+        },
+    )
+
+
+def enqueue_session_status(db: AsyncSession, session: Session) -> None:
+    """セッションの作成・終了をスタッフ受信箱に通知する（セッションの変更と同じトランザクションで呼ぶ）"""
+    enqueue_realtime(
+        db,
+        inbox_events(
+            session.persona_id,
+            {
+                "type": "session",
+                "session_id": session.id,
+                "persona_id": session.persona_id,
+                "user_id": session.user_id,
+                "status": session.status.value,
+            },
+        ),
+    )
@@ -0,0 +1,108 @@
+"""
+いいね・メッセージ・クレジット付与のお知らせ作成
+
+ハンドラーは notify:<kind> トピックでアウトボックスに 1 行追加するだけにし、
+通知ワーカー（app.workers.notification_fanout）が種類ごとの時間枠でまとめて作成する。
+時間枠は作成時刻を NOTIFICATION_WINDOW_<KIND>_SECONDS で区切った固定の区間で、
+区間が終わったものから (topic, created_at) のインデックス順に取り出すため、同じ区間・同じ宛先のイベントは 1 件のお知らせになる
+（例: 「さくらから5件の新着メッセージ」）。1 バッチ分のお知らせは複数行 INSERT でまとめて書き込む。
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.notification import Notification, NotificationType
+from app.models.outbox import OutboxEvent
+from app.services.account_service import get_persona_profiles
+from app.services.counter_service import add_unread_notifications
+from app.services.outbox_service import enqueue
+
+KIND_MESSAGE = "message"
+KIND_LIKE = "like"
+KIND_CREDIT = "credit"
+KINDS = (KIND_MESSAGE, KIND_LIKE, KIND_CREDIT)
+
+
+def _topic(kind: str) -> str:
+    return f"notify:{kind}"
+
+
+def _window_seconds(kind: str) -> int:
+    return {
+        KIND_MESSAGE: settings.notification_window_message_seconds,
+        KIND_LIKE: settings.notification_window_like_seconds,
+        KIND_CREDIT: settings.notification_window_credit_seconds,
+    }[kind]
+
+
+def notify_message(db: AsyncSession, user_id: int, persona_id: int, preview: str) -> None:
+    """ペルソナからのメッセージをユーザーに知らせる（メッセージと同じトランザクションで呼ぶ）"""
+    enqueue(db, _topic(KIND_MESSAGE), {"user_id": user_id, "persona_id": persona_id, "preview": preview})
+
+
+def notify_like(db: AsyncSession, user_id: int, persona_id: int) -> None:
+    enqueue(db, _topic(KIND_LIKE), {"user_id": user_id, "persona_id": persona_id})
+
+
+def notify_credit(db: AsyncSession, user_id: int, amount: int) -> None:
+    enqueue(db, _topic(KIND_CREDIT), {"user_id": user_id, "amount": amount})
+
+
+def _group_key(kind: str, payload: dict) -> tuple:
+    if kind == KIND_MESSAGE:
+        return payload["user_id"], payload["persona_id"]
+    return (payload["user_id"],)
+
+
+def _build(kind: str, payloads: list[dict], persona_names: dict[int, str]) -> dict:
+    user_id = payloads[0]["user_id"]
+    count = len(payloads)
+    if kind == KIND_MESSAGE:
+        name = persona_names.get(payloads[0]["persona_id"], "ペルソナ")
+        title = f"{name}から新着メッセージ" if count == 1 else f"{name}から{count}件の新着メッセージ"
+        return {"user_id": user_id, "type": NotificationType.message, "title": title, "body": payloads[-1]["preview"]}
+    if kind == KIND_LIKE:
+        names = list(dict.fromkeys(persona_names.get(p["persona_id"], "ペルソナ") for p in payloads))
+        title = f"{names[0]}にいいねしました" if len(names) == 1 else f"{names[0]}さん他{len(names) - 1}人にいいねしました"
+        return {"user_id": user_id, "type": NotificationType.like, "title": title, "body": None}
+    total = sum(p["amount"] for p in payloads)
+    return {"user_id": user_id, "type": NotificationType.credit, "title": f"{total}クレジットが付与されました", "body": None}
+
+
+async def fan_out(kind: str, batch_size: int) -> int:
+    """時間枠が終わったイベントを 1 バッチまとめてお知らせにし、処理したイベント数を返す"""
+    window = _window_seconds(kind)
+    now = datetime.now(timezone.utc).timestamp()
+    cutoff = datetime.fromtimestamp(now - now % window if window > 0 else now, timezone.utc)
+    async with async_session() as db:
+        result = await db.execute(
+            select(OutboxEvent)
+            .where(OutboxEvent.topic == _topic(kind), OutboxEvent.created_at < cutoff)
+            .order_by(OutboxEvent.created_at, OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        events = list(result.scalars().all())
+        if not events:
+            return 0
+
+        groups: dict[tuple, list[dict]] = defaultdict(list)
+        for event in events:
+            bucket = int(event.created_at.timestamp() // window) if window > 0 else event.id
+            groups[(bucket, *_group_key(kind, event.payload))].append(event.payload)
+
+        persona_ids = {p["persona_id"] for p in (e.payload for e in events) if "persona_id" in p}
+        profiles = await get_persona_profiles(db, persona_ids)
+        persona_names = {persona_id: profile.name for persona_id, profile in profiles.items()}
+
+        notifications = [_build(kind, payloads, persona_names) for payloads in groups.values()]
+        await db.execute(insert(Notification), notifications)
+        await add_unread_notifications(db, (n["user_id"] for n in notifications))
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([e.id for e in events])))
+        await db.commit()
+        return len(events)
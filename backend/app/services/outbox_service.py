@@ -0,0 +1,157 @@
+"""
+トランザクショナル・アウトボックス
+
+リクエストハンドラーはリアルタイム配信・キャッシュ無効化・通知作成などの副作用を直接行わず、
+業務データと同じトランザクションで outbox_events に 1 行追加するだけにする。
+コミットされた行だけが残るので、ワーカーが落ちても副作用は失われず、ロールバック時には発生しない。
+
+中継ワーカー（app.workers.outbox_relay）が topic ごとにまとめて ID 順に取り出し（SKIP LOCKED）、
+処理したら同じトランザクションで削除する。trigger トピックはトリガーメールワーカー、
+notify:* トピックはお知らせ作成ワーカー（app.workers.notification_fanout）、
+stats トピックはペルソナ集計ワーカー（app.workers.persona_stats）、
+image トピックは画像ワーカー（app.workers.image_variants）が処理する。
+outbox_events への INSERT は DB トリガーで pg_notify されるため、中継ワーカーはポーリングを待たずに起きる。
+
+書き込んだワーカー自身は中継を待たずに結果を反映する。キャッシュ無効化はコミット直後に自ワーカーの
+LRU から同期的に消し、Redis の削除と他ワーカーへの通知もそのまま始める（行は取りこぼし対策として残す）。
+REALTIME_BACKEND=local ではブローカーがプロセス内にしかなく中継ワーカーからは届かないため、
+リアルタイム配信は行を積まずにコミット後にこのプロセスで配信する。
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.event import listens_for
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import async_session
+from app.models.notification import Notification
+from app.models.outbox import OutboxEvent
+from app.services import cache_service, realtime_service
+from app.services.counter_service import add_unread_notifications
+
+logger = logging.getLogger(__name__)
+
+TOPIC_REALTIME = "realtime"
+TOPIC_CACHE = "cache"
+TOPIC_NOTIFICATION = "notification"
+TOPIC_TRIGGER = "trigger"
+TOPIC_STATS = "stats"
+TOPIC_IMAGE = "image"
+
+# 中継ワーカーが処理する topic
+RELAY_TOPICS = (TOPIC_REALTIME, TOPIC_CACHE, TOPIC_NOTIFICATION)
+NOTIFY_CHANNEL = "outbox_events"
+
+_AFTER_COMMIT_KEY = "outbox_after_commit"
+# コミット後に始めたタスク（完了前にガベージコレクションされないよう参照を持つ）
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _after_commit(db: AsyncSession, callback: Callable[[], None]) -> None:
+    """db のトランザクションがコミットされたときだけ callback を呼ぶ（ロールバックされたら捨てる）"""
+    db.sync_session.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+
+
+@listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    for callback in session.info.pop(_AFTER_COMMIT_KEY, ()):
+        try:
+            callback()
+        except Exception:
+            logger.exception("コミット後の処理に失敗しました")
+
+
+@listens_for(Session, "after_rollback")
+def _discard_after_commit(session: Session) -> None:
+    session.info.pop(_AFTER_COMMIT_KEY, None)
+
+
+def _spawn(coro) -> None:
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def enqueue(db: AsyncSession, topic: str, payload: dict) -> None:
+    db.add(OutboxEvent(topic=topic, payload=payload))
+
+
+def enqueue_realtime(db: AsyncSession, events: list[tuple[str, dict]]) -> None:
+    """(チャンネル, イベント) のリストをコミット後に配信する"""
+    if not events:
+        return
+    if settings.realtime_backend == "local":
+        events = list(events)
+        _after_commit(db, lambda: _spawn(realtime_service.get_broker().publish_many(events)))
+        return
+    enqueue(db, TOPIC_REALTIME, {"events": [[channel, event] for channel, event in events]})
+
+
+def enqueue_cache_invalidation(db: AsyncSession, namespace: str, keys: list) -> None:
+    """コミット後に全ワーカーのキャッシュから keys を消す（自ワーカーの LRU はコミット直後に消す）"""
+    keys = [str(k) for k in keys]
+    enqueue(db, TOPIC_CACHE, {"namespace": namespace, "keys": keys})
+    cache = cache_service.get_registered_cache(namespace)
+    if cache is not None:
+
+        def invalidate() -> None:
+            cache.evict_local(keys)
+            _spawn(cache.invalidate(keys))
+
+        _after_commit(db, invalidate)
+
+
+def enqueue_notification(db: AsyncSession, user_id: int, type: str, title: str, body: str | None = None) -> None:
+    enqueue(db, TOPIC_NOTIFICATION, {"user_id": user_id, "type": type, "title": title, "body": body})
+
+
+async def claim(db: AsyncSession, topics: tuple[str, ...], batch_size: int) -> list[OutboxEvent]:
+    result = await db.execute(
+        select(OutboxEvent)
+        .where(OutboxEvent.topic.in_(topics))
+        .order_by(OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    return list(result.scalars().all())
+
+
+async def relay_batch(batch_size: int) -> int:
+    """中継対象の行を 1 バッチ処理し、処理した件数を返す"""
+    async with async_session() as db:
+        events = await claim(db, RELAY_TOPICS, batch_size)
+        if not events:
+            return 0
+        by_topic: dict[str, list[dict]] = defaultdict(list)
+        for event in events:
+            by_topic[event.topic].append(event.payload)
+
+        # 通知は削除と同じトランザクションで作成するので重複も欠落もしない
+        notifications = by_topic.get(TOPIC_NOTIFICATION)
+        if notifications:
+            await db.execute(insert(Notification), notifications)
+            await add_unread_notifications(db, (n["user_id"] for n in notifications))
+
+        # Pub/Sub とキャッシュはコミット前に送る。配信に失敗したらロールバックして次回に再送する
+        # （最低 1 回の配信。クライアントは message_id などで重複を無視する）
+        realtime_events = [
+            (channel, event) for payload in by_topic.get(TOPIC_REALTIME, []) for channel, event in payload["events"]
+        ]
+        if realtime_events:
+            await realtime_service.get_broker().publish_many(realtime_events)
+        for payload in by_topic.get(TOPIC_CACHE, []):
+            cache = cache_service.get_registered_cache(payload["namespace"])
+            if cache is None:
+                logger.warning("未登録のキャッシュです: %s", payload["namespace"])
+                continue
+            await cache.invalidate(payload["keys"])
+
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([e.id for e in events])))
+        await db.commit()
+        return len(events)
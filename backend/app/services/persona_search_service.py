@@ -0,0 +1,108 @@
+"""
+ペルソナ検索（さがす画面）
+
+条件をすべて 1 つの SELECT の WHERE にまとめ、PostgreSQL が部分インデックスを組み合わせて
+（BitmapAnd）絞り込めるようにする。並びは id 昇順のキーセットページネーション。
+  - q: 名前または自己紹介に含まれる語（空白区切りの AND、大文字小文字を区別しない）→ pg_trgm の GIN
+      （2 文字以下の語はトリグラムが作れないためインデックスの効きが弱い）
+  - name: 名前の部分一致 → pg_trgm の GIN
+  - gender, min_age, max_age → (gender, age) の B-tree
+  - attributes: {"key": value, ...} を含むもの（@>）→ jsonb_path_ops の GIN
+
+条件なしの一覧は全ユーザーで同じ結果になるため、ページごとに 2 段キャッシュに載せる
+（ペルソナの更新は TTL が切れるまで反映されない）。
+"""
+
+import json
+from dataclasses import dataclass, field
+
+from sqlalchemy import ColumnElement, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.persona import Gender, Persona
+from app.pagination import decode_cursor
+from app.schemas.persona import PersonaResponse
+from app.services.cache_service import get_cache
+from app.services.image_service import GRID_VARIANT, pick_variant
+
+browse_cache = get_cache(
+    "persona_browse",
+    maxsize=1000,
+    local_ttl=settings.persona_browse_cache_local_ttl_seconds,
+    redis_ttl=settings.persona_browse_cache_redis_ttl_seconds,
+)
+
+
+@dataclass
+class PersonaSearchQuery:
+    q: str | None = None
+    name: str | None = None
+    gender: Gender | None = None
+    min_age: int | None = None
+    max_age: int | None = None
+    attributes: dict = field(default_factory=dict)
+
+    def is_empty(self) -> bool:
+        return not any(
+            [(self.q or "").split(), self.name, self.attributes]
+        ) and self.gender is None and self.min_age is None and self.max_age is None
+
+
+def parse_attribute_filters(values: list[str]) -> dict:
+    """"key:value" の配列を @> 用の辞書にする（値は JSON として読めなければ文字列）"""
+    attributes: dict = {}
+    for item in values:
+        key, sep, raw = item.partition(":")
+        if not sep or not key:
+            raise ValueError(f"attr は key:value の形式で指定してください: {item}")
+        try:
+            attributes[key] = json.loads(raw)
+        except ValueError:
+            attributes[key] = raw
+    return attributes
+
+
+def build_conditions(query: PersonaSearchQuery) -> list[ColumnElement[bool]]:
+    conditions: list[ColumnElement[bool]] = [Persona.is_active == True]
+    for term in (query.q or "").split():
+        conditions.append(
+            or_(Persona.name.icontains(term, autoescape=True), Persona.bio.icontains(term, autoescape=True))
+        )
+    if query.name:
+        conditions.append(Persona.name.icontains(query.name, autoescape=True))
+    if query.gender is not None:
+        conditions.append(Persona.gender == query.gender)
+    if query.min_age is not None:
+        conditions.append(Persona.age >= query.min_age)
+    if query.max_age is not None:
+        conditions.append(Persona.age <= query.max_age)
+    if query.attributes:
+        conditions.append(Persona.attributes.contains(query.attributes))
+    return conditions
+
+
+def to_grid_response(persona: Persona) -> PersonaResponse:
+    """一覧用のレスポンス（avatar_url をグリッド表示用のサムネイルに差し替える）"""
+    response = PersonaResponse.model_validate(persona, from_attributes=True)
+    response.avatar_url = pick_variant(persona.avatar_url, persona.avatar_variants, GRID_VARIANT)
+    return response
+
+
+async def search(db: AsyncSession, query: PersonaSearchQuery, cursor: str | None, limit: int) -> list[PersonaResponse]:
+    """条件に合うペルソナを id 昇順で返す"""
+    after_id = decode_cursor(cursor)[1] if cursor else 0
+    cache_key = f"{after_id}:{limit}"
+    browse = query.is_empty()
+    if browse:
+        cached, _ = await browse_cache.get_many([cache_key])
+        if cache_key in cached:
+            return [PersonaResponse.model_validate(p) for p in cached[cache_key]]
+
+    result = await db.execute(
+        select(Persona).where(and_(*build_conditions(query)), Persona.id > after_id).order_by(Persona.id).limit(limit)
+    )
+    personas = [to_grid_response(p) for p in result.scalars().all()]
+    if browse:
+        await browse_cache.set_many({cache_key: [p.model_dump(mode="json") for p in personas]})
+    return personas
@@ -0,0 +1,123 @@
+"""
+ペルソナの人気・注目度の集計
+
+いいね・足跡・セッション・メッセージのハンドラーは、業務データと同じトランザクションで
+アウトボックスの stats トピックに増減だけを積む。集計ワーカー（app.workers.persona_stats）が
+まとめて取り出してペルソナごとに合算し、persona_stats に加算する（全件を数え直さないので、
+1 回の処理量は likes や messages の総数ではなく前回からの増減の件数で決まる）。
+
+直近 24 時間のメッセージ数は persona_message_hours に 1 時間単位で持ち、
+対象のペルソナだけ最大 24 行を合計し直す。24 時間を過ぎた行は定期的に消して合計し直す。
+popularity_score は生成列なので、集計を更新すると人気順のインデックスも同時に更新される。
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session
+from app.models.outbox import OutboxEvent
+from app.models.persona_stats import PersonaMessageHour, PersonaStats
+from app.services import outbox_service
+
+# ペイロードのキー → persona_stats の列
+_COUNTERS = {
+    "likes": "like_count",
+    "visitors": "visitor_count",
+    "active_sessions": "active_session_count",
+}
+TRENDING_WINDOW = timedelta(hours=24)
+
+
+def enqueue_stats(db: AsyncSession, persona_id: int, **deltas: int) -> None:
+    """増減を積む（likes / visitors / active_sessions / messages）"""
+    outbox_service.enqueue(db, outbox_service.TOPIC_STATS, {"persona_id": persona_id, **deltas})
+
+
+def _hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+async def _refresh_messages_24h(db: AsyncSession, persona_ids: set[int], now: datetime) -> None:
+    if not persona_ids:
+        return
+    recent = (
+        select(func.coalesce(func.sum(PersonaMessageHour.count), 0))
+        .where(PersonaMessageHour.persona_id == PersonaStats.persona_id, PersonaMessageHour.hour > now - TRENDING_WINDOW)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(PersonaStats)
+        .where(PersonaStats.persona_id.in_(sorted(persona_ids)))
+        .values(messages_24h=recent)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_batch(batch_size: int) -> int:
+    """stats トピックを 1 バッチ集計に反映し、処理したイベント数を返す"""
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        events = await outbox_service.claim(db, (outbox_service.TOPIC_STATS,), batch_size)
+        if not events:
+            return 0
+
+        totals: dict[int, Counter[str]] = defaultdict(Counter)
+        hours: Counter[tuple[int, datetime]] = Counter()
+        for event in events:
+            persona_id = event.payload["persona_id"]
+            totals[persona_id].update({key: event.payload.get(key, 0) for key in _COUNTERS})
+            if event.payload.get("messages"):
+                hours[(persona_id, _hour(event.created_at))] += event.payload["messages"]
+
+        # ペルソナ ID 順に加算してワーカー同士のデッドロックを避ける
+        rows = [
+            {"persona_id": persona_id, **{column: counts[key] for key, column in _COUNTERS.items()}}
+            for persona_id, counts in sorted(totals.items())
+        ]
+        stmt = insert(PersonaStats).values(rows)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[PersonaStats.persona_id],
+                set_={
+                    **{
+                        column: getattr(PersonaStats, column) + getattr(stmt.excluded, column)
+                        for column in _COUNTERS.values()
+                    },
+                    "updated_at": func.now(),
+                },
+            )
+        )
+        if hours:
+            stmt = insert(PersonaMessageHour).values(
+                [{"persona_id": p, "hour": h, "count": n} for (p, h), n in sorted(hours.items())]
+            )
+            await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[PersonaMessageHour.persona_id, PersonaMessageHour.hour],
+                    set_={"count": PersonaMessageHour.count + stmt.excluded.count},
+                )
+            )
+            await _refresh_messages_24h(db, {p for p, _ in hours}, now)
+
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([e.id for e in events])))
+        await db.commit()
+        return len(events)
+
+
+async def expire_message_hours() -> int:
+    """24 時間を過ぎたメッセージ数を消して該当ペルソナの messages_24h を合計し直し、対象ペルソナ数を返す"""
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        result = await db.execute(
+            delete(PersonaMessageHour)
+            .where(PersonaMessageHour.hour <= now - TRENDING_WINDOW)
+            .returning(PersonaMessageHour.persona_id)
+        )
+        persona_ids = set(result.scalars().all())
+        await _refresh_messages_24h(db, persona_ids, now)
+        await db.commit()
+        return len(persona_ids)
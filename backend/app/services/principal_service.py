@@ -0,0 +1,133 @@
+"""
+認証済みアカウント（プリンシパル）のキャッシュ
+
+JWT の (type, sub) をキーに、アカウントの列（パスワードハッシュを除く）をキャッシュする。
+キャッシュから復元したアカウントは DB を読まずにセッションへ「読み込み済み」として載せるため、
+ハンドラーは従来どおり ORM オブジェクトとして扱える（更新すれば主キー指定の UPDATE になる）。
+パスワードハッシュは共有の Redis に置かないので、復元したアカウントでは未ロードのままにする
+（パスワードの確認は auth_service が DB から読んだアカウントで行う）。
+"""
+
+from datetime import datetime
+from typing import Union
+
+from sqlalchemy import DateTime, Enum, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from app.config import settings
+from app.models.user import User
+from app.models.staff_member import StaffMember
+from app.services.cache_service import get_cache
+from app.services.outbox_service import enqueue_cache_invalidation
+
+principal_cache = get_cache(
+    "principal",
+    maxsize=settings.principal_cache_size,
+    local_ttl=settings.principal_cache_ttl_seconds,
+    redis_ttl=settings.principal_cache_ttl_seconds,
+    use_redis=settings.principal_cache_use_redis,
+)
+
+_MODELS = {"user": User, "staff": StaffMember}
+# キャッシュに置かない列
+_SECRET_COLUMNS = {"hashed_password"}
+
+
+def _columns(model) -> dict:
+    """{属性名: 列の型}（Redis に JSON で置くため、日時と列挙型は復元時に型を戻す）"""
+    return {
+        attr.key: attr.columns[0].type
+        for attr in inspect(model).column_attrs
+        if attr.key not in _SECRET_COLUMNS
+    }
+
+
+_COLUMNS = {account_type: _columns(model) for account_type, model in _MODELS.items()}
+
+
+def _key(account_type: str, account_id: int) -> str:
+    return f"{account_type}:{account_id}"
+
+
+def _account_type(account: Union[User, StaffMember]) -> str:
+    return "staff" if isinstance(account, StaffMember) else "user"
+
+
+def _snapshot(account: Union[User, StaffMember]) -> dict | None:
+    """キャッシュ用の辞書を作る。未ロードの列がある場合は None"""
+    loaded = inspect(account).dict
+    data = {}
+    for field in _COLUMNS[_account_type(account)]:
+        if field not in loaded:
+            return None
+        value = loaded[field]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif hasattr(value, "value"):
+            value = value.value
+        data[field] = value
+    return data
+
+
+def _restore(db: AsyncSession, account_type: str, data: dict) -> Union[User, StaffMember] | None:
+    """キャッシュの辞書をセッションに載せる。列が欠けている（古い形式の）場合は None"""
+    model = _MODELS[account_type]
+    if not data.keys() >= _COLUMNS[account_type].keys():
+        return None
+    existing = db.identity_map.get(identity_key(model, data["id"]))
+    if existing is not None:
+        return existing
+
+    values = {}
+    for field, column_type in _COLUMNS[account_type].items():
+        value = data[field]
+        if value is not None and isinstance(column_type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(column_type, Enum) and column_type.enum_class is not None:
+            value = column_type.enum_class(value)
+        values[field] = value
+    account = model(**values)
+    make_transient_to_detached(account)
+    db.add(account)
+    return account
+
+
+async def load_principal(
+    db: AsyncSession, account_type: str, account_id: int
+) -> Union[User, StaffMember] | None:
+    """キャッシュにあればそれを、なければ DB から読み込んでキャッシュする"""
+    key = _key(account_type, account_id)
+    cached, missing = await principal_cache.get_many([key])
+    if key in cached:
+        account = _restore(db, account_type, cached[key])
+        if account is not None:
+            return account
+
+    account = await db.get(_MODELS[account_type], account_id)
+    if account is not None:
+        data = _snapshot(account)
+        if data is not None:
+            await principal_cache.set_many({key: data}, missing)
+    return account
+
+
+async def invalidate_principal(account_type: str, account_id: int) -> None:
+    """ステータス変更などの後に呼ぶ（コミット後）"""
+    await principal_cache.invalidate([_key(account_type, account_id)])
+
+
+def enqueue_principal_invalidation(db: AsyncSession, account_type: str, account_id: int) -> None:
+    """ステータス変更などと同じトランザクションで呼ぶ（コミット後に中継ワーカーが無効化する）"""
+    enqueue_cache_invalidation(db, principal_cache.namespace, [_key(account_type, account_id)])
+
+
+async def refresh_principal(account: Union[User, StaffMember]) -> None:
+    """残高変更など、コミット済みの値でキャッシュを書き換える（未ロードの列があれば無効化）"""
+    key = _key(_account_type(account), account.id)
+    data = _snapshot(account)
+    if data is None:
+        await principal_cache.invalidate([key])
+    else:
+        await principal_cache.replace({key: data})
@@ -0,0 +1,225 @@
+"""
+リアルタイム通知用の Pub/Sub
+
+API ワーカーが複数あっても届くよう Redis Pub/Sub でイベントを配信する。
+各ワーカーは Redis への購読接続を 1 本だけ持ち、受信したイベントを
+プロセス内の待機者（ロングポーリング等）に振り分ける。
+REALTIME_BACKEND=local の場合は単一プロセス内だけで完結する代替実装を使う。
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+def session_channel(session_id: int) -> str:
+    return f"session:{session_id}"
+
+
+def inbox_persona_channel(persona_id: int) -> str:
+    return f"inbox:persona:{persona_id}"
+
+
+# 管理者は全ペルソナの受信箱を購読する
+INBOX_ALL_CHANNEL = "inbox:all"
+
+
+class Subscription:
+    """1 つ以上のチャンネルのイベントを受け取るキュー"""
+
+    def __init__(self, channels: tuple[str, ...]):
+        self.channels = channels
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def _deliver(self, event: dict) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 受信側が詰まっている場合は捨てる（クライアントは差分取得で追いつける）
+            pass
+
+    async def wait(self, timeout: float) -> dict | None:
+        """イベントを 1 件待つ。タイムアウト時は None"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """プロセス内だけで配信するブローカー（開発・テスト用）"""
+
+    def __init__(self):
+        self._subscribers: dict[str, set[Subscription]] = defaultdict(set)
+
+    async def publish(self, channel: str, event: dict) -> None:
+        self._dispatch(channel, event)
+
+    async def publish_many(self, events: list[tuple[str, dict]]) -> None:
+        for channel, event in events:
+            self._dispatch(channel, event)
+
+    def _dispatch(self, channel: str, event: dict) -> None:
+        for sub in list(self._subscribers.get(channel, ())):
+            sub._deliver(event)
+
+    async def _attach(self, sub: Subscription) -> None:
+        for channel in sub.channels:
+            self._subscribers[channel].add(sub)
+
+    async def _detach(self, sub: Subscription) -> None:
+        for channel in sub.channels:
+            subs = self._subscribers.get(channel)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[channel]
+
+    @asynccontextmanager
+    async def subscribe(self, *channels: str) -> AsyncIterator[Subscription]:
+        sub = Subscription(channels)
+        await self._attach(sub)
+        try:
+            yield sub
+        finally:
+            await self._detach(sub)
+
+    async def close(self) -> None:
+        self._subscribers.clear()
+
+
+class RedisBroker(LocalBroker):
+    """Redis Pub/Sub 経由でワーカー間に配信するブローカー"""
+
+    def __init__(self):
+        super().__init__()
+        self._pubsub = None
+        self._listener: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    async def publish(self, channel: str, event: dict) -> None:
+        await get_redis().publish(channel, json.dumps(event))
+
+    async def publish_many(self, events: list[tuple[str, dict]]) -> None:
+        # パイプラインで 1 往復にまとめる
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for channel, event in events:
+                pipe.publish(channel, json.dumps(event))
+            await pipe.execute()
+
+    async def _attach(self, sub: Subscription) -> None:
+        async with self._lock:
+            new_channels = [c for c in sub.channels if c not in self._subscribers]
+            await super()._attach(sub)
+            if not new_channels:
+                return
+            if self._pubsub is None:
+                self._pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(*new_channels)
+            if self._listener is None or self._listener.done():
+                self._listener = asyncio.create_task(self._listen())
+
+    async def _detach(self, sub: Subscription) -> None:
+        async with self._lock:
+            await super()._detach(sub)
+            stale = [c for c in sub.channels if c not in self._subscribers]
+            if stale and self._pubsub is not None:
+                await self._pubsub.unsubscribe(*stale)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis Pub/Sub の受信に失敗しました")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            try:
+                event = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            self._dispatch(message["channel"], event)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await super().close()
+
+
+_broker: LocalBroker | None = None
+
+
+def get_broker() -> LocalBroker:
+    global _broker
+    if _broker is None:
+        _broker = LocalBroker() if settings.realtime_backend == "local" else RedisBroker()
+    return _broker
+
+
+async def close_broker() -> None:
+    global _broker
+    if _broker is not None:
+        await _broker.close()
+        _broker = None
+
+
+async def publish(channel: str, event: dict) -> None:
+    """イベントを配信する。配信失敗はリクエスト自体を失敗させない"""
+    try:
+        await get_broker().publish(channel, event)
+    except Exception:
+        logger.exception("リアルタイムイベントの配信に失敗しました: %s", channel)
+
+
+async def publish_many(events: list[tuple[str, dict]]) -> None:
+    """(チャンネル, イベント) のリストをまとめて配信する"""
+    if not events:
+        return
+    try:
+        await get_broker().publish_many(events)
+    except Exception:
+        logger.exception("リアルタイムイベントの一括配信に失敗しました: %d 件", len(events))
+
+
+def subscribe(*channels: str):
+    return get_broker().subscribe(*channels)
+
+
+def new_message_events(session_id: int, message_id: int, message: dict | None = None) -> list[tuple[str, dict]]:
+    event = {"type": "message", "session_id": session_id, "message_id": message_id}
+    if message is not None:
+        event["message"] = message
+    return [(session_channel(session_id), event)]
+
+
+def inbox_events(persona_id: int, event: dict) -> list[tuple[str, dict]]:
+    return [(inbox_persona_channel(persona_id), event), (INBOX_ALL_CHANNEL, event)]
+
+
+async def publish_new_message(session_id: int, message_id: int, message: dict | None = None) -> None:
+    """新着メッセージを配信する。message には MessageResponse の JSON 表現を載せる"""
+    await publish_many(new_message_events(session_id, message_id, message))
+
+
+async def publish_inbox_event(persona_id: int, event: dict) -> None:
+    """スタッフ受信箱向けイベントを担当ペルソナ用と管理者用の両チャンネルに配信する"""
+    await publish_many(inbox_events(persona_id, event))
@@ -0,0 +1,139 @@
+"""
+予約・定期配信のスケジュール計算
+
+MailCampaign.interval の書式:
+  - 固定間隔: "30m" / "6h" / "1d" / "1w"（前回の予定時刻を起点に加算するので実行の遅れが累積しない）
+  - cron 形式: "0 9 * * 1"（分 時 日 月 曜日。*, */n, a-b, a-b/n, a,b に対応。SCHEDULER_TIMEZONE で解釈）
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.config import settings
+from app.models.mail_campaign import MailCampaign, CampaignType, CampaignStatus
+
+_INTERVAL = re.compile(r"^(\d+)\s*([mhdw])$")
+_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+# (最小値, 最大値) 分 時 日 月 曜日（0=日曜、7 も日曜として扱う）
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# 条件に合う日が見つからない cron（2/30 など）を打ち切るまでの日数
+_CRON_SEARCH_DAYS = 366 * 5
+
+
+class CronSchedule:
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("cron 形式は「分 時 日 月 曜日」の 5 項目で指定してください")
+        parsed = [_parse_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields, _CRON_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}
+        self.day_restricted = fields[2] != "*"
+        self.weekday_restricted = fields[4] != "*"
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        # datetime.weekday() は月曜=0 なので cron の日曜=0 に合わせる
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, after: datetime) -> datetime:
+        tz = ZoneInfo(settings.scheduler_timezone)
+        start = (after.astimezone(tz) + timedelta(minutes=1)).replace(second=0, microsecond=0)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(_CRON_SEARCH_DAYS):
+            if self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate.astimezone(timezone.utc)
+            day = (day + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError("cron 式に該当する日時がありません")
+
+
+def _parse_cron_field(field: str, lo: int, hi: int) -> set[int]:
+    values: set[int] = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ValueError(f"cron のステップが不正です: {field}")
+            step = int(step_text)
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            if not (start_text.isdigit() and end_text.isdigit()):
+                raise ValueError(f"cron の範囲が不正です: {field}")
+            start, end = int(start_text), int(end_text)
+        elif part.isdigit():
+            start = end = int(part)
+            if step != 1:
+                end = hi
+        else:
+            raise ValueError(f"cron の値が不正です: {field}")
+        if start < lo or end > hi or start > end:
+            raise ValueError(f"cron の値が範囲外です: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_interval(interval: str) -> timedelta | CronSchedule:
+    """interval 文字列を解釈する（不正な書式は ValueError）"""
+    text = interval.strip()
+    match = _INTERVAL.match(text)
+    if match:
+        amount = int(match.group(1))
+        if amount <= 0:
+            raise ValueError("間隔は 1 以上で指定してください")
+        return timedelta(**{_UNITS[match.group(2)]: amount})
+    return CronSchedule(text)
+
+
+def next_run(interval: str, previous: datetime, now: datetime) -> datetime:
+    """previous の次で now より後の最初の予定時刻（止まっていた間の分はまとめて 1 回にする）"""
+    schedule = parse_interval(interval)
+    if isinstance(schedule, CronSchedule):
+        return schedule.next_after(max(previous, now))
+    if previous > now:
+        return previous
+    skipped = (now - previous) // schedule
+    return previous + schedule * (skipped + 1)
+
+
+def validate_campaign_schedule(campaign_type: CampaignType, scheduled_at: datetime | None, interval: str | None) -> None:
+    if campaign_type == CampaignType.scheduled and scheduled_at is None:
+        raise ValueError("予約送信には scheduled_at を指定してください")
+    if campaign_type == CampaignType.periodic:
+        if not interval:
+            raise ValueError("定期送信には interval を指定してください")
+        parse_interval(interval)
+
+
+def arm_schedule(campaign: MailCampaign, now: datetime) -> None:
+    """
+    キャンペーンの状態に合わせて next_run_at を設定する
+
+    予約送信は scheduled、定期送信は active のときだけ next_run_at を持つので、
+    スケジューラーは next_run_at のインデックスだけを見れば済む。
+    """
+    if campaign.type == CampaignType.scheduled and campaign.status == CampaignStatus.scheduled:
+        campaign.next_run_at = campaign.scheduled_at
+    elif campaign.type == CampaignType.periodic and campaign.status == CampaignStatus.active:
+        if campaign.scheduled_at is not None and campaign.scheduled_at > now:
+            campaign.next_run_at = campaign.scheduled_at
+        else:
+            schedule = parse_interval(campaign.interval)
+            if isinstance(schedule, CronSchedule):
+                campaign.next_run_at = schedule.next_after(now)
+            else:
+                campaign.next_run_at = next_run(campaign.interval, campaign.scheduled_at or now, now)
+    else:
+        campaign.next_run_at = None
@@ -0,0 +1,175 @@
+"""
+トリガーメールの実行
+
+アウトボックスの trigger トピックをイベント ID 順に SKIP LOCKED で取り出し、trigger_event ごとの有効な設定
+（ワーカー内のインデックス）に一致したものを、遅延分だけ後ろにずらした due_at で trigger_mail_jobs に積む。
+送信側は due_at のインデックスを先頭から読むだけなので、待ちのジョブが大量にあっても 1 回の取得は軽い。
+送信に成功したジョブは削除し、失敗したジョブは間隔を空けて TRIGGER_MAIL_MAX_ATTEMPTS 回まで再送する。
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import delete, insert, select, update
+
+from app.config import settings
+from app.database import async_session
+from app.models.user import User, UserStatus
+from app.models.outbox import OutboxEvent
+from app.models.mail_campaign import MailCampaign, TriggerMailSetting
+from app.models.trigger_mail_job import TriggerMailJob
+from app.services import outbox_service, realtime_service
+from app.services.mail_delivery_service import render, render_subject
+from app.services.mail_transport import MailMessage, get_transport
+
+logger = logging.getLogger(__name__)
+
+# トリガー設定の作成・切り替えを配信ワーカーに知らせるチャンネル
+TRIGGER_SETTINGS_CHANNEL = "mail:triggers"
+# 通知を取りこぼした場合でもこの間隔で読み直す
+INDEX_REFRESH_SECONDS = 60
+
+
+class TriggerTarget(NamedTuple):
+    trigger_id: int
+    campaign_id: int
+    delay: timedelta
+
+
+class TriggerIndex:
+    """trigger_event → 有効なトリガー設定 の索引"""
+
+    def __init__(self):
+        self._targets: dict[str, list[TriggerTarget]] = {}
+
+    def match(self, event_type: str) -> list[TriggerTarget]:
+        return self._targets.get(event_type, [])
+
+    async def load(self) -> None:
+        async with async_session() as db:
+            result = await db.execute(
+                select(
+                    TriggerMailSetting.id,
+                    TriggerMailSetting.trigger_event,
+                    TriggerMailSetting.mail_campaign_id,
+                    TriggerMailSetting.delay_minutes,
+                ).where(TriggerMailSetting.is_active.is_(True))
+            )
+            targets: dict[str, list[TriggerTarget]] = {}
+            for row in result.all():
+                targets.setdefault(row.trigger_event, []).append(
+                    TriggerTarget(row.id, row.mail_campaign_id, timedelta(minutes=row.delay_minutes))
+                )
+        self._targets = targets
+
+    async def keep_fresh(self) -> None:
+        """設定変更の通知を受けるたび（なければ一定間隔で）読み直す"""
+        while True:
+            try:
+                async with realtime_service.subscribe(TRIGGER_SETTINGS_CHANNEL) as subscription:
+                    while True:
+                        await subscription.wait(timeout=INDEX_REFRESH_SECONDS)
+                        await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("トリガー設定の読み直しに失敗しました")
+                await asyncio.sleep(5)
+
+
+async def notify_settings_changed() -> None:
+    """トリガー設定を変更した後に呼ぶ（コミット後）"""
+    await realtime_service.publish(TRIGGER_SETTINGS_CHANNEL, {"type": "changed"})
+
+
+async def schedule_jobs(index: TriggerIndex, batch_size: int) -> int:
+    """イベントを 1 バッチ処理してジョブに変換し、処理したイベント数を返す"""
+    async with async_session() as db:
+        events = await outbox_service.claim(db, (outbox_service.TOPIC_TRIGGER,), batch_size)
+        if not events:
+            return 0
+        jobs = [
+            {
+                "trigger_id": target.trigger_id,
+                "campaign_id": target.campaign_id,
+                "user_id": event.payload["user_id"],
+                "due_at": event.created_at + target.delay,
+            }
+            for event in events
+            if event.payload.get("user_id") is not None
+            for target in index.match(event.payload.get("event_type"))
+        ]
+        if jobs:
+            await db.execute(insert(TriggerMailJob), jobs)
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([e.id for e in events])))
+        await db.commit()
+        return len(events)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(minutes=2 ** min(attempts, 6))
+
+
+async def send_due_jobs(batch_size: int) -> int:
+    """期限の来たジョブを 1 バッチ送信し、処理したジョブ数を返す"""
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        result = await db.execute(
+            select(TriggerMailJob)
+            .where(TriggerMailJob.due_at <= now)
+            .order_by(TriggerMailJob.due_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        jobs = list(result.scalars().all())
+        if not jobs:
+            return 0
+
+        result = await db.execute(
+            select(User.id, User.email, User.display_name).where(
+                User.id.in_({j.user_id for j in jobs}), User.status == UserStatus.active
+            )
+        )
+        recipients = {row.id: row for row in result.all()}
+        result = await db.execute(
+            select(MailCampaign.id, MailCampaign.subject, MailCampaign.body).where(
+                MailCampaign.id.in_({j.campaign_id for j in jobs})
+            )
+        )
+        campaigns = {row.id: row for row in result.all()}
+
+        # 退会・停止ユーザーや削除されたキャンペーンのジョブは送らずに捨てる
+        sendable = [j for j in jobs if j.user_id in recipients and j.campaign_id in campaigns]
+        messages = [
+            MailMessage(
+                recipients[j.user_id].email,
+                render_subject(campaigns[j.campaign_id].subject, recipients[j.user_id]),
+                render(campaigns[j.campaign_id].body, recipients[j.user_id]),
+            )
+            for j in sendable
+        ]
+        try:
+            errors = await get_transport().send_batch(messages) if messages else []
+        except Exception as e:
+            logger.warning("トリガーメールの送信に失敗しました: %d 件", len(messages), exc_info=True)
+            errors = [str(e)] * len(messages)
+
+        done = {j.id for j in jobs} - {j.id for j in sendable}
+        for job, error in zip(sendable, errors):
+            if error is None:
+                done.add(job.id)
+            elif job.attempts + 1 >= settings.trigger_mail_max_attempts:
+                logger.error("トリガーメールを送信できませんでした: job_id=%s %s", job.id, error)
+                done.add(job.id)
+            else:
+                await db.execute(
+                    update(TriggerMailJob)
+                    .where(TriggerMailJob.id == job.id)
+                    .values(attempts=job.attempts + 1, due_at=now + _retry_delay(job.attempts + 1))
+                )
+        if done:
+            await db.execute(delete(TriggerMailJob).where(TriggerMailJob.id.in_(done)))
+        await db.commit()
+        return len(jobs)
@@ -0,0 +1,335 @@
+"""
+アップロードファイルの保存（内容アドレス方式）
+
+リクエスト本文をチャンクごとに一時ファイルへ書きながら SHA-256 を計算し、
+<先頭2文字>/<次の2文字>/<ハッシュ>.<拡張子> に置く。ユーザーとペルソナで同じ置き場を使い、
+同じ画像は 1 ファイルにまとめる。ファイルの書き込みはスレッドで行う（イベントループを止めない）。
+サイズ上限を超えた時点で書き込みをやめて 413 を返す（全体をメモリに載せない）。
+
+URL の中身が変わらないので /uploads は immutable でキャッシュさせる。
+UPLOADS_SERVED_BY_PROXY=true のときは nginx が共有ボリュームから直接返す（proxy/nginx.conf）。
+権限確認が必要なファイルは private/ に置き、確認だけ API で行って private_file_response で返す。
+stored_files に参照数を持ち、アバターの変更と同じトランザクションで増減する。
+ファイルはリクエスト中には消さず、参照数 0 のまま猶予時間を過ぎたものを GC ワーカー
+（app.workers.upload_gc）がサムネイルと一緒に消す。ファイルはコミット前に置くので、
+ロールバックしたリクエストのファイルは行を持たずに残る。GC ワーカーが定期的に置き場を見回り、
+そうしたファイルを参照数 0 の行として登録して同じ手順で消す。
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from fastapi import HTTPException, status
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import UploadFile as FormFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+from app.config import settings
+from app.database import async_session
+from app.models.stored_file import StoredFile
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+UPLOAD_URL_PREFIX = "/uploads"
+IMAGE_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PRIVATE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# nginx の internal location（proxy/nginx.conf）
+PROTECTED_URL_PREFIX = "/_protected_uploads"
+_TMP_DIR = "tmp"
+# multipart の境界・パートヘッダーの分として本文に上乗せを認めるバイト数
+_MULTIPART_OVERHEAD = 16 * 1024
+# 権限確認が必要なファイルの置き場（/uploads では返さない）
+PRIVATE_DIR = "private"
+_HIDDEN_DIRS = (_TMP_DIR, PRIVATE_DIR)
+# _store が置くファイルの相対パス（[<ディレクトリ>/]<先頭2文字>/<次の2文字>/<ハッシュ>.<拡張子>）
+_STORED_PATH = re.compile(r"^(?:[a-z]+/)*([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.[a-z0-9]+$")
+
+
+def upload_root() -> Path:
+    return Path(settings.upload_dir)
+
+
+def url_to_path(url: str) -> Path:
+    """/uploads/... の URL を保存先のパスにする"""
+    return upload_root() / url.removeprefix(UPLOAD_URL_PREFIX).lstrip("/")
+
+
+def path_to_url(path: Path) -> str:
+    return f"{UPLOAD_URL_PREFIX}/{path.relative_to(upload_root()).as_posix()}"
+
+
+def _relative(url: str | None) -> str | None:
+    if not url or not url.startswith(f"{UPLOAD_URL_PREFIX}/"):
+        return None
+    return url.removeprefix(f"{UPLOAD_URL_PREFIX}/")
+
+
+def _write(out, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+
+async def _receive(file: FormFile, dest: Path, max_size: int) -> str:
+    """file を dest に書き出して SHA-256 を返す。max_size を超えたら途中のファイルを消して 413"""
+    await asyncio.to_thread(dest.parent.mkdir, parents=True, exist_ok=True)
+    out = await asyncio.to_thread(open, dest, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"ファイルサイズは{max_size // (1024 * 1024)}MB以下にしてください",
+                )
+            await asyncio.to_thread(_write, out, digest, chunk)
+    except BaseException:
+        await asyncio.to_thread(out.close)
+        await asyncio.to_thread(dest.unlink, missing_ok=True)
+        raise
+    await asyncio.to_thread(out.close)
+    return digest.hexdigest()
+
+
+async def receive_form_file(request: Request, field: str, max_size: int) -> FormFile:
+    """
+    multipart の本文を読みながら max_size（と多少のヘッダー分）を超えた時点で 413 を返す
+
+    UploadFile 引数にすると FastAPI が本文をすべて受け取ってから呼ぶので、上限を超える本文も
+    最後まで受信してしまう。Content-Length で先に断り、申告がない・偽っている場合も途中で打ち切る。
+    """
+    budget = max_size + _MULTIPART_OVERHEAD
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"ファイルサイズは{max_size // (1024 * 1024)}MB以下にしてください",
+    )
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > budget:
+        raise too_large
+
+    async def limited():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > budget:
+                raise too_large
+            yield chunk
+
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="multipart/form-data で送信してください")
+    try:
+        form = await MultiPartParser(request.headers, limited(), max_files=1, max_fields=10).parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    upload = form.get(field)
+    if not isinstance(upload, FormFile):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{field} にファイルを指定してください")
+    return upload
+
+
+def _place(tmp: Path, dest: Path) -> None:
+    if dest.exists():
+        # 同じ内容のファイルが既にある
+        tmp.unlink(missing_ok=True)
+        return
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, dest)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def temp_path(suffix: str = "") -> Path:
+    """アップロード先と同じファイルシステム上の一時ファイル名（置き場へは rename で移す）"""
+    return upload_root() / _TMP_DIR / f"{uuid.uuid4().hex}{suffix}"
+
+
+async def _store(db: AsyncSession, tmp: Path, sha: str, ext: str, directory: str) -> str:
+    """
+    tmp を <directory>/<ハッシュ>.<ext> に移して URL を返す
+
+    参照数の行をロックしてからファイルを置くので、GC が同じファイルを消している最中でも
+    消し終わるのを待ってから置き直す。
+    """
+    prefix = f"{directory}/" if directory else ""
+    relative = f"{prefix}{sha[:2]}/{sha[2:4]}/{sha}.{ext}"
+    try:
+        stmt = insert(StoredFile).values(path=relative, ref_count=1)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StoredFile.path],
+                set_={"ref_count": StoredFile.ref_count + 1, "updated_at": func.now()},
+            )
+        )
+        await asyncio.to_thread(_place, tmp, upload_root() / relative)
+    finally:
+        await asyncio.to_thread(tmp.unlink, missing_ok=True)
+    return f"{UPLOAD_URL_PREFIX}/{relative}"
+
+
+async def save_temp(file: FormFile, max_size: int) -> tuple[Path, str]:
+    """file を一時ファイルに書き出して (パス, SHA-256) を返す（置き場へは store_file で移す）"""
+    tmp = temp_path()
+    return tmp, await _receive(file, tmp, max_size)
+
+
+async def store_upload(db: AsyncSession, file: FormFile, max_size: int) -> str:
+    """アップロードされた画像を保存して URL を返す（参照数を 1 増やす）"""
+    tmp, sha = await save_temp(file, max_size)
+    return await _store(db, tmp, sha, IMAGE_EXTENSIONS.get(file.content_type, "jpg"), "")
+
+
+async def store_file(db: AsyncSession, tmp: Path, ext: str, directory: str = "", sha: str | None = None) -> str:
+    """一時ファイルを置き場に移して URL を返す（参照数を 1 増やす）"""
+    if sha is None:
+        sha = await asyncio.to_thread(_sha256, tmp)
+    return await _store(db, tmp, sha, ext, directory)
+
+
+async def _add_ref(db: AsyncSession, url: str | None, delta: int) -> None:
+    relative = _relative(url)
+    if relative is None:
+        return
+    await db.execute(
+        update(StoredFile)
+        .where(StoredFile.path == relative)
+        .values(ref_count=func.greatest(StoredFile.ref_count + delta, 0))
+    )
+
+
+async def retain(db: AsyncSession, url: str | None) -> None:
+    """保存済みのファイルを別の行からも参照する（外部 URL や未登録のパスは何もしない）"""
+    await _add_ref(db, url, 1)
+
+
+async def release(db: AsyncSession, url: str | None) -> None:
+    """参照をやめる（ファイルは GC ワーカーが消す）"""
+    await _add_ref(db, url, -1)
+
+
+def _remove(paths: list[Path]) -> None:
+    for path in paths:
+        # 元画像と、その隣に作ったサムネイル（<名前>_<サイズ>.webp）
+        for target in [path, *path.parent.glob(f"{path.stem}_*.webp")]:
+            try:
+                target.unlink(missing_ok=True)
+            except OSError:
+                logger.warning("ファイルを削除できませんでした: %s", target, exc_info=True)
+
+
+async def collect_garbage(grace: timedelta, batch_size: int) -> int:
+    """参照数 0 のまま grace を過ぎたファイルを 1 バッチ消し、消した件数を返す"""
+    cutoff = datetime.now(timezone.utc) - grace
+    async with async_session() as db:
+        candidates = (
+            select(StoredFile.path)
+            .where(StoredFile.ref_count == 0, StoredFile.updated_at < cutoff)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            delete(StoredFile)
+            .where(StoredFile.path.in_(candidates.scalar_subquery()), StoredFile.ref_count == 0)
+            .returning(StoredFile.path)
+        )
+        paths = list(result.scalars().all())
+        # 行ロックを持ったまま消すので、同じ内容の再アップロードはコミットを待ってから置き直す
+        await asyncio.to_thread(_remove, [upload_root() / p for p in paths])
+        await db.commit()
+        return len(paths)
+
+
+def _stored_paths_before(cutoff: float) -> list[str]:
+    """_store が置いた形のファイルのうち、更新日時が cutoff より前のものの相対パス"""
+    root = upload_root()
+    paths = []
+    for directory, subdirs, files in os.walk(root):
+        if Path(directory) == root:
+            subdirs[:] = [d for d in subdirs if d != _TMP_DIR]
+        for name in files:
+            path = Path(directory) / name
+            relative = path.relative_to(root).as_posix()
+            if not _STORED_PATH.match(relative):
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    paths.append(relative)
+            except FileNotFoundError:
+                continue
+    return paths
+
+
+async def adopt_orphans(grace: timedelta, batch_size: int) -> int:
+    """
+    stored_files に行のないファイルを参照数 0 で登録し、登録した件数を返す
+
+    書き込み中のリクエストのファイルを除くため grace より古いものだけを対象にする。
+    削除は collect_garbage に任せるので、同じ内容の再アップロードとは stored_files の行で排他される。
+    """
+    cutoff = (datetime.now(timezone.utc) - grace).timestamp()
+    paths = await asyncio.to_thread(_stored_paths_before, cutoff)
+    adopted = 0
+    async with async_session() as db:
+        for start in range(0, len(paths), batch_size):
+            result = await db.execute(
+                insert(StoredFile)
+                .values([{"path": path, "ref_count": 0} for path in paths[start : start + batch_size]])
+                .on_conflict_do_nothing(index_elements=[StoredFile.path])
+                .returning(StoredFile.path)
+            )
+            adopted += len(result.all())
+            await db.commit()
+    return adopted
+
+
+def private_file_response(url: str) -> Response:
+    """
+    private/ に保存したファイルを返す（権限確認は呼び出し側で済ませる）
+
+    プロキシ配信時は X-Accel-Redirect だけ返し、本体は nginx が sendfile で送る。
+    """
+    # private/../ などで置き場の外を指していないか、正規化してから確かめる
+    relative = posixpath.normpath(_relative(url) or ".")
+    if not relative.startswith(f"{PRIVATE_DIR}/"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ファイルが見つかりません")
+    if settings.uploads_served_by_proxy:
+        return Response(
+            headers={"X-Accel-Redirect": f"{PROTECTED_URL_PREFIX}/{relative.removeprefix(f'{PRIVATE_DIR}/')}"}
+        )
+    path = upload_root() / relative
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ファイルが見つかりません")
+    return FileResponse(path, headers={"Cache-Control": PRIVATE_CACHE_CONTROL})
+
+
+class UploadFiles(StaticFiles):
+    """/uploads の配信（URL ごとに中身が変わらないので immutable で長期キャッシュさせる）"""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if path.split("/", 1)[0] in _HIDDEN_DIRS:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 206, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,54 @@
+"""
+管理画面のユーザー検索
+
+  - email / display_name: 部分一致（ILIKE '%語%'）。pg_trgm の GIN で絞り込むため全件走査しない
+    （2 文字以下の語はトリグラムが作れないため効きが弱い）
+  - email_prefix: メールアドレスの前方一致。既存の email の B-tree を範囲検索で使う（大文字小文字を区別する）
+  - q: メールアドレス・表示名との類似度（word_similarity）で絞り込み、似ている順に並べる
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import ColumnElement, Select, func, literal, or_, select
+
+from app.models.user import User
+
+
+@dataclass
+class UserSearchQuery:
+    email: str | None = None
+    display_name: str | None = None
+    email_prefix: str | None = None
+    q: str | None = None
+    status: str | None = None
+
+    @property
+    def ranked(self) -> bool:
+        return bool(self.q)
+
+
+def _prefix_range(column, prefix: str) -> list[ColumnElement[bool]]:
+    # prefix <= 値 < prefix の末尾の文字を 1 つ進めたもの（B-tree の範囲検索）。LIKE で念のため再確認する
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return [column >= prefix, column < upper, column.startswith(prefix, autoescape=True)]
+
+
+def similarity_score(q: str):
+    return func.greatest(func.word_similarity(q, User.email), func.word_similarity(q, User.display_name))
+
+
+def build_statement(query: UserSearchQuery) -> Select:
+    """条件を 1 つの SELECT にまとめる（並び順とページングは呼び出し側で付ける）"""
+    stmt = select(User)
+    if query.email:
+        stmt = stmt.where(User.email.icontains(query.email, autoescape=True))
+    if query.display_name:
+        stmt = stmt.where(User.display_name.icontains(query.display_name, autoescape=True))
+    if query.email_prefix:
+        stmt = stmt.where(*_prefix_range(User.email, query.email_prefix))
+    if query.status:
+        stmt = stmt.where(User.status == query.status)
+    if query.q:
+        # q <% 列 は word_similarity が pg_trgm.word_similarity_threshold 以上のもの（GIN を使う）
+        stmt = stmt.where(or_(literal(query.q).op("<%")(User.email), literal(query.q).op("<%")(User.display_name)))
+    return stmt
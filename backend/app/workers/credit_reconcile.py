@@ -0,0 +1,78 @@
+"""
+クレジット残高と台帳の突き合わせジョブ
+
+users.credit_balance と credit_transactions.amount の合計をユーザー ID の範囲ごとに比較し、
+一致しないユーザーをログに出す。残高の自動修正は行わない（原因調査が先）。
+
+使い方:
+  docker compose exec api python -m app.workers.credit_reconcile [--interval 3600] [--batch-size 1000]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import func, select
+
+from app.database import async_session, engine
+from app.models.user import User
+from app.models.credit_transaction import CreditTransaction
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile(batch_size: int = 1000) -> list[tuple[int, int, int]]:
+    """不一致の (user_id, 残高, 台帳合計) を返す"""
+    mismatches: list[tuple[int, int, int]] = []
+    last_id = 0
+    while True:
+        async with async_session() as db:
+            batch = (
+                select(User.id)
+                .where(User.id > last_id)
+                .order_by(User.id)
+                .limit(batch_size)
+                .subquery()
+            )
+            # 残高と台帳を 1 文で読み、同じスナップショット上で比較する
+            ledger = (
+                select(CreditTransaction.user_id, func.sum(CreditTransaction.amount).label("total"))
+                .where(CreditTransaction.user_id.in_(select(batch.c.id)))
+                .group_by(CreditTransaction.user_id)
+                .subquery()
+            )
+            result = await db.execute(
+                select(User.id, User.credit_balance, func.coalesce(ledger.c.total, 0))
+                .join(batch, batch.c.id == User.id)
+                .outerjoin(ledger, ledger.c.user_id == User.id)
+                .order_by(User.id)
+            )
+            rows = result.all()
+        if not rows:
+            return mismatches
+        for user_id, balance, total in rows:
+            if balance != total:
+                mismatches.append((user_id, balance, int(total)))
+                logger.warning("クレジット不一致: user_id=%s 残高=%s 台帳合計=%s", user_id, balance, total)
+        last_id = rows[-1][0]
+
+
+async def main(interval: int | None, batch_size: int) -> None:
+    try:
+        while True:
+            mismatches = await reconcile(batch_size)
+            logger.info("クレジット突き合わせ完了: 不一致 %d 件", len(mismatches))
+            if interval is None:
+                return
+            await asyncio.sleep(interval)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=int, default=None, help="指定すると秒間隔で繰り返し実行する")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.interval, args.batch_size))
@@ -0,0 +1,42 @@
+"""
+クレジット予約の定期精算ジョブ
+
+作成から CREDIT_RESERVATION_MAX_AGE_SECONDS を過ぎた予約を精算し、未使用分を残高に戻す。
+Redis の消失やワーカー停止で取り残された予約もここで回収される。
+
+使い方:
+  docker compose exec api python -m app.workers.credit_settle [--interval 60]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.config import settings
+from app.database import engine
+from app.redis_client import close_redis
+from app.services.credit_reservation_service import settle_expired
+
+logger = logging.getLogger(__name__)
+
+
+async def main(interval: int | None) -> None:
+    try:
+        while True:
+            settled = await settle_expired(settings.credit_reservation_max_age_seconds)
+            if settled:
+                logger.info("クレジット予約を精算しました: %d 件", settled)
+            if interval is None:
+                return
+            await asyncio.sleep(interval)
+    finally:
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=int, default=None, help="指定すると秒間隔で繰り返し実行する")
+    args = parser.parse_args()
+    asyncio.run(main(args.interval))
@@ -0,0 +1,50 @@
+"""
+画像ワーカー
+
+アウトボックスの image トピックを取り出し、アバター画像のサムネイル（WebP）を
+プロセスプールで生成して avatar_variants に記録する。画像の縮小は CPU を使うので
+API のイベントループではなくこのワーカーの子プロセスで行う。
+
+使い方:
+  docker compose exec api python -m app.workers.image_variants [--poll-interval 2]
+"""
+
+import argparse
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import settings
+from app.database import engine
+from app.redis_client import close_redis
+from app.services.image_service import process_batch
+
+logger = logging.getLogger(__name__)
+
+
+async def main(poll_interval: float) -> None:
+    processes = settings.image_worker_processes
+    # 1 バッチで全プロセスに数枚ずつ行き渡る程度にする
+    batch_size = processes * 4
+    pool = ProcessPoolExecutor(max_workers=processes)
+    try:
+        while True:
+            try:
+                processed = await process_batch(pool, batch_size)
+            except Exception:
+                logger.exception("サムネイル生成に失敗しました")
+                processed = 0
+            if processed < batch_size:
+                await asyncio.sleep(poll_interval)
+    finally:
+        pool.shutdown()
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.poll_interval))
@@ -0,0 +1,42 @@
+"""
+メール一斉配信ワーカー
+
+mail_delivery_runs から未着手（または停止した）配信を SKIP LOCKED で取得して送信する。
+複数プロセスで起動しても同じ配信を重ねて処理しない。
+
+使い方:
+  docker compose exec api python -m app.workers.mail_delivery [--poll-interval 5] [--once]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.database import engine
+from app.services.mail_delivery_service import claim_run, execute_run
+
+logger = logging.getLogger(__name__)
+
+
+async def main(poll_interval: float, once: bool) -> None:
+    try:
+        while True:
+            run = await claim_run()
+            if run is not None:
+                logger.info("配信を開始します: run_id=%s campaign_id=%s", run.id, run.campaign_id)
+                await execute_run(run)
+                continue
+            if once:
+                return
+            await asyncio.sleep(poll_interval)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    parser.add_argument("--once", action="store_true", help="待ちの配信がなくなったら終了する")
+    args = parser.parse_args()
+    asyncio.run(main(args.poll_interval, args.once))
@@ -0,0 +1,49 @@
+"""
+お知らせ作成ワーカー
+
+アウトボックスの notify:message / notify:like / notify:credit を時間枠ごとにまとめてお知らせにする。
+種類ごとに並行して処理し、複数台で起動しても SKIP LOCKED で分担する。
+
+使い方:
+  docker compose exec api python -m app.workers.notification_fanout [--poll-interval 2]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.config import settings
+from app.database import engine
+from app.redis_client import close_redis
+from app.services.notification_service import KINDS, fan_out
+
+logger = logging.getLogger(__name__)
+
+
+async def _drain(kind: str, poll_interval: float) -> None:
+    """バッチが埋まっている間は続けて処理し、空になったら待つ"""
+    batch_size = settings.notification_fanout_batch_size
+    while True:
+        try:
+            processed = await fan_out(kind, batch_size)
+        except Exception:
+            logger.exception("お知らせの作成に失敗しました: %s", kind)
+            processed = 0
+        if processed < batch_size:
+            await asyncio.sleep(poll_interval)
+
+
+async def main(poll_interval: float) -> None:
+    try:
+        await asyncio.gather(*(_drain(kind, poll_interval) for kind in KINDS))
+    finally:
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.poll_interval))
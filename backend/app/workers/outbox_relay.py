@@ -0,0 +1,63 @@
+"""
+アウトボックス中継ワーカー
+
+outbox_events の realtime / cache / notification トピックをまとめて取り出し、Redis Pub/Sub への配信、
+キャッシュ無効化、通知の複数行 INSERT を行う。INSERT 時の pg_notify を LISTEN して即座に起き、
+通知を取りこぼしても --poll-interval ごとに確認する。複数台で起動しても SKIP LOCKED で分担する。
+
+使い方:
+  docker compose exec api python -m app.workers.outbox_relay [--batch-size 500] [--poll-interval 1]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.database import engine
+from app.redis_client import close_redis
+from app.services import account_service, principal_service  # noqa: F401  無効化対象のキャッシュを登録する
+from app.services.outbox_service import NOTIFY_CHANNEL, relay_batch
+from app.services.realtime_service import close_broker
+
+logger = logging.getLogger(__name__)
+
+
+async def main(batch_size: int, poll_interval: float) -> None:
+    wakeup = asyncio.Event()
+
+    def on_notify(*args) -> None:
+        wakeup.set()
+
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        listener = raw.driver_connection
+        await listener.add_listener(NOTIFY_CHANNEL, on_notify)
+        try:
+            while True:
+                wakeup.clear()
+                try:
+                    processed = await relay_batch(batch_size)
+                except Exception:
+                    logger.exception("アウトボックスの中継に失敗しました")
+                    await asyncio.sleep(poll_interval)
+                    continue
+                if processed >= batch_size:
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await listener.remove_listener(NOTIFY_CHANNEL, on_notify)
+            await close_broker()
+            await close_redis()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.poll_interval))
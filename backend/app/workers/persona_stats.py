@@ -0,0 +1,50 @@
+"""
+ペルソナ集計ワーカー
+
+アウトボックスの stats トピックを persona_stats に反映し、--expire-interval 秒ごとに
+24 時間を過ぎたメッセージ数を消して注目度を更新する。複数台で起動しても SKIP LOCKED で分担する。
+
+使い方:
+  docker compose exec api python -m app.workers.persona_stats [--poll-interval 5] [--expire-interval 60]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.database import engine
+from app.services.persona_stats_service import apply_batch, expire_message_hours
+
+logger = logging.getLogger(__name__)
+
+
+async def main(poll_interval: float, expire_interval: float) -> None:
+    batch_size = settings.persona_stats_batch_size
+    next_expire = 0.0
+    try:
+        while True:
+            try:
+                processed = await apply_batch(batch_size)
+                if time.monotonic() >= next_expire:
+                    expired = await expire_message_hours()
+                    if expired:
+                        logger.info("直近 24 時間のメッセージ数を更新しました: %d ペルソナ", expired)
+                    next_expire = time.monotonic() + expire_interval
+            except Exception:
+                logger.exception("ペルソナ集計に失敗しました")
+                processed = 0
+            if processed < batch_size:
+                await asyncio.sleep(poll_interval)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    parser.add_argument("--expire-interval", type=float, default=60.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.poll_interval, args.expire_interval))
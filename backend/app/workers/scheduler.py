@@ -0,0 +1,89 @@
+"""
+予約送信・定期送信のスケジューラー
+
+next_run_at が現在時刻を過ぎたキャンペーンを部分インデックス順に SKIP LOCKED で取得し、
+mail_delivery_runs に配信を積んでから次回の予定時刻を進める（送信自体は app.workers.mail_delivery）。
+取得から更新までを 1 トランザクションで行うため、複数台で起動しても二重に配信されない。
+
+使い方:
+  docker compose exec api python -m app.workers.scheduler [--tick 10]
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session, engine
+from app.models.mail_campaign import MailCampaign, CampaignType
+from app.models.mail_delivery_run import MailDeliveryRun, DeliveryRunStatus
+from app.services.schedule_service import next_run
+
+logger = logging.getLogger(__name__)
+
+
+async def fire_due_campaigns(batch_size: int) -> int:
+    """期限の来たキャンペーンの配信を積み、積んだ件数を返す"""
+    fired = 0
+    while True:
+        async with async_session() as db:
+            now = datetime.now(timezone.utc)
+            result = await db.execute(
+                select(MailCampaign)
+                .where(MailCampaign.next_run_at <= now)
+                .order_by(MailCampaign.next_run_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            campaigns = list(result.scalars().all())
+            if not campaigns:
+                return fired
+
+            # 前回の配信がまだ終わっていない定期送信は今回分を積まない
+            result = await db.execute(
+                select(MailDeliveryRun.campaign_id).where(
+                    MailDeliveryRun.campaign_id.in_([c.id for c in campaigns]),
+                    MailDeliveryRun.status.in_([DeliveryRunStatus.pending, DeliveryRunStatus.running]),
+                )
+            )
+            in_progress = set(result.scalars().all())
+
+            for campaign in campaigns:
+                if campaign.id in in_progress:
+                    logger.warning("前回の配信が実行中のためスキップします: campaign_id=%s", campaign.id)
+                else:
+                    db.add(MailDeliveryRun(campaign_id=campaign.id))
+                    fired += 1
+                if campaign.type != CampaignType.periodic:
+                    campaign.next_run_at = None
+                    continue
+                try:
+                    campaign.next_run_at = next_run(campaign.interval, campaign.next_run_at, now)
+                except ValueError:
+                    logger.exception("interval が不正なため定期送信を止めます: campaign_id=%s", campaign.id)
+                    campaign.next_run_at = None
+            await db.commit()
+        if len(campaigns) < batch_size:
+            return fired
+
+
+async def main(tick: float) -> None:
+    try:
+        while True:
+            fired = await fire_due_campaigns(settings.scheduler_batch_size)
+            if fired:
+                logger.info("配信を登録しました: %d 件", fired)
+            await asyncio.sleep(tick)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tick", type=float, default=10.0, help="期限確認の間隔（秒）")
+    args = parser.parse_args()
+    asyncio.run(main(args.tick))
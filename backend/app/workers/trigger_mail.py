@@ -0,0 +1,57 @@
+"""
+トリガーメールワーカー
+
+アウトボックスの trigger トピックをトリガー設定と照合して trigger_mail_jobs に積む処理と、
+期限の来たジョブを送信する処理を並行して動かす。複数台で起動しても SKIP LOCKED で分担する。
+
+使い方:
+  docker compose exec api python -m app.workers.trigger_mail [--poll-interval 2]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.config import settings
+from app.database import engine
+from app.redis_client import close_redis
+from app.services.realtime_service import close_broker
+from app.services.trigger_mail_service import TriggerIndex, schedule_jobs, send_due_jobs
+
+logger = logging.getLogger(__name__)
+
+
+async def _drain(step, poll_interval: float, *args) -> None:
+    """バッチが埋まっている間は続けて処理し、空になったら待つ"""
+    batch_size = settings.trigger_mail_batch_size
+    while True:
+        try:
+            processed = await step(*args, batch_size)
+        except Exception:
+            logger.exception("トリガーメールの処理に失敗しました: %s", step.__name__)
+            processed = 0
+        if processed < batch_size:
+            await asyncio.sleep(poll_interval)
+
+
+async def main(poll_interval: float) -> None:
+    index = TriggerIndex()
+    await index.load()
+    try:
+        await asyncio.gather(
+            index.keep_fresh(),
+            _drain(schedule_jobs, poll_interval, index),
+            _drain(send_due_jobs, poll_interval),
+        )
+    finally:
+        await close_broker()
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.poll_interval))
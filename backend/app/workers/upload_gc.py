@@ -0,0 +1,60 @@
+"""
+アップロードファイルの GC ワーカー
+
+送信に使われないまま ATTACHMENT_EXPIRE_SECONDS を過ぎたチャットの添付を消して参照を外し、
+stored_files の参照数が 0 のまま UPLOAD_GC_GRACE_SECONDS を過ぎたファイルを
+サムネイルと一緒に消す。複数台で起動しても SKIP LOCKED で分担する。
+UPLOAD_ORPHAN_SWEEP_SECONDS ごとに置き場を見回り、行のないファイル（ロールバックした
+アップロード）を参照数 0 で登録する（次の猶予時間の後に同じ手順で消える）。
+
+使い方:
+  docker compose exec api python -m app.workers.upload_gc [--interval 300]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from app.config import settings
+from app.database import engine
+from app.services.attachment_service import expire_unused
+from app.services.upload_service import adopt_orphans, collect_garbage
+
+logger = logging.getLogger(__name__)
+
+
+async def main(interval: float) -> None:
+    grace = timedelta(seconds=settings.upload_gc_grace_seconds)
+    batch_size = settings.upload_gc_batch_size
+    next_sweep = time.monotonic()
+    try:
+        while True:
+            try:
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + settings.upload_orphan_sweep_seconds
+                    adopted = await adopt_orphans(grace, batch_size)
+                    if adopted:
+                        logger.info("参照の記録がないファイルを登録しました: %d 件", adopted)
+                expired = await expire_unused(batch_size)
+                if expired:
+                    logger.info("使われなかった添付画像を削除しました: %d 件", expired)
+                removed = await collect_garbage(grace, batch_size)
+                if removed:
+                    logger.info("参照されなくなったファイルを削除しました: %d 件", removed)
+            except Exception:
+                logger.exception("アップロードファイルの削除に失敗しました")
+                expired = removed = 0
+            if expired < batch_size and removed < batch_size:
+                await asyncio.sleep(interval)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=float, default=300.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.interval))
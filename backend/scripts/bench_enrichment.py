@@ -0,0 +1,88 @@
+"""
+セッション一覧の表示名・アバター付与にかかる DB 往復回数のマイクロベンチマーク
+
+従来の 4 関数（表示名 / ユーザーアバター / ペルソナ名 / ペルソナアバター）を
+順番に呼ぶ方式と、account_service.get_profiles による一括取得を比較する。
+
+使い方:
+  docker compose exec api python -m scripts.bench_enrichment [--sessions 200] [--rounds 50]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session, engine
+from app.models.user import User
+from app.models.persona import Persona
+from app.models.session import Session
+from app.services.account_service import get_profiles
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+async def legacy_enrichment(db: AsyncSession, user_ids: list[int], persona_ids: list[int]) -> None:
+    """従来方式: 列ごとに 1 クエリずつ発行する"""
+    for column_pair, ids in (
+        ((User.id, User.display_name), user_ids),
+        ((User.id, User.avatar_url), user_ids),
+        ((Persona.id, Persona.name), persona_ids),
+        ((Persona.id, Persona.avatar_url), persona_ids),
+    ):
+        if ids:
+            await db.execute(select(*column_pair).where(column_pair[0].in_(set(ids))))
+
+
+async def batched_enrichment(db: AsyncSession, user_ids: list[int], persona_ids: list[int]) -> None:
+    await get_profiles(db, user_ids=user_ids, persona_ids=persona_ids)
+
+
+async def measure(name, func, user_ids, persona_ids, rounds: int, counter: QueryCounter) -> None:
+    counter.count = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        async with async_session() as db:
+            await func(db, user_ids, persona_ids)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<10} 往復回数/リクエスト: {counter.count / rounds:.1f}  "
+        f"平均: {elapsed / rounds * 1000:.2f} ms"
+    )
+
+
+async def main(session_limit: int, rounds: int) -> None:
+    async with async_session() as db:
+        result = await db.execute(select(Session.user_id, Session.persona_id).limit(session_limit))
+        rows = result.all()
+    if not rows:
+        print("セッションがありません。先に python -m scripts.seed を実行してください")
+        return
+    user_ids = [row[0] for row in rows]
+    persona_ids = [row[1] for row in rows]
+    print(f"対象セッション数: {len(rows)}  試行回数: {rounds}")
+
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    try:
+        await measure("before", legacy_enrichment, user_ids, persona_ids, rounds, counter)
+        await measure("after", batched_enrichment, user_ids, persona_ids, rounds, counter)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.rounds))
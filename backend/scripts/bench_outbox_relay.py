@@ -0,0 +1,90 @@
+"""
+アウトボックス中継のスループット計測
+
+ベンチ用チャンネル宛ての realtime イベントを --events 件 outbox_events に積み、
+relay_batch をバッチサイズごとに空になるまで回して 1 秒あたりの処理件数を表示する。
+あわせて、ハンドラー側の負担（アウトボックスへの 1 INSERT）と従来の直接 Publish を比較する。
+実行中の中継ワーカーと同じ行を取り合わないよう、計測は中継ワーカーを止めて行うこと
+（既存の未処理行があればそれも一緒に処理される）。
+
+使い方:
+  docker compose exec api python -m scripts.bench_outbox_relay [--events 20000] [--batch-sizes 100,500,1000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import insert
+
+from app.database import async_session, engine
+from app.models.outbox import OutboxEvent
+from app.redis_client import close_redis
+from app.services import realtime_service
+from app.services.outbox_service import TOPIC_REALTIME, enqueue_realtime, relay_batch
+from app.services.realtime_service import close_broker
+
+BENCH_CHANNEL = "bench:outbox"
+
+
+def _event(i: int) -> dict:
+    return {"type": "message", "session_id": 0, "message_id": i}
+
+
+async def fill(count: int) -> None:
+    rows = [{"topic": TOPIC_REALTIME, "payload": {"events": [[BENCH_CHANNEL, _event(i)]]}} for i in range(count)]
+    async with async_session() as db:
+        for start in range(0, count, 5000):
+            await db.execute(insert(OutboxEvent), rows[start:start + 5000])
+        await db.commit()
+
+
+async def measure_relay(count: int, batch_size: int) -> None:
+    await fill(count)
+    processed = 0
+    started = time.perf_counter()
+    while True:
+        n = await relay_batch(batch_size)
+        if n == 0:
+            break
+        processed += n
+    elapsed = time.perf_counter() - started
+    print(f"batch={batch_size:<6} 処理件数: {processed}  {processed / elapsed:,.0f} 件/秒")
+
+
+async def measure_handler(rounds: int) -> None:
+    started = time.perf_counter()
+    for i in range(rounds):
+        async with async_session() as db:
+            enqueue_realtime(db, [(BENCH_CHANNEL, _event(i))])
+            await db.commit()
+    outbox_ms = (time.perf_counter() - started) / rounds * 1000
+
+    started = time.perf_counter()
+    for i in range(rounds):
+        await realtime_service.publish(BENCH_CHANNEL, _event(i))
+    publish_ms = (time.perf_counter() - started) / rounds * 1000
+    print(f"ハンドラー側 1 件あたり: アウトボックス INSERT+COMMIT {outbox_ms:.2f} ms / 直接 Publish {publish_ms:.2f} ms")
+
+    while await relay_batch(1000):
+        pass
+
+
+async def main(count: int, batch_sizes: list[int], rounds: int) -> None:
+    try:
+        await measure_handler(rounds)
+        for batch_size in batch_sizes:
+            await measure_relay(count, batch_size)
+    finally:
+        await close_broker()
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-sizes", default="100,500,1000")
+    parser.add_argument("--rounds", type=int, default=500, help="ハンドラー側の計測回数")
+    args = parser.parse_args()
+    asyncio.run(main(args.events, [int(s) for s in args.batch_sizes.split(",")], args.rounds))
@@ -0,0 +1,119 @@
+"""
+ペルソナ検索のベンチマーク
+
+attributes に {"bench": true} を付けたペルソナを --personas 件投入し（既にあれば不足分だけ）、
+代表的な検索条件ごとに persona_search_service.search の平均応答時間と実行計画の要約を表示する。
+条件なしの一覧はキャッシュなし・キャッシュありの両方を計測する。
+投入したペルソナは --cleanup で削除する。
+
+使い方:
+  docker compose exec api python -m scripts.bench_persona_search [--personas 100000] [--rounds 50] [--cleanup]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import and_, delete, func, insert, select, text
+
+from app.database import async_session, engine
+from app.models.staff_member import StaffMember
+from app.models.persona import Gender, Persona
+from app.redis_client import close_redis
+from app.services.persona_search_service import PersonaSearchQuery, browse_cache, build_conditions, search
+from app.services.realtime_service import close_broker
+from scripts.explain import explain
+
+BENCH_MARKER = {"bench": True}
+NAMES = ["さくら", "ゆうと", "あおい", "はると", "みゆ", "そうた", "ひなた", "れん", "ゆい", "かいと"]
+HOBBIES = ["料理", "映画", "音楽", "旅行", "カフェ巡り", "読書", "ゲーム", "スポーツ", "写真", "アニメ"]
+AREAS = ["東京", "大阪", "名古屋", "福岡", "札幌", "仙台"]
+
+CASES = [
+    ("条件なし（キャッシュなし）", PersonaSearchQuery()),
+    ("名前", PersonaSearchQuery(name="さくら")),
+    ("フリーワード", PersonaSearchQuery(q="カフェ巡り")),
+    ("性別 + 年齢", PersonaSearchQuery(gender=Gender.female, min_age=25, max_age=29)),
+    ("attributes", PersonaSearchQuery(attributes={"area": "福岡", "hobby": "写真"})),
+    (
+        "組み合わせ",
+        PersonaSearchQuery(q="旅行", gender=Gender.male, min_age=20, max_age=35, attributes={"area": "大阪"}),
+    ),
+]
+
+
+async def fill(count: int) -> None:
+    async with async_session() as db:
+        existing = await db.scalar(
+            select(func.count()).select_from(Persona).where(Persona.attributes.contains(BENCH_MARKER))
+        )
+        staff_id = await db.scalar(select(StaffMember.id).order_by(StaffMember.id).limit(1))
+        if staff_id is None:
+            raise SystemExit("スタッフがいません。先に python -m scripts.seed を実行してください")
+        rng = random.Random(existing)
+        rows = []
+        for i in range(existing, count):
+            hobby = rng.choice(HOBBIES)
+            rows.append(
+                {
+                    "staff_id": staff_id,
+                    "name": f"{rng.choice(NAMES)}{i}",
+                    "gender": rng.choice(list(Gender)),
+                    "age": rng.randint(18, 45),
+                    "bio": f"{hobby}と{rng.choice(HOBBIES)}が好きです。{rng.choice(AREAS)}に住んでいます。",
+                    "attributes": {**BENCH_MARKER, "hobby": hobby, "area": rng.choice(AREAS)},
+                    "is_active": True,
+                }
+            )
+        for start in range(0, len(rows), 5000):
+            await db.execute(insert(Persona), rows[start:start + 5000])
+        await db.commit()
+        await db.execute(text("ANALYZE personas"))
+    print(f"ベンチ用ペルソナ: {max(existing, count)} 件（今回投入 {len(rows)} 件）")
+
+
+async def plan_summary(query: PersonaSearchQuery) -> str:
+    stmt = select(Persona.id).where(and_(*build_conditions(query))).order_by(Persona.id).limit(20)
+    async with async_session() as db:
+        lines = [line.strip() for line in await explain(db, stmt)]
+    return " / ".join(line for line in lines if "Scan" in line or "BitmapAnd" in line)
+
+
+async def measure(name: str, query: PersonaSearchQuery, rounds: int, use_cache: bool = False) -> None:
+    elapsed = 0.0
+    for _ in range(rounds):
+        if query.is_empty() and not use_cache:
+            await browse_cache.invalidate(["0:20"])
+        started = time.perf_counter()
+        async with async_session() as db:
+            await search(db, query, None, 20)
+        elapsed += time.perf_counter() - started
+    print(f"{name:<24} 平均: {elapsed / rounds * 1000:7.2f} ms  計画: {await plan_summary(query)}")
+
+
+async def main(count: int, rounds: int, cleanup: bool) -> None:
+    try:
+        if cleanup:
+            async with async_session() as db:
+                result = await db.execute(delete(Persona).where(Persona.attributes.contains(BENCH_MARKER)))
+                await db.commit()
+            print(f"ベンチ用ペルソナを {result.rowcount} 件削除しました")
+            return
+        await fill(count)
+        for name, query in CASES:
+            await measure(name, query, rounds)
+        await measure("条件なし（キャッシュあり）", PersonaSearchQuery(), rounds, use_cache=True)
+    finally:
+        await close_broker()
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--personas", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.personas, args.rounds, args.cleanup))
@@ -0,0 +1,57 @@
+"""
+管理画面のユーザー検索がインデックスを使うことの確認
+
+user_search_service が組み立てる検索ごとに EXPLAIN を取り、想定したインデックス名が
+実行計画に含まれるかを確認する。データが少ない開発環境では全件走査の方が安く見積もられるため、
+enable_seqscan を切った上で「インデックスで実行できる形のクエリか」を確かめる。
+1 つでも外れたら終了コード 1 で終わる。
+
+使い方:
+  docker compose exec api python -m scripts.check_user_search_plans
+"""
+
+import asyncio
+import re
+import sys
+
+from sqlalchemy import text
+
+from app.database import async_session, engine
+from app.models.user import User
+from app.services.user_search_service import UserSearchQuery, build_statement, similarity_score
+from scripts.explain import explain
+
+CASES = [
+    ("email 部分一致", UserSearchQuery(email="example"), r"ix_users_email_trgm"),
+    ("display_name 部分一致", UserSearchQuery(display_name="テスト"), r"ix_users_display_name_trgm"),
+    ("email 前方一致", UserSearchQuery(email_prefix="user"), r"ix_users_email\b"),
+    ("あいまい検索", UserSearchQuery(q="exmple"), r"ix_users_\w+_trgm"),
+]
+
+
+async def plan(query: UserSearchQuery) -> list[str]:
+    stmt = build_statement(query)
+    if query.ranked:
+        stmt = stmt.order_by(similarity_score(query.q).desc(), User.id.desc())
+    async with async_session() as db:
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        return await explain(db, stmt.limit(50))
+
+
+async def main() -> int:
+    failures = 0
+    try:
+        for name, query, index_pattern in CASES:
+            lines = await plan(query)
+            ok = any(re.search(index_pattern, line) for line in lines)
+            print(f"{'OK ' if ok else 'NG '} {name}（{index_pattern}）")
+            if not ok:
+                failures += 1
+                print("\n".join(f"    {line}" for line in lines))
+    finally:
+        await engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
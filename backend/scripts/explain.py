@@ -0,0 +1,26 @@
+"""
+ベンチ・確認スクリプト共通の EXPLAIN ヘルパー
+
+SQLAlchemy の文をそのままバインド変数付きで EXPLAIN する（JSONB などリテラル化できない値もそのまま渡せる）。
+"""
+
+from sqlalchemy import ClauseElement, Executable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+
+async def explain(db: AsyncSession, statement) -> list[str]:
+    result = await db.execute(Explain(statement))
+    return [row[0] for row in result.all()]
@@ -15,6 +15,8 @@ from app.database import async_session
 from app.models.user import User, UserStatus
 from app.models.staff_member import StaffMember, StaffRole, StaffStatus
 from app.models.persona import Persona, Gender
+from app.models.persona_stats import PersonaStats
+from app.models.credit_transaction import CreditTransaction, CreditTransactionType
 from app.services.auth_service import hash_password
 
 SEED_STAFF = [
@@ -101,6 +103,15 @@ async def seed(db: AsyncSession) -> None:
         )
         db.add(user)
         await db.flush()
+        if user.credit_balance:
+            db.add(
+                CreditTransaction(
+                    user_id=user.id,
+                    type=CreditTransactionType.opening,
+                    amount=user.credit_balance,
+                    balance_after=user.credit_balance,
+                )
+            )
         print(f"  作成: {data['email']} (id={user.id})")
 
     # --- ペルソナ ---
@@ -131,6 +142,7 @@ async def seed(db: AsyncSession) -> None:
         )
         db.add(persona)
         await db.flush()
+        db.add(PersonaStats(persona_id=persona.id))
         print(f"  作成: ペルソナ {data['name']} (id={persona.id})")
 
     await db.commit()
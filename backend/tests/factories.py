@@ -0,0 +1,45 @@
+"""テスト用の行を作るヘルパー（flush まで行い、コミットは呼び出し側に任せる）"""
+
+from itertools import count
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.persona import Persona
+from app.models.session import Session
+from app.models.staff_member import StaffMember, StaffRole
+from app.models.user import User
+
+_seq = count(1)
+
+
+async def make_user(db: AsyncSession, credit_balance: int = 0, **values) -> User:
+    n = next(_seq)
+    values = {"email": f"user{n}@example.com", "display_name": f"ユーザー{n}", "hashed_password": "x", **values}
+    user = User(credit_balance=credit_balance, **values)
+    db.add(user)
+    await db.flush()
+    return user
+
+
+async def make_staff(db: AsyncSession, role: StaffRole = StaffRole.staff, **values) -> StaffMember:
+    n = next(_seq)
+    staff = StaffMember(email=f"staff{n}@example.com", display_name=f"スタッフ{n}", hashed_password="x", role=role, **values)
+    db.add(staff)
+    await db.flush()
+    return staff
+
+
+async def make_persona(db: AsyncSession, staff: StaffMember, **values) -> Persona:
+    n = next(_seq)
+    values = {"name": f"ペルソナ{n}", **values}
+    persona = Persona(staff_id=staff.id, **values)
+    db.add(persona)
+    await db.flush()
+    return persona
+
+
+async def make_session(db: AsyncSession, user: User, persona: Persona, **values) -> Session:
+    session = Session(user_id=user.id, persona_id=persona.id, **values)
+    db.add(session)
+    await db.flush()
+    return session
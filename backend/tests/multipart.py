@@ -0,0 +1,29 @@
+"""multipart/form-data のリクエストを組み立てるヘルパー（receive_form_file を通すテスト用）"""
+
+from starlette.requests import Request
+
+BOUNDARY = "test-boundary"
+
+
+def multipart_body(data: bytes, content_type: str = "image/png", field: str = "file") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="a.png"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def make_request(
+    body: bytes, content_type: str = f"multipart/form-data; boundary={BOUNDARY}", declare_length: bool = True
+) -> Request:
+    """body を 4KB ずつ受信する POST リクエスト"""
+    headers = [(b"content-type", content_type.encode())]
+    if declare_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    chunks = [body[i : i + 4096] for i in range(0, len(body), 4096)] or [b""]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers}, receive)
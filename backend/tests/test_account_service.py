@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi import Response
+from sqlalchemy import event
+
+from app.database import engine
+from app.routers.sessions import list_sessions
+from app.services.account_service import (
+    PersonaProfile,
+    UserProfile,
+    get_display_name_map,
+    get_profiles,
+)
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_session, make_staff, make_user
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+@contextmanager
+def count_queries():
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_profiles_take_one_query_per_table(db):
+    users = [await make_user(db, avatar_url=f"/uploads/u{i}.png") for i in range(3)]
+    staff = await make_staff(db)
+    thumbnailed = await make_persona(db, staff, avatar_url="/uploads/p.png", avatar_variants={"small": "/uploads/p_s.webp"})
+    plain = await make_persona(db, staff)
+    await db.commit()
+
+    with count_queries() as statements:
+        user_profiles, persona_profiles = await get_profiles(
+            db,
+            user_ids=[u.id for u in users] + [users[0].id],
+            persona_ids=[thumbnailed.id, plain.id, 999999],
+        )
+
+    assert len(statements) == 2
+    assert user_profiles == {u.id: UserProfile(u.display_name, u.avatar_url) for u in users}
+    # アイコンは小さいサムネイルを優先し、存在しない ID は含めない
+    assert persona_profiles == {
+        thumbnailed.id: PersonaProfile(thumbnailed.name, "/uploads/p_s.webp"),
+        plain.id: PersonaProfile(plain.name, None),
+    }
+
+
+async def test_empty_ids_skip_the_database(db):
+    with count_queries() as statements:
+        assert await get_profiles(db) == ({}, {})
+        assert await get_display_name_map(db, []) == {}
+    assert statements == []
+
+
+async def test_display_name_map(db):
+    a, b = await make_user(db, display_name="あ"), await make_user(db, display_name="い")
+    await db.commit()
+
+    assert await get_display_name_map(db, [a.id, b.id, a.id]) == {a.id: "あ", b.id: "い"}
+
+
+async def test_session_list_is_enriched_for_staff(db):
+    staff = await make_staff(db)
+    persona = await make_persona(db, staff, name="さくら")
+    users = [await make_user(db, display_name=f"ゲスト{i}") for i in range(3)]
+    for user in users:
+        await make_session(db, user, persona)
+    await db.commit()
+
+    with count_queries() as statements:
+        items = await list_sessions(
+            Response(), session_status=None, order="activity", limit=50, cursor=None, account=staff, db=db
+        )
+    # セッション 1 + ユーザー 1 + ペルソナ 1（件数によらない）
+    assert len(statements) == 3
+    assert sorted(s.user_display_name for s in items) == ["ゲスト0", "ゲスト1", "ゲスト2"]
+    assert {s.persona_name for s in items} == {"さくら"}
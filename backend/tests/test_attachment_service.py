@@ -0,0 +1,112 @@
+import pytest
+from fastapi import HTTPException
+
+from app.models.message import Message, SenderType
+from app.models.message_attachment import MessageAttachment
+from app.services import attachment_service, upload_service
+from app.services.attachment_service import create_attachment, get_attachment_for_account, use_attachments
+from app.services.image_service import ImageTooLarge
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_session, make_staff, make_user
+from tests.multipart import make_request, multipart_body
+
+
+@pytest.mark.anyio
+async def test_form_file_within_limit_is_parsed():
+    upload = await upload_service.receive_form_file(make_request(multipart_body(b"png")), "file", 1024)
+    assert upload.content_type == "image/png"
+    assert await upload.read() == b"png"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("declare_length", [True, False])
+async def test_form_file_over_limit_is_cut_off(declare_length):
+    body = multipart_body(b"x" * (1024 + upload_service._MULTIPART_OVERHEAD + 1))
+    with pytest.raises(HTTPException) as excinfo:
+        await upload_service.receive_form_file(make_request(body, declare_length=declare_length), "file", 1024)
+    assert excinfo.value.status_code == 413
+
+
+@pytest.mark.anyio
+async def test_form_file_requires_multipart():
+    with pytest.raises(HTTPException) as excinfo:
+        await upload_service.receive_form_file(make_request(b"{}", "application/json"), "file", 1024)
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_image_with_huge_dimensions_is_rejected(monkeypatch):
+    def refuse(source: str, dest: str):
+        raise ImageTooLarge("100000x100000")
+
+    monkeypatch.setattr(attachment_service, "make_preview", refuse)
+    with pytest.raises(HTTPException) as excinfo:
+        await create_attachment(None, make_request(multipart_body(b"png")), None)
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail == "画像の縦横のサイズが大きすぎます"
+    assert list((upload_service.upload_root() / "tmp").iterdir()) == []
+
+
+async def _attachment(db, uploader_type: SenderType, uploader_id: int) -> MessageAttachment:
+    attachment = MessageAttachment(
+        uploader_type=uploader_type,
+        uploader_id=uploader_id,
+        original_url="/uploads/private/attachments/ab/cd/abcd.png",
+        content_type="image/png",
+        size_bytes=3,
+        preview_url="/uploads/ab/cd/abcd.webp",
+        preview_width=1,
+        preview_height=1,
+    )
+    db.add(attachment)
+    await db.flush()
+    return attachment
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_attachment_is_visible_to_uploader_session_user_and_staff(db):
+    staff = await make_staff(db)
+    persona = await make_persona(db, staff)
+    uploader = await make_user(db)
+    recipient = await make_user(db)
+    stranger = await make_user(db)
+    own = await _attachment(db, SenderType.user, uploader.id)
+    sent = await _attachment(db, SenderType.persona, staff.id)
+    session = await make_session(db, recipient, persona)
+    db.add(
+        Message(
+            session_id=session.id,
+            sender_type=SenderType.persona,
+            sender_id=staff.id,
+            content="",
+            image_url=sent.preview_url,
+            attachment_id=sent.id,
+        )
+    )
+    await db.commit()
+
+    assert (await get_attachment_for_account(db, own.id, uploader)).id == own.id
+    assert (await get_attachment_for_account(db, sent.id, recipient)).id == sent.id
+    assert (await get_attachment_for_account(db, own.id, await make_staff(db))).id == own.id
+    for attachment_id, account in [(own.id, stranger), (sent.id, stranger), (own.id, recipient), (0, uploader)]:
+        with pytest.raises(HTTPException) as excinfo:
+            await get_attachment_for_account(db, attachment_id, account)
+        assert excinfo.value.status_code == 404
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_only_own_attachments_can_be_sent(db):
+    user = await make_user(db)
+    other = await make_user(db)
+    staff = await make_staff(db)
+    own = await _attachment(db, SenderType.user, user.id)
+    others = await _attachment(db, SenderType.user, other.id)
+    staffs = await _attachment(db, SenderType.persona, staff.id)
+    await db.commit()
+
+    used = await use_attachments(db, user, [own.id, others.id, staffs.id])
+    assert set(used) == {own.id}
+    assert used[own.id].used_at is not None
+    assert set(await use_attachments(db, staff, [own.id, staffs.id])) == {staffs.id}
@@ -0,0 +1,145 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+
+from app.models.user import User
+from app.redis_client import close_redis
+from app.services import cache_service, realtime_service
+from app.services.account_service import enqueue_user_profile_invalidation, get_user_profiles
+from app.services.cache_service import INVALIDATION_CHANNEL, WORKER_ID, TwoTierCache, get_cache
+from tests.conftest import TEST_REDIS_URL, requires_db, wait_for_subscriber
+from tests.factories import make_user
+
+
+def _cache(use_redis: bool = True, **options) -> TwoTierCache:
+    options = {"maxsize": 10, "local_ttl": 60, "redis_ttl": 60, **options}
+    return TwoTierCache("test", use_redis=use_redis, **options)
+
+
+def test_local_lru_evicts_the_least_recently_used():
+    cache = _cache(use_redis=False, maxsize=2)
+    cache._set_local("1", "a")
+    cache._set_local("2", "b")
+    cache._get_local("1")
+    cache._set_local("3", "c")
+    assert list(cache._local) == ["1", "3"]
+
+
+def test_local_entries_expire(monkeypatch):
+    clock = SimpleNamespace(monotonic=lambda: 100.0)
+    monkeypatch.setattr(cache_service, "time", clock)
+    cache = _cache(use_redis=False, local_ttl=5)
+    cache._set_local("1", "a")
+
+    clock.monotonic = lambda: 104.0
+    assert cache._get_local("1") == (True, "a")
+    clock.monotonic = lambda: 106.0
+    assert cache._get_local("1") == (False, None)
+    assert "1" not in cache._local
+
+
+@pytest.mark.anyio
+async def test_local_only_cache_counts_hits_and_misses():
+    cache = _cache(use_redis=False)
+    await cache.set_many({1: "a"})
+    found, missing = await cache.get_many([1, 2, 2])
+    assert (found, missing) == ({"1": "a"}, {"2": 0})
+
+    await cache.invalidate([1])
+    assert await cache.get_many([1]) == ({}, {"1": 0})
+    assert cache.stats.as_dict() == {"local_hits": 1, "redis_hits": 0, "misses": 2, "invalidations": 1, "errors": 0}
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(bool(TEST_REDIS_URL), reason="接続できない Redis を前提にする")
+async def test_unreachable_redis_falls_back_to_the_local_tier():
+    cache = _cache()
+    try:
+        await cache.set_many({"1": "a"}, {"1": 0})
+        assert await cache.get_many(["1", "2"]) == ({"1": "a"}, {"2": 0})
+    finally:
+        await close_redis()
+    assert cache.stats.errors == 2
+
+
+@pytest.mark.anyio
+async def test_listener_evicts_keys_invalidated_by_other_workers():
+    cache = get_cache("test-listener", maxsize=10, local_ttl=60, redis_ttl=60, use_redis=False)
+    await cache.set_many({"1": "a", "2": "b", "3": "c"})
+    listener = cache_service.start_invalidation_listener()
+    try:
+        await wait_for_subscriber(INVALIDATION_CHANNEL)
+        # 自ワーカーの通知は無視し、他ワーカーの通知だけで LRU から消す
+        await realtime_service.publish(INVALIDATION_CHANNEL, {"namespace": cache.namespace, "keys": ["1"], "origin": WORKER_ID})
+        await realtime_service.publish(INVALIDATION_CHANNEL, {"namespace": "unknown", "keys": ["2"], "origin": "other"})
+        await realtime_service.publish(INVALIDATION_CHANNEL, {"namespace": cache.namespace, "keys": ["3"], "origin": "other"})
+        for _ in range(100):
+            if "3" not in cache._local:
+                break
+            await asyncio.sleep(0.01)
+        assert list(cache._local) == ["1", "2"]
+    finally:
+        listener.cancel()
+        await realtime_service.close_broker()
+
+
+@pytest.mark.anyio
+async def test_other_workers_see_the_shared_tier(redis):
+    writer, reader = _cache(), _cache()
+    await writer.set_many({"1": "a"})
+
+    assert await reader.get_many(["1"]) == ({"1": "a"}, {})
+    assert reader.stats.redis_hits == 1
+    assert await reader.get_many(["1"]) == ({"1": "a"}, {})
+    assert reader.stats.local_hits == 1
+
+    # 無効化で Redis から消え、通知を受けて LRU を捨てたワーカーは読み直す
+    await writer.invalidate(["1"])
+    reader.evict_local(["1"])
+    assert await reader.get_many(["1"]) == ({}, {"1": 1})
+
+
+@pytest.mark.anyio
+async def test_invalidated_key_is_not_written_back_by_a_late_reader(redis):
+    writer, reader = _cache(), _cache()
+
+    # リーダーがキャッシュを外して DB から古い値を読んでいる間に、値が変わって無効化される
+    _, missing = await reader.get_many(["1"])
+    assert missing == {"1": 0}
+    await writer.invalidate(["1"])
+    await reader.set_many({"1": "stale"}, missing)
+
+    assert await redis.get(reader._redis_key("1")) is None
+    assert reader._get_local("1") == (False, None)
+
+    # 無効化の後に読み直した値は書き込める
+    _, missing = await reader.get_many(["1"])
+    assert missing == {"1": 1}
+    await reader.set_many({"1": "new"}, missing)
+    found, _ = await _cache().get_many(["1"])
+    assert found == {"1": "new"}
+
+
+@pytest.mark.anyio
+async def test_set_without_generation_always_writes(redis):
+    cache = _cache()
+    await cache.invalidate(["1"])
+    await cache.set_many({"1": "value"})
+    found, _ = await _cache().get_many(["1"])
+    assert found == {"1": "value"}
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_renamed_user_is_read_again_after_commit(db):
+    user = await make_user(db, display_name="旧名")
+    await db.commit()
+    assert (await get_user_profiles(db, [user.id]))[user.id].display_name == "旧名"
+
+    await db.execute(update(User).where(User.id == user.id).values(display_name="新名"))
+    enqueue_user_profile_invalidation(db, user.id)
+    await db.commit()
+
+    assert (await get_user_profiles(db, [user.id]))[user.id].display_name == "新名"
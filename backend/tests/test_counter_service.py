@@ -0,0 +1,57 @@
+import pytest
+
+from app.models.notification import Notification, NotificationType
+from app.routers.notifications import mark_all_as_read, mark_as_read
+from app.services.counter_service import add_unread_notifications, get_counters, mark_session_read
+from app.services.message_service import create_message
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_session, make_staff, make_user
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+async def _notifications(db, user, count: int) -> list[Notification]:
+    notifications = [Notification(user_id=user.id, type=NotificationType.system, title=f"{i}") for i in range(count)]
+    db.add_all(notifications)
+    await add_unread_notifications(db, [user.id] * count)
+    await db.commit()
+    return notifications
+
+
+async def test_reading_a_notification_decrements_once(db):
+    user = await make_user(db)
+    first, _, _ = await _notifications(db, user, 3)
+
+    await mark_as_read(first.id, user=user, db=db)
+    await mark_as_read(first.id, user=user, db=db)
+    assert (await get_counters(db, user.id)).notifications == 2
+
+    await mark_all_as_read(user=user, db=db)
+    assert (await get_counters(db, user.id)).notifications == 0
+    # 0 未満にはならない
+    await mark_all_as_read(user=user, db=db)
+    assert (await get_counters(db, user.id)).notifications == 0
+
+
+async def test_session_unread_follows_persona_messages_and_reads(db):
+    user = await make_user(db, credit_balance=10)
+    staff = await make_staff(db)
+    session = await make_session(db, user, await make_persona(db, staff))
+    await db.commit()
+
+    first = await create_message(db, session, staff, "1")
+    await create_message(db, session, staff, "2")
+    await create_message(db, session, staff, "3")
+    assert (await get_counters(db, user.id)).messages == 3
+
+    assert await mark_session_read(db, session, first.id) == (first.id, 2)
+    await db.commit()
+    assert (await get_counters(db, user.id)).messages == 2
+    # 既読位置は戻らない
+    assert await mark_session_read(db, session, first.id - 1) == (first.id, 2)
+
+    # 返信したユーザーは最後まで読んでいる
+    await create_message(db, session, user, "返信")
+    assert (await get_counters(db, user.id)).messages == 0
+    await db.refresh(session)
+    assert session.user_unread_count == 0
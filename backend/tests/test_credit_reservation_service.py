@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.models.credit_reservation import CreditReservation, CreditReservationStatus
+from app.models.user import User
+from app.services import credit_reservation_service
+from app.services.credit_reservation_service import LocalReservationStore
+from app.services.message_service import create_message
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_session, make_staff, make_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_local_store_spends_refunds_and_discards():
+    store = LocalReservationStore()
+    await store.open(1, reservation_id=7, amount=2)
+    assert await store.spend(1, 1) == 7
+    assert await store.spend(1, 1) == 7
+    assert await store.spend(1, 1) is None
+
+    await store.refund(1, 7, 1)
+    assert await store.remaining(1) == 1
+    # 入れ替わった予約の払い戻し・削除は無視する
+    await store.refund(1, 8, 5)
+    await store.discard(1, 8)
+    assert await store.remaining(1) == 1
+    await store.discard(1, 7)
+    assert await store.remaining(1) == 0
+
+
+@pytest.fixture
+def reservations(monkeypatch):
+    monkeypatch.setattr(settings, "credit_reservation_enabled", True)
+    monkeypatch.setattr(settings, "credit_reservation_backend", "local")
+    monkeypatch.setattr(settings, "credit_reservation_block", 5)
+    monkeypatch.setattr(credit_reservation_service, "_store", LocalReservationStore())
+
+
+@requires_db
+async def test_messages_spend_a_reserved_block_and_settle_returns_the_rest(db, reservations):
+    user = await make_user(db, credit_balance=10)
+    session = await make_session(db, user, await make_persona(db, await make_staff(db)))
+    await db.commit()
+
+    messages = [await create_message(db, session, user, f"{i}") for i in range(3)]
+    reservation_id = messages[0].credit_reservation_id
+    assert reservation_id is not None
+    assert {m.credit_reservation_id for m in messages} == {reservation_id}
+    # ブロック分だけ引き当て、送信ごとには users 行を減らさない
+    assert await db.scalar(select(User.credit_balance).where(User.id == user.id)) == 5
+
+    assert await credit_reservation_service.settle(reservation_id) == 2
+    assert await credit_reservation_service.settle(reservation_id) is None
+    db.expire_all()
+    assert await db.scalar(select(User.credit_balance).where(User.id == user.id)) == 7
+    reservation = await db.get(CreditReservation, reservation_id)
+    assert reservation.status == CreditReservationStatus.settled
+    assert reservation.consumed == 3
+
+
+@requires_db
+async def test_small_balances_are_charged_directly(db, reservations):
+    user = await make_user(db, credit_balance=3)
+    session = await make_session(db, user, await make_persona(db, await make_staff(db)))
+    await db.commit()
+
+    message = await create_message(db, session, user, "hi")
+    assert message.credit_reservation_id is None
+    assert await db.scalar(select(User.credit_balance).where(User.id == user.id)) == 2
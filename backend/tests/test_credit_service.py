@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.database import async_session
+from app.models.credit_transaction import CreditTransaction, CreditTransactionType
+from app.models.user import User
+from app.services.credit_service import add_credits, deduct_credits, try_deduct_credits
+from tests.conftest import requires_db
+from tests.factories import make_user
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+async def _ledger(db, user_id):
+    result = await db.execute(
+        select(CreditTransaction.type, CreditTransaction.amount, CreditTransaction.balance_after)
+        .where(CreditTransaction.user_id == user_id)
+        .order_by(CreditTransaction.id)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def test_deduct_and_add_record_ledger(db):
+    user = await make_user(db, credit_balance=5)
+    assert await deduct_credits(db, user, 2, reference_id=10) == 3
+    assert user.credit_balance == 3
+    assert await add_credits(db, user.id, 4, CreditTransactionType.charge) == 7
+    await db.commit()
+
+    assert await _ledger(db, user.id) == [
+        (CreditTransactionType.message, -2, 3),
+        (CreditTransactionType.charge, 4, 7),
+    ]
+
+
+async def test_insufficient_balance_is_payment_required_and_not_recorded(db):
+    user = await make_user(db, credit_balance=1)
+    with pytest.raises(HTTPException) as exc:
+        await deduct_credits(db, user, 2)
+    assert exc.value.status_code == 402
+    await db.commit()
+
+    assert await db.scalar(select(User.credit_balance).where(User.id == user.id)) == 1
+    assert await _ledger(db, user.id) == []
+
+
+async def test_concurrent_deductions_never_overdraw(db):
+    user = await make_user(db, credit_balance=3)
+    await db.commit()
+
+    async def spend():
+        async with async_session() as session:
+            balance = await try_deduct_credits(session, user.id, 1, CreditTransactionType.message)
+            await session.commit()
+            return balance
+
+    results = await asyncio.gather(*(spend() for _ in range(5)))
+    assert sorted(r for r in results if r is not None) == [0, 1, 2]
+    assert results.count(None) == 2
+    assert await db.scalar(select(User.credit_balance).where(User.id == user.id)) == 0
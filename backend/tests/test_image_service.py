@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.models.outbox import OutboxEvent
+from app.models.user import User
+from app.routers.auth import MAX_FILE_SIZE, upload_avatar
+from app.services import image_service, outbox_service
+from tests.conftest import requires_db
+from tests.factories import make_user
+from tests.multipart import make_request, multipart_body
+
+
+def test_pick_variant_falls_back_to_original():
+    variants = {"small": "/uploads/a_small.webp", "medium": ""}
+    assert image_service.pick_variant("/uploads/a.png", variants, "small") == "/uploads/a_small.webp"
+    assert image_service.pick_variant("/uploads/a.png", variants, "medium") == "/uploads/a.png"
+    assert image_service.pick_variant("/uploads/a.png", None, "large") == "/uploads/a.png"
+
+
+def test_generate_variants_strips_metadata(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "photo.jpg"
+    exif = Image.Exif()
+    exif[0x0110] = "camera"
+    Image.new("RGB", (1000, 500), "red").save(source, exif=exif)
+
+    outputs = image_service.generate_variants(str(source))
+
+    assert set(outputs) == set(image_service.VARIANTS)
+    with Image.open(outputs["small"]) as small:
+        assert small.format == "WEBP"
+        assert max(small.size) == image_service.VARIANTS["small"]
+        assert not small.getexif()
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_enqueue_ignores_external_urls(db):
+    user = await make_user(db)
+    image_service.enqueue_variants(db, "user", user.id, "https://example.com/a.png")
+    image_service.enqueue_variants(db, "user", user.id, "/uploads/ab/a.png")
+    await db.commit()
+
+    events = (await db.execute(select(OutboxEvent))).scalars().all()
+    assert [e.payload["avatar_url"] for e in events] == ["/uploads/ab/a.png"]
+    assert events[0].topic == outbox_service.TOPIC_IMAGE
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_process_batch_records_variants_for_current_avatar(db, monkeypatch):
+    def fake_generate(source: str) -> dict[str, str]:
+        if source.endswith("broken.png"):
+            raise OSError("cannot identify image file")
+        src = Path(source)
+        return {name: str(src.with_name(f"{src.stem}_{name}.webp")) for name in image_service.VARIANTS}
+
+    monkeypatch.setattr(image_service, "generate_variants", fake_generate)
+    current = await make_user(db, avatar_url="/uploads/ab/current.png")
+    replaced = await make_user(db, avatar_url="/uploads/ab/new.png")
+    broken = await make_user(db, avatar_url="/uploads/ab/broken.png")
+    image_service.enqueue_variants(db, "user", current.id, "/uploads/ab/current.png")
+    image_service.enqueue_variants(db, "user", replaced.id, "/uploads/ab/old.png")
+    image_service.enqueue_variants(db, "user", broken.id, "/uploads/ab/broken.png")
+    await db.commit()
+
+    with ThreadPoolExecutor(1) as pool:
+        assert await image_service.process_batch(pool, 10) == 3
+
+    db.expire_all()
+    variants = dict((await db.execute(select(User.id, User.avatar_variants))).all())
+    assert variants[current.id]["small"] == "/uploads/ab/current_small.webp"
+    assert variants[replaced.id] is None
+    assert variants[broken.id] is None
+    topics = (await db.execute(select(OutboxEvent.topic))).scalars().all()
+    assert outbox_service.TOPIC_IMAGE not in topics
+
+
+def test_oversized_dimensions_are_refused_before_decoding(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "bomb.png"
+    # 1 ビット画像なら数 MB のファイルで 10000 × 5000 ピクセルになる
+    Image.new("1", (10000, 5000)).save(source)
+    monkeypatch.setattr(image_service, "MAX_IMAGE_PIXELS", 10000 * 5000 - 1)
+
+    with pytest.raises(image_service.ImageTooLarge):
+        image_service.make_preview(str(source), str(tmp_path / "preview.webp"))
+    with pytest.raises(image_service.ImageTooLarge):
+        image_service.generate_variants(str(source))
+    assert not (tmp_path / "preview.webp").exists()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("declare_length", [True, False])
+async def test_avatar_upload_is_cut_off_while_streaming(declare_length):
+    body = multipart_body(b"x" * (MAX_FILE_SIZE + 64 * 1024))
+    with pytest.raises(HTTPException) as excinfo:
+        await upload_avatar(make_request(body, declare_length=declare_length), user=None, db=None)
+    assert excinfo.value.status_code == 413
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_avatar_upload_queues_variants(db):
+    user = await make_user(db)
+    await db.commit()
+
+    updated = await upload_avatar(make_request(multipart_body(b"png bytes")), user=user, db=db)
+
+    assert updated.avatar_url.startswith("/uploads/")
+    assert updated.avatar_variants is None
+    events = (await db.execute(select(OutboxEvent).where(OutboxEvent.topic == outbox_service.TOPIC_IMAGE))).scalars()
+    assert [e.payload for e in events] == [{"owner": "user", "owner_id": user.id, "avatar_url": updated.avatar_url}]
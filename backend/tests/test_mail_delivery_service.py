@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+
+from app.config import settings
+from app.models.mail_campaign import CampaignStatus, CampaignType, MailCampaign
+from app.models.mail_delivery_run import DeliveryRunStatus, MailDeliveryRun
+from app.models.user import UserStatus
+from app.services.mail_delivery_service import claim_run, compile_target_filter, execute_run, render_subject
+from tests.conftest import requires_db
+from tests.factories import make_user
+
+
+def test_subject_cannot_inject_headers():
+    recipient = SimpleNamespace(display_name="evil\r\nBcc: all@example.com", email="a@example.com")
+    assert render_subject("{display_name} さんへ", recipient) == "evil Bcc: all@example.com さんへ"
+
+
+def test_unknown_filter_is_rejected():
+    with pytest.raises(ValueError):
+        compile_target_filter({"favorite_color": "blue"})
+    with pytest.raises(ValueError):
+        compile_target_filter({"user_ids": ["1"]})
+
+
+@pytest.fixture
+def sink(mail_sink, monkeypatch):
+    monkeypatch.setattr(settings, "mail_delivery_chunk_size", 2)
+    return mail_sink
+
+
+async def _campaign(db) -> MailCampaign:
+    campaign = MailCampaign(
+        type=CampaignType.blast, subject="{display_name} さん", body="本文", status=CampaignStatus.scheduled
+    )
+    db.add(campaign)
+    await db.flush()
+    db.add(MailDeliveryRun(campaign_id=campaign.id))
+    await db.commit()
+    return campaign
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_run_sends_to_every_active_user_in_chunks(db, sink):
+    users = [await make_user(db) for _ in range(5)]
+    await make_user(db, status=UserStatus.suspended)
+    campaign = await _campaign(db)
+
+    run = await claim_run()
+    await execute_run(run)
+
+    assert [m["to"] for m in sink()] == [u.email for u in users]
+    finished = await db.get(MailDeliveryRun, run.id, populate_existing=True)
+    assert finished.status == DeliveryRunStatus.completed
+    assert (finished.sent_count, finished.failed_count, finished.last_user_id) == (5, 0, users[-1].id)
+    assert (await db.get(MailCampaign, campaign.id, populate_existing=True)).status == CampaignStatus.sent
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_run_taken_over_by_another_worker_stops(db, sink):
+    for _ in range(3):
+        await make_user(db)
+    await _campaign(db)
+
+    run = await claim_run()
+    # 停止したとみなした別のワーカーが取得し直した
+    await db.execute(
+        update(MailDeliveryRun).where(MailDeliveryRun.id == run.id).values(heartbeat_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    await execute_run(run)
+
+    # 最初のチャンクは送ってしまうが、進捗は保存せず続きも送らない
+    assert len(sink()) == 2
+    stopped = await db.get(MailDeliveryRun, run.id, populate_existing=True)
+    assert stopped.status == DeliveryRunStatus.running
+    assert stopped.sent_count == 0
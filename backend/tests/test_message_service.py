@@ -0,0 +1,106 @@
+import pytest
+from sqlalchemy import select
+
+from app.models.credit_transaction import CreditTransaction
+from app.models.message import Message, SenderType
+from app.models.session import Session, SessionStatus
+from app.models.user import User
+from app.services.message_service import (
+    CREDIT_COST_PER_MESSAGE,
+    BatchSendItem,
+    create_message,
+    create_persona_messages_batch,
+)
+from app.routers.messages import poll_messages
+from app.services.realtime_service import session_channel, subscribe
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_session, make_staff, make_user
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+async def test_user_message_is_sent_as_user_and_charged(db):
+    user = await make_user(db, credit_balance=3)
+    persona = await make_persona(db, await make_staff(db))
+    session = await make_session(db, user, persona)
+    await db.commit()
+
+    message = await create_message(db, session, user, "こんにちは")
+
+    assert message.sender_type == SenderType.user
+    assert message.sender_id == user.id
+    assert message.credit_cost == CREDIT_COST_PER_MESSAGE
+    assert await db.scalar(select(User.credit_balance).where(User.id == user.id)) == 3 - CREDIT_COST_PER_MESSAGE
+    ledger = await db.scalar(select(CreditTransaction).where(CreditTransaction.user_id == user.id))
+    assert ledger.reference_id == message.id
+
+
+async def test_staff_message_is_sent_as_persona_for_free(db):
+    user = await make_user(db, credit_balance=3)
+    staff = await make_staff(db)
+    session = await make_session(db, user, await make_persona(db, staff))
+    await db.commit()
+
+    message = await create_message(db, session, staff, "ようこそ")
+
+    assert message.sender_type == SenderType.persona
+    assert message.credit_cost == 0
+    assert await db.scalar(select(User.credit_balance).where(User.id == user.id)) == 3
+    assert session.last_persona_message_id == message.id
+
+
+async def test_realtime_event_matches_poll_payload(db):
+    user = await make_user(db, credit_balance=3)
+    staff = await make_staff(db)
+    persona = await make_persona(db, staff)
+    session = await make_session(db, user, persona)
+    await db.commit()
+
+    async with subscribe(session_channel(session.id)) as subscription:
+        await create_message(db, session, staff, "ようこそ")
+        persona_event = await subscription.wait(timeout=1)
+        await create_message(db, session, user, "こんにちは")
+        user_event = await subscription.wait(timeout=1)
+
+    polled = await poll_messages(session_id=session.id, last_message_id=0, wait=0, account=user, db=db)
+    assert persona_event["message"]["sender_display_name"] == persona.name
+    assert [persona_event["message"], user_event["message"]] == [m.model_dump(mode="json") for m in polled.messages]
+
+
+async def test_batch_send_reports_errors_per_item(db):
+    user = await make_user(db)
+    staff, other_staff = await make_staff(db), await make_staff(db)
+    persona = await make_persona(db, staff)
+    active = await make_session(db, user, persona)
+    closed = await make_session(db, user, persona, status=SessionStatus.closed)
+    foreign = await make_session(db, user, await make_persona(db, other_staff))
+    await db.commit()
+
+    results = await create_persona_messages_batch(
+        db,
+        staff,
+        [
+            BatchSendItem(session_id=active.id, content="1通目"),
+            BatchSendItem(session_id=closed.id, content="x"),
+            BatchSendItem(session_id=foreign.id, content="x"),
+            BatchSendItem(session_id=999999, content="x"),
+            BatchSendItem(session_id=active.id, template_id=999999),
+            BatchSendItem(session_id=active.id, content="2通目"),
+        ],
+    )
+
+    assert [r.error for r in results] == [
+        None,
+        "このセッションは終了しています",
+        "権限がありません",
+        "セッションが見つかりません",
+        "テンプレートが見つかりません",
+        None,
+    ]
+    sent = [results[0].message, results[5].message]
+    assert all(m.sender_type == SenderType.persona and m.credit_cost == 0 for m in sent)
+    stored = (await db.execute(select(Message.content).where(Message.session_id == active.id).order_by(Message.id)))
+    assert stored.scalars().all() == ["1通目", "2通目"]
+    refreshed = await db.scalar(select(Session).where(Session.id == active.id).execution_options(populate_existing=True))
+    assert refreshed.last_persona_message_id == sent[1].id
+    assert refreshed.user_unread_count == 2
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from fastapi import WebSocketDisconnect, status
+
+from app.database import async_session, engine
+from app.models.session import Session
+from app.routers.messages import message_socket, poll_messages
+from app.services.auth_service import create_access_token
+from app.services.message_service import CREDIT_COST_PER_MESSAGE, create_message
+from app.services.realtime_service import get_broker, session_channel
+from tests.conftest import requires_db, wait_for_subscriber
+from tests.factories import make_persona, make_session, make_staff, make_user
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+async def test_long_poll_returns_message_sent_while_waiting(db):
+    user = await make_user(db)
+    staff = await make_staff(db)
+    session = await make_session(db, user, await make_persona(db, staff))
+    await db.commit()
+    session_id = session.id
+
+    poll = asyncio.create_task(poll_messages(session_id=session_id, last_message_id=0, wait=5, account=user, db=db))
+    await wait_for_subscriber(session_channel(session_id))
+
+    # 待機中のリクエストは DB 接続を握らない
+    assert not db.in_transaction()
+    assert engine.pool.checkedout() == 0
+
+    async with async_session() as other:
+        sent = await create_message(other, await other.get(Session, session_id), staff, "お待たせしました")
+
+    result = await asyncio.wait_for(poll, timeout=5)
+    assert [m.id for m in result.messages] == [sent.id]
+    assert result.last_message_id == sent.id
+
+
+async def test_long_poll_returns_existing_messages_without_waiting(db):
+    user = await make_user(db, credit_balance=1)
+    session = await make_session(db, user, await make_persona(db, await make_staff(db)))
+    await db.commit()
+    sent = await create_message(db, session, user, "こんにちは")
+
+    result = await asyncio.wait_for(
+        poll_messages(session_id=session.id, last_message_id=0, wait=30, account=user, db=db), timeout=5
+    )
+    assert [m.id for m in result.messages] == [sent.id]
+
+
+async def test_long_poll_times_out_with_the_same_cursor(db):
+    user = await make_user(db, credit_balance=1)
+    session = await make_session(db, user, await make_persona(db, await make_staff(db)))
+    await db.commit()
+    sent = await create_message(db, session, user, "こんにちは")
+
+    result = await poll_messages(session_id=session.id, last_message_id=sent.id, wait=1, account=user, db=db)
+    assert result.messages == []
+    assert result.last_message_id == sent.id
+    assert not get_broker()._subscribers.get(session_channel(session.id))
+
+
+class FakeWebSocket:
+    """message_socket に渡す WebSocket の代わり（送受信と close を記録する）"""
+
+    def __init__(self):
+        self.accepted = False
+        self.closed: tuple[int, str] | None = None
+        self.sent: asyncio.Queue[dict] = asyncio.Queue()
+        self._incoming: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code: int, reason: str = ""):
+        self.closed = (code, reason)
+
+    async def send_json(self, data: dict):
+        await self.sent.put(data)
+
+    async def receive_json(self) -> dict:
+        data = await self._incoming.get()
+        if data is None:
+            raise WebSocketDisconnect(code=1000)
+        return data
+
+    def push(self, data: dict | None) -> None:
+        """クライアントからの送信。None で切断"""
+        self._incoming.put_nowait(data)
+
+    async def next_sent(self) -> dict:
+        return await asyncio.wait_for(self.sent.get(), timeout=5)
+
+
+@pytest.mark.parametrize("token_for", ["invalid", "other_user"])
+async def test_socket_rejects_bad_token_or_foreign_session(db, token_for):
+    user, other = await make_user(db), await make_user(db)
+    session = await make_session(db, user, await make_persona(db, await make_staff(db)))
+    await db.commit()
+    token = "invalid" if token_for == "invalid" else create_access_token(other.id, "user")
+
+    websocket = FakeWebSocket()
+    await message_socket(websocket, session.id, token)
+
+    assert not websocket.accepted
+    assert websocket.closed[0] == status.WS_1008_POLICY_VIOLATION
+
+
+async def test_socket_sends_and_receives_messages(db):
+    user = await make_user(db, credit_balance=CREDIT_COST_PER_MESSAGE)
+    staff = await make_staff(db)
+    session = await make_session(db, user, await make_persona(db, staff))
+    await db.commit()
+
+    websocket = FakeWebSocket()
+    handler = asyncio.create_task(message_socket(websocket, session.id, create_access_token(user.id, "user")))
+    await wait_for_subscriber(session_channel(session.id))
+    assert websocket.accepted
+
+    websocket.push({"type": "send", "content": "こんにちは"})
+    replies = [await websocket.next_sent(), await websocket.next_sent()]
+    ack = next(r for r in replies if r["type"] == "ack")
+    pushed = next(r for r in replies if r["type"] == "message")
+    assert pushed["message"]["id"] == ack["message_id"]
+    assert pushed["message"]["content"] == "こんにちは"
+
+    # 残高不足はエラーとして返し、接続は切らない
+    websocket.push({"type": "send", "content": "もう一通"})
+    assert (await websocket.next_sent())["status"] == status.HTTP_402_PAYMENT_REQUIRED
+    websocket.push({"type": "unknown"})
+    assert (await websocket.next_sent())["type"] == "error"
+
+    # 他の接続から送られたメッセージも届く
+    async with async_session() as other:
+        sent = await create_message(other, await other.get(Session, session.id), staff, "ようこそ")
+    assert (await websocket.next_sent())["message"]["id"] == sent.id
+
+    websocket.push(None)
+    await asyncio.wait_for(handler, timeout=5)
+    assert not get_broker()._subscribers.get(session_channel(session.id))
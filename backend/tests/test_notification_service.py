@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.models.notification import Notification, NotificationType
+from app.models.outbox import OutboxEvent
+from app.services.counter_service import get_counters
+from app.services.notification_service import KIND_CREDIT, KIND_LIKE, KIND_MESSAGE, _build, fan_out
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_staff, make_user
+
+
+def test_grouped_titles():
+    names = {1: "さくら", 2: "あおい"}
+    message = _build(KIND_MESSAGE, [{"user_id": 9, "persona_id": 1, "preview": f"{i}"} for i in range(3)], names)
+    assert (message["title"], message["body"]) == ("さくらから3件の新着メッセージ", "2")
+    like = _build(KIND_LIKE, [{"user_id": 9, "persona_id": 1}, {"user_id": 9, "persona_id": 2}], names)
+    assert like["title"] == "さくらさん他1人にいいねしました"
+    credit = _build(KIND_CREDIT, [{"user_id": 9, "amount": 100}, {"user_id": 9, "amount": 50}], names)
+    assert (credit["type"], credit["title"]) == (NotificationType.credit, "150クレジットが付与されました")
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_events_in_a_closed_window_become_one_notification(db, monkeypatch):
+    monkeypatch.setattr(settings, "notification_window_message_seconds", 60)
+    user = await make_user(db)
+    persona = await make_persona(db, await make_staff(db), name="さくら")
+    hour_ago = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(hours=1)
+    payload = {"user_id": user.id, "persona_id": persona.id}
+    db.add_all(
+        [
+            OutboxEvent(topic="notify:message", payload={**payload, "preview": "1"}, created_at=hour_ago),
+            OutboxEvent(topic="notify:message", payload={**payload, "preview": "2"}, created_at=hour_ago + timedelta(seconds=5)),
+            # 時間枠が終わっていないものは次回に回す
+            OutboxEvent(topic="notify:message", payload={**payload, "preview": "3"}),
+        ]
+    )
+    await db.commit()
+
+    assert await fan_out(KIND_MESSAGE, batch_size=10) == 2
+    notifications = (await db.execute(select(Notification.title, Notification.body))).all()
+    assert [tuple(n) for n in notifications] == [("さくらから2件の新着メッセージ", "2")]
+    assert (await get_counters(db, user.id)).notifications == 1
+    assert await db.scalar(select(func.count()).select_from(OutboxEvent)) == 1
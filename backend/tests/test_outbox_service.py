@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.models.notification import Notification
+from app.models.outbox import OutboxEvent
+from app.services import realtime_service
+from app.services.cache_service import get_cache
+from app.services.counter_service import get_counters
+from app.services.outbox_service import (
+    enqueue_cache_invalidation,
+    enqueue_notification,
+    enqueue_realtime,
+    relay_batch,
+)
+from app.services.realtime_service import LocalBroker
+from tests.conftest import requires_db
+from tests.factories import make_user
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+async def _outbox_count(db) -> int:
+    return await db.scalar(select(func.count()).select_from(OutboxEvent))
+
+
+async def test_relay_creates_notifications_and_deletes_rows(db):
+    user = await make_user(db)
+    enqueue_notification(db, user.id, "system", "お知らせ", "本文")
+    enqueue_notification(db, user.id, "system", "お知らせ 2")
+    await db.commit()
+
+    assert await relay_batch(batch_size=10) == 2
+    assert await relay_batch(batch_size=10) == 0
+    assert await _outbox_count(db) == 0
+    titles = (await db.execute(select(Notification.title).order_by(Notification.id))).scalars().all()
+    assert titles == ["お知らせ", "お知らせ 2"]
+    assert (await get_counters(db, user.id)).notifications == 2
+
+
+async def test_rolled_back_side_effects_are_never_relayed(db):
+    user = await make_user(db)
+    await db.commit()
+    enqueue_notification(db, user.id, "system", "取り消し")
+    await db.rollback()
+
+    assert await relay_batch(batch_size=10) == 0
+    assert await db.scalar(select(func.count()).select_from(Notification)) == 0
+
+
+async def test_redis_backend_events_go_through_the_relay(db, monkeypatch):
+    broker = LocalBroker()
+    monkeypatch.setattr(settings, "realtime_backend", "redis")
+    monkeypatch.setattr(realtime_service, "_broker", broker)
+
+    async with broker.subscribe("session:1") as subscription:
+        enqueue_realtime(db, [("session:1", {"type": "message", "message_id": 1})])
+        await db.commit()
+        assert await _outbox_count(db) == 1
+        assert await subscription.wait(timeout=0.05) is None
+
+        assert await relay_batch(batch_size=10) == 1
+        assert await subscription.wait(timeout=1) == {"type": "message", "message_id": 1}
+
+
+async def test_local_backend_publishes_in_process_after_commit(db, monkeypatch):
+    monkeypatch.setattr(settings, "realtime_backend", "local")
+    monkeypatch.setattr(realtime_service, "_broker", LocalBroker())
+
+    async with realtime_service.subscribe("session:1") as subscription:
+        enqueue_realtime(db, [("session:1", {"type": "message", "message_id": 1})])
+        await db.rollback()
+        assert await subscription.wait(timeout=0.05) is None
+
+        enqueue_realtime(db, [("session:1", {"type": "message", "message_id": 2})])
+        await db.commit()
+        assert await subscription.wait(timeout=1) == {"type": "message", "message_id": 2}
+    # 中継ワーカーからは届かないので行は積まない
+    assert await _outbox_count(db) == 0
+
+
+async def test_cache_invalidation_evicts_the_writers_lru_at_commit(db):
+    cache = get_cache("outbox-test", maxsize=10, local_ttl=60, redis_ttl=60, use_redis=False)
+    await cache.set_many({"1": "old"})
+
+    enqueue_cache_invalidation(db, cache.namespace, [1])
+    assert cache._get_local("1") == (True, "old")
+    await db.commit()
+    # 中継を待たずに消えている
+    assert cache._get_local("1") == (False, None)
+
+    assert await relay_batch(batch_size=10) == 1
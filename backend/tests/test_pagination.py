@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models.notification import Notification, NotificationType
+from app.models.persona_stats import PersonaStats
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, paginate, set_next_cursor
+from app.routers.notifications import list_notifications
+from app.routers.personas import list_personas
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_staff, make_user
+
+
+def test_cursor_round_trip():
+    at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(at, 42)) == (at, 42)
+    assert decode_cursor(encode_cursor(7, 3)) == (7, 3)
+
+
+def test_invalid_cursor_is_bad_request():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_next_cursor_only_when_page_is_full():
+    class Row:
+        def __init__(self, id):
+            self.id = id
+
+    response = Response()
+    set_next_cursor(response, [Row(3), Row(2)], limit=3)
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    set_next_cursor(response, [Row(3), Row(2)], limit=2)
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == (2, 2)
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_cursor_switches_offset_to_keyset():
+    stmt = select(Notification)
+    first = _sql(paginate(stmt, Notification.created_at, Notification.id, None, 40, 20))
+    assert "ORDER BY notifications.created_at DESC, notifications.id DESC" in first
+    assert "OFFSET 40" in first
+
+    cursor = encode_cursor(datetime(2024, 5, 1, tzinfo=timezone.utc), 9)
+    keyset = _sql(paginate(stmt, Notification.created_at, Notification.id, cursor, 40, 20))
+    assert "(notifications.created_at, notifications.id) < (" in keyset
+    assert "OFFSET" not in keyset
+
+    ascending = _sql(paginate(stmt, Notification.id, Notification.id, encode_cursor(9, 9), 0, 20, descending=False))
+    assert "notifications.id > 9" in ascending
+
+
+async def _notification_pages(db, user, limit: int) -> list[list[int]]:
+    pages, cursor = [], None
+    while True:
+        response = Response()
+        items = await list_notifications(
+            response, unread_only=False, offset=0, limit=limit, cursor=cursor, user=user, db=db
+        )
+        pages.append([n.id for n in items])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_rows_with_the_same_timestamp_are_paged_by_id(db):
+    user = await make_user(db)
+    # 同じトランザクションの now() なので created_at はすべて同じ
+    db.add_all(Notification(user_id=user.id, type=NotificationType.system, title=f"お知らせ{i}") for i in range(5))
+    await db.commit()
+
+    assert await _notification_pages(db, user, limit=2) == [[5, 4], [3, 2], [1]]
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_score_order_pages_break_ties_by_persona_id(db):
+    staff = await make_staff(db)
+    personas = [await make_persona(db, staff) for _ in range(4)]
+    for persona, likes in zip(personas, [1, 2, 2, 0]):
+        db.add(PersonaStats(persona_id=persona.id, like_count=likes))
+    await db.commit()
+    user = await make_user(db)
+
+    seen, cursor = [], None
+    for _ in range(4):
+        response = Response()
+        page = await list_personas(
+            response, sort="popular", offset=0, limit=1, cursor=cursor, account=user, db=db
+        )
+        seen += [p.id for p in page]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    assert seen == [personas[2].id, personas[1].id, personas[0].id, personas[3].id]
+
+    with pytest.raises(HTTPException) as exc:
+        await list_personas(Response(), sort="popular", offset=0, limit=1, cursor="broken", account=user, db=db)
+    assert exc.value.status_code == 400
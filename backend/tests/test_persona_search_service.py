@@ -0,0 +1,57 @@
+import pytest
+
+from app.models.persona import Gender
+from app.pagination import encode_cursor
+from app.services.persona_search_service import PersonaSearchQuery, parse_attribute_filters, search
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_staff
+
+
+def test_attribute_filters_parse_json_values():
+    assert parse_attribute_filters(["hobby:映画", "smoker:false", "height:160"]) == {
+        "hobby": "映画",
+        "smoker": False,
+        "height": 160,
+    }
+    with pytest.raises(ValueError):
+        parse_attribute_filters(["no-separator"])
+
+
+def test_blank_query_is_browse():
+    assert PersonaSearchQuery(q="  ").is_empty()
+    assert not PersonaSearchQuery(min_age=20).is_empty()
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_search_combines_filters(db):
+    staff = await make_staff(db)
+    sakura = await make_persona(
+        db, staff, name="さくら", bio="映画と 100% カフェ巡り", gender=Gender.female, age=24,
+        attributes={"hobby": "映画"},
+    )
+    await make_persona(db, staff, name="あおい", bio="映画が好き", gender=Gender.female, age=31)
+    await make_persona(db, staff, name="さくらこ", bio="カフェ", gender=Gender.female, age=24, is_active=False)
+    await db.commit()
+
+    async def ids(**query):
+        return [p.id for p in await search(db, PersonaSearchQuery(**query), None, 10)]
+
+    assert await ids(q="映画 カフェ") == [sakura.id]
+    assert await ids(q="100%") == [sakura.id]
+    assert await ids(name="さくら") == [sakura.id]
+    assert await ids(gender=Gender.female, max_age=25) == [sakura.id]
+    assert await ids(attributes={"hobby": "映画"}) == [sakura.id]
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_browse_pages_by_id(db):
+    staff = await make_staff(db)
+    personas = [await make_persona(db, staff) for _ in range(3)]
+    await db.commit()
+
+    first = await search(db, PersonaSearchQuery(), None, 2)
+    assert [p.id for p in first] == [personas[0].id, personas[1].id]
+    rest = await search(db, PersonaSearchQuery(), encode_cursor(first[-1].id, first[-1].id), 2)
+    assert [p.id for p in rest] == [personas[2].id]
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import Response
+from sqlalchemy import select
+
+from app.models.outbox import OutboxEvent
+from app.models.persona_stats import PersonaMessageHour, PersonaStats
+from app.routers.personas import list_personas
+from app.services import persona_stats_service
+from tests.conftest import requires_db
+from tests.factories import make_persona, make_staff, make_user
+
+
+async def _stats(db, persona_id: int) -> PersonaStats:
+    db.expire_all()
+    return (await db.execute(select(PersonaStats).where(PersonaStats.persona_id == persona_id))).scalar_one()
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_deltas_are_added_incrementally(db):
+    staff = await make_staff(db)
+    persona = await make_persona(db, staff)
+    persona_stats_service.enqueue_stats(db, persona.id, likes=1, visitors=1)
+    persona_stats_service.enqueue_stats(db, persona.id, likes=1, active_sessions=1, messages=3)
+    await db.commit()
+
+    assert await persona_stats_service.apply_batch(100) == 2
+    stats = await _stats(db, persona.id)
+    assert (stats.like_count, stats.visitor_count, stats.active_session_count, stats.messages_24h) == (2, 1, 1, 3)
+    assert stats.popularity_score == 2 * 3 + 1 + 1 * 2
+    assert (await db.execute(select(OutboxEvent))).scalars().all() == []
+
+    # 2 回目は前回の値に増減だけを足す
+    persona_stats_service.enqueue_stats(db, persona.id, likes=-1, active_sessions=-1)
+    await db.commit()
+    assert await persona_stats_service.apply_batch(100) == 1
+    stats = await _stats(db, persona.id)
+    assert (stats.like_count, stats.active_session_count, stats.messages_24h) == (1, 0, 3)
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_expired_hours_drop_out_of_trending(db):
+    staff = await make_staff(db)
+    persona = await make_persona(db, staff)
+    now = datetime.now(timezone.utc)
+    db.add(PersonaStats(persona_id=persona.id, messages_24h=7))
+    db.add(PersonaMessageHour(persona_id=persona.id, hour=now - timedelta(hours=30), count=5))
+    db.add(PersonaMessageHour(persona_id=persona.id, hour=now - timedelta(hours=1), count=2))
+    await db.commit()
+
+    assert await persona_stats_service.expire_message_hours() == 1
+    assert (await _stats(db, persona.id)).messages_24h == 2
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_list_personas_sorted_by_popularity(db):
+    staff = await make_staff(db)
+    user = await make_user(db)
+    quiet = await make_persona(db, staff)
+    liked = await make_persona(db, staff)
+    busy = await make_persona(db, staff)
+    db.add_all(
+        [
+            PersonaStats(persona_id=quiet.id),
+            PersonaStats(persona_id=liked.id, like_count=5),
+            PersonaStats(persona_id=busy.id, like_count=1, messages_24h=40),
+        ]
+    )
+    await db.commit()
+
+    async def ids(sort):
+        page = await list_personas(
+            response=Response(), sort=sort, offset=0, limit=20, cursor=None, account=user, db=db
+        )
+        return [p.id for p in page]
+
+    assert await ids("popular") == [liked.id, busy.id, quiet.id]
+    assert await ids("trending") == [busy.id, liked.id, quiet.id]
+    assert await ids(None) == [quiet.id, liked.id, busy.id]
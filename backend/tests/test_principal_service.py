@@ -0,0 +1,86 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session, engine
+from app.models.staff_member import StaffMember, StaffRole, StaffStatus
+from app.models.user import User, UserStatus
+from app.services.principal_service import _restore, _snapshot, load_principal
+from tests.conftest import requires_db
+from tests.factories import make_user
+
+
+def _round_trip(account):
+    # Redis には JSON で置かれる
+    return json.loads(json.dumps(_snapshot(account)))
+
+
+def test_restored_user_has_every_cached_column_loaded():
+    at = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    user = User(
+        id=1,
+        email="a@example.com",
+        display_name="A",
+        hashed_password="hash",
+        credit_balance=10,
+        status=UserStatus.suspended,
+        avatar_url=None,
+        avatar_variants={"small": "/uploads/a_small.webp"},
+        created_at=at,
+        updated_at=at,
+    )
+    restored = _restore(AsyncSession(engine), "user", _round_trip(user))
+
+    assert inspect(restored).unloaded == {"hashed_password"}
+    assert restored.created_at == at
+    assert restored.status is UserStatus.suspended
+    assert restored.avatar_variants == {"small": "/uploads/a_small.webp"}
+
+
+def test_restored_staff_keeps_enums():
+    at = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    staff = StaffMember(
+        id=2,
+        email="s@example.com",
+        display_name="S",
+        hashed_password="hash",
+        role=StaffRole.admin,
+        status=StaffStatus.active,
+        created_at=at,
+        updated_at=at,
+    )
+    restored = _restore(AsyncSession(engine), "staff", _round_trip(staff))
+    assert restored.role is StaffRole.admin
+    assert restored.updated_at == at
+
+
+@pytest.mark.parametrize("model", [User, StaffMember])
+def test_password_hash_is_not_cached(model):
+    account = model(id=1, email="a@example.com", display_name="A", hashed_password="secret-hash")
+    for column in inspect(model).column_attrs:
+        if column.key not in inspect(account).dict:
+            setattr(account, column.key, None)
+    assert "hashed_password" not in _snapshot(account)
+    assert "secret-hash" not in json.dumps(_snapshot(account), default=str)
+
+
+def test_entry_missing_columns_is_ignored():
+    assert _restore(AsyncSession(engine), "user", {"id": 1, "email": "a@example.com"}) is None
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_cached_principal_loads_timestamps_without_lazy_load(db):
+    user = await make_user(db)
+    await db.commit()
+    user_id = user.id
+
+    async with async_session() as first:
+        await load_principal(first, "user", user_id)
+    async with async_session() as second:
+        cached = await load_principal(second, "user", user_id)
+        assert "hashed_password" in inspect(cached).unloaded
+        assert cached.created_at is not None
@@ -0,0 +1,53 @@
+import pytest
+from fastapi import HTTPException
+from starlette.responses import FileResponse
+
+from app.config import settings
+from app.services import upload_service
+
+
+@pytest.fixture
+def private_file():
+    path = upload_service.upload_root() / upload_service.PRIVATE_DIR / "ab" / "cd" / "abcd.webp"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"webp")
+    yield upload_service.path_to_url(path)
+    path.unlink(missing_ok=True)
+
+
+def test_proxy_sends_the_file_via_x_accel_redirect(private_file, monkeypatch):
+    monkeypatch.setattr(settings, "uploads_served_by_proxy", True)
+    response = upload_service.private_file_response(private_file)
+    assert response.headers["x-accel-redirect"] == f"{upload_service.PROTECTED_URL_PREFIX}/ab/cd/abcd.webp"
+    assert response.body == b""
+
+
+def test_api_sends_the_file_without_proxy(private_file, monkeypatch):
+    monkeypatch.setattr(settings, "uploads_served_by_proxy", False)
+    response = upload_service.private_file_response(private_file)
+    assert isinstance(response, FileResponse)
+    assert response.headers["cache-control"] == upload_service.PRIVATE_CACHE_CONTROL
+
+
+@pytest.mark.parametrize("served_by_proxy", [True, False])
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/uploads/ab/cd/abcd.webp",
+        "/uploads/private/../ab/cd/abcd.webp",
+        "/uploads/private/../../../etc/passwd",
+        "https://example.com/a",
+    ],
+)
+def test_only_private_files_are_returned(url, served_by_proxy, monkeypatch):
+    monkeypatch.setattr(settings, "uploads_served_by_proxy", served_by_proxy)
+    with pytest.raises(HTTPException) as excinfo:
+        upload_service.private_file_response(url)
+    assert excinfo.value.status_code == 404
+
+
+def test_missing_private_file_is_404(monkeypatch):
+    monkeypatch.setattr(settings, "uploads_served_by_proxy", False)
+    with pytest.raises(HTTPException) as excinfo:
+        upload_service.private_file_response("/uploads/private/ab/cd/missing.webp")
+    assert excinfo.value.status_code == 404
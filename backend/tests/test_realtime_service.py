@@ -0,0 +1,32 @@
+import pytest
+
+from app.services.realtime_service import LocalBroker, RedisBroker, session_channel
+from tests.conftest import requires_redis
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_local_broker_delivers_only_to_subscribed_channels():
+    broker = LocalBroker()
+    async with broker.subscribe(session_channel(1)) as subscription:
+        await broker.publish(session_channel(2), {"type": "message", "message_id": 2})
+        await broker.publish(session_channel(1), {"type": "message", "message_id": 1})
+        assert await subscription.wait(timeout=1) == {"type": "message", "message_id": 1}
+        assert await subscription.wait(timeout=0.05) is None
+    assert not broker._subscribers
+
+
+@requires_redis
+async def test_redis_broker_fans_out_across_workers(redis):
+    # ワーカーごとにブローカーを持つ構成を 2 つのインスタンスで再現する
+    publisher, first, second = RedisBroker(), RedisBroker(), RedisBroker()
+    try:
+        async with first.subscribe(session_channel(1)) as a, second.subscribe(session_channel(1)) as b:
+            await publisher.publish_many([(session_channel(1), {"type": "message", "message_id": 1})])
+            assert await a.wait(timeout=2) == {"type": "message", "message_id": 1}
+            assert await b.wait(timeout=2) == {"type": "message", "message_id": 1}
+        # 最後の購読者が抜けたチャンネルは Redis 側でも購読をやめる
+        assert await redis.pubsub_numsub(session_channel(1)) == [(session_channel(1), 0)]
+    finally:
+        for broker in (publisher, first, second):
+            await broker.close()
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.models.mail_campaign import CampaignStatus, CampaignType, MailCampaign
+from app.models.mail_delivery_run import MailDeliveryRun
+from app.services.schedule_service import CronSchedule, next_run, parse_interval
+from app.workers.scheduler import fire_due_campaigns
+from tests.conftest import requires_db
+
+UTC = timezone.utc
+
+
+def test_fixed_interval_does_not_drift_or_replay_missed_runs():
+    previous = datetime(2024, 1, 1, 0, 0, tzinfo=UTC)
+    assert next_run("6h", previous, previous) == previous + timedelta(hours=6)
+    # 止まっていた間の分はまとめて 1 回
+    now = previous + timedelta(hours=20)
+    assert next_run("6h", previous, now) == previous + timedelta(hours=24)
+
+
+def test_cron_is_evaluated_in_scheduler_timezone(monkeypatch):
+    monkeypatch.setattr(settings, "scheduler_timezone", "Asia/Tokyo")
+    # 2024-01-01 は月曜。日本時間の月曜 9:00 は UTC の 0:00
+    after = datetime(2024, 1, 1, 0, 0, tzinfo=UTC)
+    assert CronSchedule("0 9 * * 1").next_after(after) == datetime(2024, 1, 8, 0, 0, tzinfo=UTC)
+    assert CronSchedule("*/15 * * * *").next_after(after) == datetime(2024, 1, 1, 0, 15, tzinfo=UTC)
+
+
+@pytest.mark.parametrize("interval", ["0m", "5x", "* * * *", "60 * * * *", "*/0 * * * *"])
+def test_invalid_interval(interval):
+    with pytest.raises(ValueError):
+        parse_interval(interval)
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_due_campaigns_are_queued_once_and_rescheduled(db):
+    now = datetime.now(UTC)
+    once = MailCampaign(
+        type=CampaignType.scheduled, subject="s", body="b", status=CampaignStatus.scheduled,
+        scheduled_at=now - timedelta(minutes=1), next_run_at=now - timedelta(minutes=1),
+    )
+    periodic = MailCampaign(
+        type=CampaignType.periodic, subject="s", body="b", status=CampaignStatus.active,
+        interval="1h", next_run_at=now - timedelta(minutes=1),
+    )
+    later = MailCampaign(
+        type=CampaignType.scheduled, subject="s", body="b", status=CampaignStatus.scheduled,
+        scheduled_at=now + timedelta(hours=1), next_run_at=now + timedelta(hours=1),
+    )
+    db.add_all([once, periodic, later])
+    await db.commit()
+
+    assert await fire_due_campaigns(batch_size=10) == 2
+    assert await fire_due_campaigns(batch_size=10) == 0
+
+    runs = (await db.execute(select(MailDeliveryRun.campaign_id))).scalars().all()
+    assert sorted(runs) == sorted([once.id, periodic.id])
+    db.expire_all()
+    assert (await db.get(MailCampaign, once.id)).next_run_at is None
+    assert (await db.get(MailCampaign, periodic.id)).next_run_at > now
@@ -0,0 +1,74 @@
+import logging
+
+import pytest
+
+from app import server
+from app.config import settings
+from app.database import check_connection_budget
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "db_pool_size", 5)
+    monkeypatch.setattr(settings, "db_max_overflow", 2)
+    monkeypatch.setattr(settings, "web_concurrency", 0)
+    monkeypatch.setattr(settings, "realtime_backend", "redis")
+    monkeypatch.setattr(settings, "credit_reservation_backend", "redis")
+
+
+def test_connection_budget(pool):
+    assert check_connection_budget(4, 28) == 28
+    with pytest.raises(RuntimeError, match="4 プロセス × 7 = 28 > 27"):
+        check_connection_budget(4, 27)
+
+
+@pytest.mark.parametrize(
+    "files, expected",
+    [
+        ({"cpu.max": "200000 100000\n"}, 2.0),
+        ({"cpu.max": "150000 100000\n"}, 1.5),
+        ({"cpu.max": "max 100000\n"}, None),
+        ({"cpu/cpu.cfs_quota_us": "300000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 3.0),
+        ({"cpu,cpuacct/cpu.cfs_quota_us": "-1\n", "cpu,cpuacct/cpu.cfs_period_us": "100000\n"}, None),
+        ({}, None),
+    ],
+)
+def test_cgroup_cpu_quota(tmp_path, files, expected):
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(content)
+    assert server._cgroup_cpu_quota(tmp_path) == expected
+
+
+def test_available_cpus_rounds_the_quota_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(64)), raising=False)
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert server.available_cpus(tmp_path) == 2
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert server.available_cpus(tmp_path) == 64
+
+
+def test_default_workers_fit_the_connection_budget(pool, monkeypatch, caplog):
+    monkeypatch.setattr(server, "available_cpus", lambda: 16)
+    with caplog.at_level(logging.WARNING, logger=server.__name__):
+        assert server.plan_workers(None, 50) == 7
+    assert "ワーカー数を 7 にします" in caplog.text
+    assert server.plan_workers(None, 500) == 16
+    # 接続がほとんど残っていなくても 1 つは起動を試み、収まらなければ止める
+    with pytest.raises(RuntimeError):
+        server.plan_workers(None, 3)
+
+
+def test_explicit_workers_are_not_reduced(pool, monkeypatch):
+    monkeypatch.setattr(server, "available_cpus", lambda: 16)
+    monkeypatch.setattr(settings, "web_concurrency", 10)
+    with pytest.raises(RuntimeError, match="DB 接続数が上限を超えます"):
+        server.plan_workers(None, 50)
+    assert server.plan_workers(3, 50) == 3
+
+
+def test_multiple_workers_need_shared_backends(pool, monkeypatch):
+    monkeypatch.setattr(settings, "realtime_backend", "local")
+    assert server.plan_workers(1, 50) == 1
+    with pytest.raises(RuntimeError, match="REALTIME_BACKEND=redis"):
+        server.plan_workers(2, 50)
@@ -0,0 +1,145 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import update
+
+from app.database import async_session
+from app.dependencies import get_current_staff_for_stream
+from app.models.session import Session
+from app.models.staff_member import StaffRole
+from app.pagination import NEXT_CURSOR_HEADER
+from app.routers.sessions import list_sessions, stream_inbox
+from app.services.auth_service import create_access_token
+from app.services.message_service import create_message, enqueue_session_status
+from app.services.realtime_service import INBOX_ALL_CHANNEL, get_broker, inbox_persona_channel
+from tests.conftest import requires_db, wait_for_subscriber
+from tests.factories import make_persona, make_session, make_staff, make_user
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+async def _page(db, user, order="activity", cursor=None, limit=2):
+    response = Response()
+    items = await list_sessions(
+        response, session_status=None, order=order, limit=limit, cursor=cursor, account=user, db=db
+    )
+    return [s.id for s in items], response.headers.get(NEXT_CURSOR_HEADER)
+
+
+async def _touch(db, session_id, at):
+    await db.execute(update(Session).where(Session.id == session_id).values(updated_at=at))
+    await db.commit()
+
+
+async def test_activity_pages_do_not_repeat_sessions_moved_to_the_top(db):
+    user = await make_user(db)
+    persona = await make_persona(db, await make_staff(db))
+    base = datetime.now(timezone.utc) - timedelta(hours=1)
+    sessions = [await make_session(db, user, persona) for _ in range(3)]
+    await db.commit()
+    for i, s in enumerate(sessions):
+        await _touch(db, s.id, base + timedelta(minutes=i))
+
+    first, cursor = await _page(db, user)
+    assert first == [sessions[2].id, sessions[1].id]
+
+    # 1 ページ目に出たセッションにメッセージが来ても、続きのページには出ない
+    await _touch(db, sessions[1].id, base + timedelta(minutes=10))
+    second, _ = await _page(db, user, cursor=cursor)
+    assert second == [sessions[0].id]
+
+
+async def test_created_order_is_stable_while_paging(db):
+    user = await make_user(db)
+    persona = await make_persona(db, await make_staff(db))
+    sessions = [await make_session(db, user, persona) for _ in range(3)]
+    await db.commit()
+
+    first, cursor = await _page(db, user, order="created")
+    await _touch(db, sessions[0].id, datetime.now(timezone.utc))
+    second, _ = await _page(db, user, order="created", cursor=cursor)
+    assert first + second == [sessions[2].id, sessions[1].id, sessions[0].id]
+
+
+async def test_pages_cover_every_session(db):
+    user = await make_user(db)
+    persona = await make_persona(db, await make_staff(db))
+    sessions = [await make_session(db, user, persona) for _ in range(5)]
+    await db.commit()
+
+    seen, cursor = await _page(db, user)
+    while cursor:
+        page, cursor = await _page(db, user, cursor=cursor)
+        seen += page
+    assert sorted(seen) == sorted(s.id for s in sessions)
+
+
+async def _next_event(body) -> dict:
+    chunk = await asyncio.wait_for(body.__anext__(), timeout=5)
+    event_line, data_line = chunk.strip().split("\n")
+    return {"event": event_line.removeprefix("event: "), **json.loads(data_line.removeprefix("data: "))}
+
+
+async def test_inbox_stream_only_carries_own_personas(db):
+    user = await make_user(db, credit_balance=2)
+    staff, other_staff = await make_staff(db), await make_staff(db)
+    own = await make_session(db, user, await make_persona(db, staff))
+    foreign = await make_session(db, user, await make_persona(db, other_staff))
+    await db.commit()
+
+    response = await stream_inbox(staff=staff, db=db)
+    body = response.body_iterator
+    try:
+        assert await body.__anext__() == "retry: 3000\n\n"
+        pending = asyncio.ensure_future(_next_event(body))
+        await wait_for_subscriber(inbox_persona_channel(own.persona_id))
+        # ストリーム中は DB 接続を保持しない
+        assert not db.in_transaction()
+        assert not get_broker()._subscribers.get(INBOX_ALL_CHANNEL)
+
+        async with async_session() as other:
+            await create_message(other, await other.get(Session, foreign.id), user, "他の担当あて")
+            await create_message(other, await other.get(Session, own.id), user, "担当あて")
+
+        event = await pending
+        assert (event["event"], event["session_id"], event["persona_id"]) == ("message", own.id, own.persona_id)
+    finally:
+        await body.aclose()
+
+
+async def test_inbox_stream_gives_admins_every_persona(db):
+    user = await make_user(db)
+    admin = await make_staff(db, role=StaffRole.admin)
+    persona = await make_persona(db, await make_staff(db))
+    await db.commit()
+
+    response = await stream_inbox(staff=admin, db=db)
+    body = response.body_iterator
+    try:
+        await body.__anext__()
+        pending = asyncio.ensure_future(_next_event(body))
+        await wait_for_subscriber(INBOX_ALL_CHANNEL)
+
+        async with async_session() as other:
+            session = await make_session(other, user, persona)
+            enqueue_session_status(other, session)
+            await other.commit()
+
+        event = await pending
+        assert (event["event"], event["session_id"], event["status"]) == ("session", session.id, "active")
+    finally:
+        await body.aclose()
+
+
+async def test_inbox_stream_requires_a_staff_token(db):
+    user = await make_user(db)
+    await db.commit()
+
+    with pytest.raises(HTTPException) as missing:
+        await get_current_staff_for_stream(credentials=None, token=None, db=db)
+    with pytest.raises(HTTPException) as not_staff:
+        await get_current_staff_for_stream(credentials=None, token=create_access_token(user.id, "user"), db=db)
+    assert (missing.value.status_code, not_staff.value.status_code) == (401, 403)
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.config import settings
+from app.models.mail_campaign import CampaignStatus, CampaignType, MailCampaign, TriggerMailSetting
+from app.models.outbox import OutboxEvent
+from app.models.trigger_mail_job import TriggerMailJob
+from app.services import mail_transport
+from app.services.event_service import LIKE_SENT, USER_REGISTERED, emit_event
+from app.services.trigger_mail_service import TriggerIndex, schedule_jobs, send_due_jobs
+from tests.conftest import requires_db
+from tests.factories import make_user
+
+pytestmark = [pytest.mark.anyio, requires_db]
+
+
+async def _trigger(db, event: str, delay_minutes: int) -> MailCampaign:
+    campaign = MailCampaign(
+        type=CampaignType.trigger, subject="ようこそ {display_name} さん", body="本文", status=CampaignStatus.active
+    )
+    db.add(campaign)
+    await db.flush()
+    db.add(TriggerMailSetting(trigger_event=event, mail_campaign_id=campaign.id, delay_minutes=delay_minutes))
+    await db.commit()
+    return campaign
+
+
+async def test_events_become_delayed_jobs_and_are_consumed(db):
+    user = await make_user(db)
+    campaign = await _trigger(db, USER_REGISTERED, delay_minutes=10)
+    emit_event(db, USER_REGISTERED, user.id)
+    emit_event(db, LIKE_SENT, user.id)
+    await db.commit()
+    index = TriggerIndex()
+    await index.load()
+
+    assert await schedule_jobs(index, batch_size=10) == 2
+    assert await db.scalar(select(func.count()).select_from(OutboxEvent)) == 0
+    job = await db.scalar(select(TriggerMailJob))
+    assert (job.campaign_id, job.user_id) == (campaign.id, user.id)
+    assert job.due_at > datetime.now(timezone.utc) + timedelta(minutes=9)
+    # まだ期限前なので送らない
+    assert await send_due_jobs(batch_size=10) == 0
+
+
+async def _due_job(db):
+    user = await make_user(db)
+    campaign = await _trigger(db, USER_REGISTERED, delay_minutes=0)
+    setting_id = await db.scalar(select(TriggerMailSetting.id))
+    job = TriggerMailJob(
+        trigger_id=setting_id, campaign_id=campaign.id, user_id=user.id,
+        due_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+    )
+    db.add(job)
+    await db.commit()
+    return user, job
+
+
+async def test_due_job_is_sent_and_deleted(db, mail_sink):
+    user, _ = await _due_job(db)
+
+    assert await send_due_jobs(batch_size=10) == 1
+    assert [(m["to"], m["subject"]) for m in mail_sink()] == [(user.email, f"ようこそ {user.display_name} さん")]
+    assert await db.scalar(select(func.count()).select_from(TriggerMailJob)) == 0
+
+
+class _FailingTransport:
+    async def send_batch(self, messages):
+        return ["550 rejected"] * len(messages)
+
+
+async def test_failed_job_is_retried_then_dropped(db, monkeypatch):
+    monkeypatch.setattr(mail_transport, "_transport", _FailingTransport())
+    monkeypatch.setattr(settings, "trigger_mail_max_attempts", 2)
+    _, job = await _due_job(db)
+
+    assert await send_due_jobs(batch_size=10) == 1
+    retried = await db.get(TriggerMailJob, job.id, populate_existing=True)
+    assert retried.attempts == 1
+    assert retried.due_at > datetime.now(timezone.utc)
+
+    await db.execute(
+        update(TriggerMailJob).values(due_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    )
+    await db.commit()
+    assert await send_due_jobs(batch_size=10) == 1
+    assert await db.scalar(select(func.count()).select_from(TriggerMailJob)) == 0
@@ -0,0 +1,119 @@
+import io
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.datastructures import UploadFile as FormFile
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.models.stored_file import StoredFile
+from app.services import upload_service
+from tests.conftest import requires_db
+
+
+def _form_file(data: bytes, content_type: str = "image/png") -> FormFile:
+    return FormFile(file=io.BytesIO(data), filename="a.png", headers=Headers({"content-type": content_type}))
+
+
+@pytest.mark.anyio
+async def test_oversized_upload_is_discarded():
+    with pytest.raises(HTTPException) as excinfo:
+        await upload_service.save_temp(_form_file(b"x" * (upload_service.CHUNK_SIZE + 1)), upload_service.CHUNK_SIZE)
+    assert excinfo.value.status_code == 413
+    assert list((upload_service.upload_root() / "tmp").iterdir()) == []
+
+
+def test_uploads_are_immutable_and_hide_internal_dirs(tmp_path):
+    root = tmp_path
+    for relative in ("ab/cd/abcd.png", "tmp/partial", "private/ab/cd/secret.png"):
+        (root / relative).parent.mkdir(parents=True, exist_ok=True)
+        (root / relative).write_bytes(b"data")
+    app = Starlette(routes=[Mount("/uploads", upload_service.UploadFiles(directory=str(root)))])
+
+    with TestClient(app) as client:
+        response = client.get("/uploads/ab/cd/abcd.png")
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == upload_service.IMMUTABLE_CACHE_CONTROL
+        assert client.get("/uploads/tmp/partial").status_code == 404
+        assert client.get("/uploads/private/ab/cd/secret.png").status_code == 404
+
+
+async def _ref_count(db, url: str) -> int | None:
+    db.expire_all()
+    relative = url.removeprefix(f"{upload_service.UPLOAD_URL_PREFIX}/")
+    return (await db.execute(select(StoredFile.ref_count).where(StoredFile.path == relative))).scalar_one_or_none()
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_same_content_is_stored_once(db):
+    first = await upload_service.store_upload(db, _form_file(b"same image"), 1024)
+    second = await upload_service.store_upload(db, _form_file(b"same image"), 1024)
+    await db.commit()
+
+    assert first == second
+    assert upload_service.url_to_path(first).read_bytes() == b"same image"
+    assert await _ref_count(db, first) == 2
+
+    # 外部 URL は参照数の対象外
+    await upload_service.retain(db, "https://example.com/a.png")
+    await upload_service.release(db, first)
+    await upload_service.release(db, first)
+    await upload_service.release(db, first)
+    await db.commit()
+    assert await _ref_count(db, first) == 0
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_garbage_collection_waits_for_grace_and_removes_variants(db):
+    url = await upload_service.store_upload(db, _form_file(b"old avatar"), 1024)
+    kept = await upload_service.store_upload(db, _form_file(b"current avatar"), 1024)
+    await upload_service.release(db, url)
+    await db.commit()
+    path = upload_service.url_to_path(url)
+    variant = path.with_name(f"{path.stem}_small.webp")
+    variant.write_bytes(b"webp")
+
+    assert await upload_service.collect_garbage(timedelta(hours=1), 10) == 0
+    assert path.exists()
+
+    assert await upload_service.collect_garbage(timedelta(0), 10) == 1
+    assert not path.exists()
+    assert not variant.exists()
+    assert upload_service.url_to_path(kept).exists()
+    assert await _ref_count(db, url) is None
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_files_left_by_rolled_back_uploads_are_collected(db):
+    orphan = await upload_service.store_upload(db, _form_file(b"rolled back"), 1024)
+    await db.rollback()
+    recent = await upload_service.store_upload(db, _form_file(b"rolled back just now"), 1024)
+    await db.rollback()
+    kept = await upload_service.store_upload(db, _form_file(b"committed"), 1024)
+    await db.commit()
+    legacy = upload_service.upload_root() / "avatars" / "legacy.jpg"
+    legacy.parent.mkdir(parents=True, exist_ok=True)
+    legacy.write_bytes(b"legacy")
+    old = time.time() - 7200
+    for path in (upload_service.url_to_path(orphan), upload_service.url_to_path(kept), legacy):
+        os.utime(path, (old, old))
+
+    assert await upload_service.adopt_orphans(timedelta(hours=1), 10) == 1
+    assert await _ref_count(db, orphan) == 0
+    assert await _ref_count(db, recent) is None
+    assert await upload_service.adopt_orphans(timedelta(hours=1), 10) == 0
+
+    assert await upload_service.collect_garbage(timedelta(0), 10) == 1
+    assert not upload_service.url_to_path(orphan).exists()
+    assert upload_service.url_to_path(recent).exists()
+    assert upload_service.url_to_path(kept).exists()
+    assert legacy.exists()
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.user import User
+from app.services.user_search_service import UserSearchQuery, _prefix_range, build_statement, similarity_score
+from tests.conftest import requires_db
+from tests.factories import make_user
+
+
+def test_prefix_uses_a_btree_range():
+    lower, upper, like = _prefix_range(User.email, "tanaka")
+    assert lower.right.value == "tanaka"
+    assert upper.right.value == "tanakb"
+
+
+def test_partial_match_escapes_wildcards():
+    sql = str(
+        build_statement(UserSearchQuery(email="50%_off")).compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+    assert "50/%%/_off" in sql
+    assert "ESCAPE '/'" in sql
+
+
+async def _emails(db, query: UserSearchQuery, ranked: bool = False) -> list[str]:
+    stmt = build_statement(query)
+    stmt = stmt.order_by(similarity_score(query.q).desc(), User.id) if ranked else stmt.order_by(User.id)
+    return [user.email for user in (await db.execute(stmt)).scalars().all()]
+
+
+@pytest.mark.anyio
+@requires_db
+async def test_search_modes(db):
+    tanaka = (await make_user(db, email="tanaka.taro@example.com", display_name="田中太郎")).email
+    tanabe = (await make_user(db, email="tanabe@example.com", display_name="田辺")).email
+    await make_user(db, email="suzuki@example.com", display_name="鈴木")
+    await db.commit()
+
+    assert await _emails(db, UserSearchQuery(email="taro")) == [tanaka]
+    assert await _emails(db, UserSearchQuery(display_name="田")) == [tanaka, tanabe]
+    assert await _emails(db, UserSearchQuery(email_prefix="tana")) == [tanaka, tanabe]
+    ranked = await _emails(db, UserSearchQuery(q="tanaka"), ranked=True)
+    assert ranked[0] == tanaka
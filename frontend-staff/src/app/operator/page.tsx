@@ -1,7 +1,7 @@
 "use client";
 
 import { useEffect, useRef, useState } from "react";
-import { apiFetch, API_BASE } from "@/lib/api";
+import { apiFetch, apiFetchAll, API_BASE } from "@/lib/api";
 import { useAuth } from "@/lib/auth";
 import StaffLayout from "@/components/StaffLayout";
 
@@ -49,7 +49,7 @@ export default function OperatorPage() {
 
   // セッション一覧取得（全アクティブセッション）
   useEffect(() => {
-    apiFetch<Session[]>("/api/v1/sessions").then(setSessions).catch(() => {});
+    apiFetchAll<Session>("/api/v1/sessions").then(setSessions).catch(() => {});
     apiFetch<Template[]>("/api/v1/templates").then(setTemplates).catch(() => {});
   }, []);
 
@@ -13,10 +13,7 @@ export function clearToken() {
   localStorage.removeItem("staff_token");
 }
 
-export async function apiFetch<T>(
-  path: string,
-  options: RequestInit = {}
-): Promise<T> {
+async function request(path: string, options: RequestInit = {}): Promise<Response> {
   const token = getToken();
   const headers: Record<string, string> = {
     "Content-Type": "application/json",
@@ -32,11 +29,31 @@ export async function apiFetch<T>(
     const body = await res.json().catch(() => ({}));
     throw new Error(body.detail || `API Error: ${res.status}`);
   }
+  return res;
+}
 
+export async function apiFetch<T>(
+  path: string,
+  options: RequestInit = {}
+): Promise<T> {
+  const res = await request(path, options);
   if (res.status === 204) return undefined as T;
   return res.json();
 }
 
+// 一覧 API を X-Next-Cursor で最後のページまでたどって連結する
+export async function apiFetchAll<T>(path: string): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const sep = path.includes("?") ? "&" : "?";
+    const res = await request(cursor ? `${path}${sep}cursor=${encodeURIComponent(cursor)}` : path);
+    items.push(...((await res.json()) as T[]));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return items;
+}
+
 export async function apiUpload<T>(path: string, file: File): Promise<T> {
   const token = getToken();
   const headers: Record<string, string> = {};
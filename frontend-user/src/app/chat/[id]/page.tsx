@@ -2,7 +2,7 @@
 
 import { useEffect, useRef, useState } from "react";
 import { useParams } from "next/navigation";
-import { apiFetch, toFullUrl } from "@/lib/api";
+import { apiFetch, apiFetchAll, toFullUrl } from "@/lib/api";
 import { useAuth } from "@/lib/auth";
 import AppLayout from "@/components/AppLayout";
 
@@ -36,7 +36,7 @@ export default function ChatPage() {
   useEffect(() => {
     (async () => {
       try {
-        const sessions = await apiFetch<Session[]>("/api/v1/sessions");
+        const sessions = await apiFetchAll<Session>("/api/v1/sessions");
         const session = sessions.find((s) => s.id === sessionId);
         if (session) {
           const p = await apiFetch<Persona>(`/api/v1/personas/${session.persona_id}`);
@@ -1,7 +1,7 @@
 "use client";
 
 import { useEffect, useState } from "react";
-import { apiFetch, toFullUrl } from "@/lib/api";
+import { apiFetch, apiFetchAll, toFullUrl } from "@/lib/api";
 import AppLayout from "@/components/AppLayout";
 import LoadingSpinner from "@/components/LoadingSpinner";
 import Link from "next/link";
@@ -30,8 +30,7 @@ export default function MessagesPage() {
   useEffect(() => {
     (async () => {
       try {
-        const allSessions = await apiFetch<Session[]>("/api/v1/sessions");
-        const sessions = allSessions.filter((s) => s.status === "active");
+        const sessions = await apiFetchAll<Session>("/api/v1/sessions?status=active");
         setSessions(sessions);
 
         const personaMap: Record<number, Persona> = {};